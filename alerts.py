@@ -0,0 +1,234 @@
+# Keyword and phrase alerts on the live ingest path.
+# Each channel's watch list is compiled into one Aho-Corasick automaton, so a
+# message is scanned once however many phrases are watched. Every phrase keeps a
+# per-second ring buffer over its window; an alert fires when the windowed count
+# reaches the threshold and re-arms once it falls back below half of it.
+import json
+import os
+from collections import deque
+
+WATCHLIST_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "watchlists.json"
+)
+DEFAULT_COUNT = 10  # matches per window that trigger an alert
+DEFAULT_SECONDS = 60
+MAX_SCAN_CHARS = 500  # bounds the per-message cost of long copypastas
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over lowercased text, reporting whole-word matches.
+    A pattern ending in * only needs a word boundary at its start ("scuff*").
+    """
+
+    def __init__(self, patterns):
+        self.lengths = []
+        self.prefix = []
+        self.goto = [{}]
+        self.out = [()]
+        for index, pattern in enumerate(patterns):
+            pattern = pattern.lower()
+            self.prefix.append(pattern.endswith("*"))
+            pattern = pattern.rstrip("*")
+            self.lengths.append(len(pattern))
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = self.goto[node][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.out.append(())
+                node = nxt
+            self.out[node] += (index,)
+
+        # Breadth-first fail links; each node's outputs include its fail chain's,
+        # so matching never has to walk the chain
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] += self.out[self.fail[child]]
+
+    def matches(self, text):
+        """Return the set of pattern indices found in text."""
+        text = text[:MAX_SCAN_CHARS].lower()
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        node = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for p in out[node]:
+                start = i - self.lengths[p] + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if not self.prefix[p] and i < last and text[i + 1].isalnum():
+                    continue
+                found.add(p)
+        return found
+
+
+class RateWindow:
+    """Count of events in the last `seconds` whole seconds, O(1) per event."""
+
+    __slots__ = ("seconds", "counts", "total", "second")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.counts = [0] * seconds
+        self.total = 0
+        self.second = None
+
+    def advance(self, second):
+        if self.second is None or second - self.second >= self.seconds:
+            self.counts = [0] * self.seconds
+            self.total = 0
+            self.second = second
+            return
+        while self.second < second:
+            self.second += 1
+            slot = self.second % self.seconds
+            self.total -= self.counts[slot]
+            self.counts[slot] = 0
+
+    def add(self, second):
+        self.advance(second)
+        # Stragglers from an earlier second count toward the current one
+        self.counts[self.second % self.seconds] += 1
+        self.total += 1
+
+
+class ChannelWatch:
+    """Compiled watch list and rate windows for one channel."""
+
+    def __init__(self, channel, rules):
+        self.channel = channel
+        self.rules = rules  # [(phrase, count, seconds)]
+        self.matcher = AhoCorasick([phrase for phrase, _, _ in rules])
+        self.windows = [RateWindow(seconds) for _, _, seconds in rules]
+        self.armed = [True] * len(rules)
+
+    def check(self, timestamp, text, fired):
+        second = int(timestamp)
+        for index in self.matcher.matches(text):
+            window = self.windows[index]
+            window.add(second)
+            phrase, count, seconds = self.rules[index]
+            if self.armed[index] and window.total >= count:
+                self.armed[index] = False
+                fired.append(
+                    {
+                        "time": timestamp,
+                        "channel": self.channel,
+                        "phrase": phrase,
+                        "count": window.total,
+                        "seconds": seconds,
+                        "threshold": count,
+                        "message": text[:MAX_SCAN_CHARS],
+                    }
+                )
+
+    def advance(self, now):
+        """Let windows expire during quiet periods and re-arm phrases that calmed down."""
+        for index, window in enumerate(self.windows):
+            window.advance(int(now))
+            if not self.armed[index] and window.total < self.rules[index][1] / 2:
+                self.armed[index] = True
+
+
+def parse_rules(entries):
+    """Watch list entries are phrases or {"phrase", "count", "seconds"} objects."""
+    rules = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"phrase": entry}
+        phrase = entry["phrase"].strip()
+        if phrase:
+            rules.append(
+                (
+                    phrase,
+                    int(entry.get("count", DEFAULT_COUNT)),
+                    max(1, int(entry.get("seconds", DEFAULT_SECONDS))),
+                )
+            )
+    return rules
+
+
+class AlertMonitor:
+    """Per-channel watches loaded from a JSON watch list file.
+
+    The file maps channel names (or "*" for every channel) to lists of rules and
+    is re-read when it changes; reloading resets the rate windows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.lists = {}
+        self.watches = {}
+        self.fired = []
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self.mtime:
+            return
+        self.mtime = mtime
+        lists = {}
+        if mtime is not None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    lists = {k.lower(): parse_rules(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"Ignoring invalid watch list {self.path}: {e}")
+                return
+        self.lists = lists
+        self.watches = {}
+        print(f"Loaded watch lists for {len(lists)} channel entries")
+
+    def check(self, channel, timestamp, text):
+        watch = self.watches.get(channel)
+        if watch is None:
+            rules = self.lists.get("*", []) + self.lists.get(channel.lower(), [])
+            watch = self.watches[channel] = ChannelWatch(channel, rules)
+        if watch.rules:
+            watch.check(timestamp, text, self.fired)
+
+    def advance(self, now):
+        for watch in self.watches.values():
+            watch.advance(now)
+
+    def drain(self):
+        fired, self.fired = self.fired, []
+        return fired
+
+
+def load_watch_lists(path=WATCHLIST_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_watch_list(channel, rules, path=WATCHLIST_PATH):
+    """Replace one channel's rules; written atomically so the backend never reads half a file."""
+    lists = load_watch_lists(path)
+    lists[channel.lower()] = [
+        {"phrase": phrase, "count": count, "seconds": seconds}
+        for phrase, count, seconds in rules
+    ]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(lists, f, indent=2)
+    os.replace(tmp, path)
@@ -1,32 +1,119 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
 import time
-import subprocess
-import sys
 import os
+import math
+import threading
+import uuid
+
+import sessions
+from alerts import (
+    DEFAULT_COUNT,
+    DEFAULT_SECONDS,
+    load_watch_lists,
+    parse_rules,
+    save_watch_list,
+)
+from chat_search import SEARCH_SQL, fts_query
+from read_pool import db_key, pool_for
+from sketches import HyperLogLog
 
 st.set_page_config(layout="wide", page_title="Twitch Sentiment")
 st.title("Twitch Sentiment Engine")
 
 # Config
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "twitch_data.db")
-LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "session.lock")
+HEARTBEAT_SECONDS = 10  # how often a viewer tells the registry it is still here
+JANITOR_SECONDS = 30  # how often idle backends are stopped, even with no viewers left
 WINDOW_SECONDS = 1  # window of time to look at chat messages
+STALE_SECONDS = 30  # chat older than this isn't shown as "live" even if it's the newest
+LAG_WARN_SECONDS = 5  # p95 end-to-end lag above this is shown as a warning
+# Identical queries within these windows are answered once for all viewers
+LIVE_TTL = 0.3  # live bars (refreshed every 0.4s)
+SLOW_TTL = 5  # trending, timeline, highlights, session info
+# Timeline detail by age: (minutes of history kept at this width, bucket width in minutes).
+# Each width must divide the next. An 8 hour stream comes out to ~110 bars instead of ~480.
+TIMELINE_TIERS = [(60, 1), (240, 5), (None, 15)]
+TRENDING_LIMIT = 10  # trending terms shown next to the live bars
+HIGHLIGHT_LIMIT = 10  # most recent highlights listed under the timeline
+SEARCH_LINKS = 5  # busiest matching minutes listed under the timeline
+ALERT_LIMIT = 5  # recent keyword alerts listed next to the live bars
+TOPIC_MINUTES = 15  # minutes of topic history charted under the timeline
+TOPIC_LIMIT = 6  # busiest topics in that span charted and listed
+HIGHLIGHT_NAMES = {
+    "hype": "🔥 Hype",
+    "positive_swing": "🟢 Positive swing",
+    "negative_swing": "🔴 Negative swing",
+}
+HIGHLIGHT_COLORS = {
+    "hype": "#FFA15A",
+    "positive_swing": "#00CC96",
+    "negative_swing": "#EF553B",
+}
+
+
+@st.cache_resource(max_entries=2 * sessions.MAX_BACKENDS)
+def read_pool(key):
+    """One read-only connection pool per database file, shared by every session.
+    A new file at the same path closes the old file's pool.
+    """
+    return pool_for(key)
+
+
+@st.cache_resource
+def start_janitor():
+    """Background thread that stops backends whose viewers closed their tabs."""
+
+    def run():
+        while True:
+            time.sleep(JANITOR_SECONDS)
+            try:
+                sessions.cleanup()
+            except Exception as e:
+                print(f"Session cleanup failed: {e}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+start_janitor()
+
+
+@st.cache_data(ttl=LIVE_TTL, max_entries=256, show_spinner=False)
+def live_query(sql, params, key):
+    return read_pool(key).read_df(sql, params)
+
+
+@st.cache_data(ttl=SLOW_TTL, max_entries=256, show_spinner=False)
+def slow_query(sql, params, key):
+    return read_pool(key).read_df(sql, params)
+
+
+def db_ready():
+    """True once this session's backend has created its database."""
+    path = st.session_state.db_path
+    return path is not None and os.path.exists(path)
+
 
 # Session State
 if "vod_offset" not in st.session_state:
     st.session_state.vod_offset = None
 if "vod_id" not in st.session_state:
     st.session_state.vod_id = None
+if "monitor_start" not in st.session_state:
+    st.session_state.monitor_start = None
 if "smoothed_pos" not in st.session_state:
     st.session_state.smoothed_pos = 0.5
 if "smoothed_neg" not in st.session_state:
     st.session_state.smoothed_neg = 0.5
-if "process" not in st.session_state:
-    st.session_state.process = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "db_path" not in st.session_state:
+    st.session_state.db_path = None  # this session's channel store, set on connect
+if "last_heartbeat" not in st.session_state:
+    st.session_state.last_heartbeat = 0.0
 if "connected" not in st.session_state:
     st.session_state.connected = False
 if "current_channel" not in st.session_state:
@@ -35,6 +122,14 @@ if "pending_vod_url" not in st.session_state:
     st.session_state.pending_vod_url = None
 if "pending_vod_time" not in st.session_state:
     st.session_state.pending_vod_time = None
+if "timeline_buckets" not in st.session_state:
+    st.session_state.timeline_buckets = None
+if "timeline_starts" not in st.session_state:
+    st.session_state.timeline_starts = []
+if "match_minutes" not in st.session_state:
+    st.session_state.match_minutes = []
+if "last_alert_id" not in st.session_state:
+    st.session_state.last_alert_id = None  # newest alert already shown as a toast
 if "seen_intro" not in st.session_state:
     st.session_state.seen_intro = False
 
@@ -44,10 +139,11 @@ if not st.session_state.seen_intro:
         **Getting Started:**
         1. Enter a Twitch channel name and click Connect.
         2. You'll see 2 live sentiment bars (Positive and Negative) every moment as chats come in.
-        3. After about 30 seconds, a timeline will appear below showing chat activity broken down by positive, neutral, and negative messages per minute. This represents the ratio of positive and negative chats at the current moment.
+        3. After about 30 seconds, a timeline will appear below showing chat activity broken down by positive, neutral, and negative messages per minute (older history is merged into 5- and 15-minute bars). This represents the ratio of positive and negative chats at the current moment.
         4. Double-click any bar on the timeline to open a link to that moment in the VOD.
+        5. Spikes in chat activity or sentiment are detected automatically, shaded on the timeline and listed under it as highlights with VOD links.
         
-        ⚠️ **Note:** *If the page becomes unresponsive or turns white: 1) Reload the page, 2) Click "Force Disconnect" in the sidebar, then reconnect.
+        ⚠️ **Note:** *If the page becomes unresponsive or turns white: reload the page and reconnect. Sessions you leave open are cleaned up after a few minutes without a viewer.
                     
         ---
         
@@ -66,58 +162,90 @@ with st.sidebar:
         channel_input = st.text_input("Channel Name", placeholder="xQc")
         submitted = st.form_submit_button("Connect")
         if submitted:
-            if os.path.exists(LOCK_FILE):
-                st.warning(
-                    "A session appears to already be running (possibly from a crashed page).Click 'Force Disconnect' below if this is incorrect."
-                )
-            elif st.session_state.process is None:
-                # Clear old CSV data so graph starts fresh
-                if os.path.exists(DB_PATH):
-                    os.remove(DB_PATH)
-
-                # Launch 'run.py' in the background
-                # sys.executable guarantees we use the same Python venv
-                cmd = [sys.executable, "run.py", "--channel", channel_input]
-                p = subprocess.Popen(cmd)
-
-                with open(LOCK_FILE, "w") as f:
-                    f.write(str(p.pid))
-
-                # Save state
-                st.session_state.process = p
-                st.session_state.connected = True
-                st.session_state.current_channel = channel_input
-                st.success(f"Connected to {channel_input}!")
+            if st.session_state.connected:
+                st.warning("Already monitoring a channel. Disconnect first.")
             else:
-                st.warning("Model already running. Disconnect first.")
+                try:
+                    # Each channel has its own store and backend, shared by everyone
+                    # watching it; a new backend picks up the channel's kept store
+                    db_path = sessions.attach(
+                        st.session_state.session_id, channel_input
+                    )
+                except (ValueError, sessions.BackendLimitReached) as e:
+                    st.warning(str(e))
+                else:
+                    # Save state
+                    st.session_state.db_path = db_path
+                    st.session_state.timeline_buckets = None
+                    st.session_state.vod_offset = None
+                    st.session_state.connected = True
+                    st.session_state.current_channel = channel_input
+                    st.success(f"Connected to {channel_input}!")
 
     # Disconnect Button
     if st.button("Stop / Disconnect"):
-        if st.session_state.process:
-            st.session_state.process.terminate()
-            st.session_state.process = None
-            st.session_state.connected = False
-            st.session_state.current_channel = ""
-        if os.path.exists(LOCK_FILE):
-            os.remove(LOCK_FILE)
-
-    if os.path.exists(LOCK_FILE):
-        if st.button("⚠️ Force Disconnect (clears stuck session)"):
-            try:
-                with open(LOCK_FILE) as f:
-                    old_pid = int(f.read().strip())
-                import signal
-
-                os.kill(old_pid, signal.SIGTERM)
-            except Exception:
-                pass  # process might already be dead
-            os.remove(LOCK_FILE)
-            st.session_state.process = None
-            st.session_state.connected = False
-            st.rerun()
+        # The backend only stops once nobody else is watching its channel
+        sessions.detach(st.session_state.session_id)
+        st.session_state.db_path = None
+        st.session_state.connected = False
+        st.session_state.current_channel = ""
+
+    if not st.session_state.connected:
+        with sessions.registry() as conn:
+            stored = sessions.stored_channels(conn)
+        if stored:
+            with st.expander("Stored channels"):
+                st.caption(
+                    f"Kept for {sessions.RETENTION_SECONDS // 86400} days after their "
+                    "last message, so reconnecting resumes them."
+                )
+                for name in stored:
+                    if st.button(f"🗑️ Delete {name}", key=f"delete_{name}"):
+                        try:
+                            sessions.delete_store(name)
+                        except (ValueError, RuntimeError) as e:
+                            st.warning(str(e))
+                        else:
+                            st.rerun()
 
-    # Disclaimer
-    st.sidebar.warning("Note: Multiple simultaneous users may cause mixed results.")
+    if st.session_state.connected:
+        with st.expander("Keyword alerts"):
+            channel = st.session_state.current_channel.lower()
+            current = parse_rules(load_watch_lists().get(channel, []))
+            with st.form("watch_list_form"):
+                text = st.text_area(
+                    "One per line: phrase, count, seconds",
+                    value="\n".join(
+                        f"{phrase}, {count}, {seconds}"
+                        for phrase, count, seconds in current
+                    ),
+                    placeholder=f"clip it, {DEFAULT_COUNT}, {DEFAULT_SECONDS}\nscuff*, 5, 30",
+                    help="Alert when a phrase appears at least `count` times within "
+                    "`seconds`. A trailing * matches word prefixes.",
+                )
+                if st.form_submit_button("Save"):
+                    rules = []
+                    for line in text.splitlines():
+                        phrase, *numbers = [p.strip() for p in line.split(",")]
+                        if not phrase:
+                            continue
+                        try:
+                            count = int(numbers[0]) if numbers else DEFAULT_COUNT
+                            seconds = (
+                                int(numbers[1]) if len(numbers) > 1 else DEFAULT_SECONDS
+                            )
+                        except ValueError:
+                            st.warning(f"Skipped line: {line}")
+                            continue
+                        rules.append((phrase, count, seconds))
+                    save_watch_list(channel, rules)
+                    st.success(f"Watching {len(rules)} phrases")
+
+    st.checkbox(
+        "Weight sentiment by unique chatters",
+        key="weight_by_chatters",
+        help="Average each chatter's messages first, so one spammer counts once.",
+    )
 
 
 # Main display
@@ -129,6 +257,9 @@ with col1:
     recent_msg_placeholder = st.empty()
 with col2:
     metric_placeholder = st.empty()
+    lag_placeholder = st.empty()
+    alert_placeholder = st.empty()
+    trending_placeholder = st.empty()
 
 
 # This fragment only runs update_dashboard every 0.4s
@@ -139,20 +270,57 @@ def update_dashboard():
             f"Monitoring: {st.session_state.current_channel.capitalize()}"
         )
 
-        if os.path.exists(DB_PATH):
+        # Keep this viewer registered so the channel's backend isn't stopped as idle
+        if time.time() - st.session_state.last_heartbeat > HEARTBEAT_SECONDS:
+            st.session_state.last_heartbeat = time.time()
             try:
-                # Query database for the last 2 seconds of data
-                cutoff_time = time.time() - WINDOW_SECONDS
-                conn = sqlite3.connect(DB_PATH)
-                df_live = pd.read_sql_query(
-                    "SELECT * FROM chat_log WHERE timestamp > ?",
-                    conn,
-                    params=(cutoff_time,),
+                sessions.heartbeat(st.session_state.session_id)
+            except Exception:
+                pass  # registry briefly locked; try again next interval
+
+        if db_ready():
+            try:
+                # Rows are stamped with Twitch's send time, so take the window ending
+                # at the newest scored message; otherwise any pipeline lag beyond
+                # WINDOW_SECONDS would leave the window empty
+                key = db_key(st.session_state.db_path)
+                latest = live_query(
+                    "SELECT MAX(timestamp) AS latest FROM chat_log", (), key
+                )["latest"].iloc[0]
+                if pd.isna(latest) or latest < time.time() - STALE_SECONDS:
+                    latest = time.time()
+                cutoff_time = latest - WINDOW_SECONDS
+                df_lag = live_query(
+                    "SELECT p50, p95, p99 FROM pipeline_lag ORDER BY time DESC LIMIT 1",
+                    (),
+                    key,
                 )
-                conn.close()
+                df_live = live_query(
+                    "SELECT * FROM chat_log WHERE timestamp > ?", (cutoff_time,), key
+                )
+                df_users = pd.DataFrame()
+                if st.session_state.get("weight_by_chatters"):
+                    # Per-second rows are written once the second closes, so look
+                    # one extra second back
+                    df_users = live_query(
+                        """SELECT chatters, user_pos, user_neg FROM chatter_sketches
+                        WHERE resolution = 1 AND bucket > ?""",
+                        (cutoff_time - 1,),
+                        key,
+                    )
             except Exception:
                 return  # Skip frame if DB is temporarily locked
 
+            if not df_lag.empty:
+                p50, p95, p99 = df_lag.iloc[0]
+                text = (
+                    f"Lag behind chat: p50 {p50:.1f}s · p95 {p95:.1f}s · p99 {p99:.1f}s"
+                )
+                if p95 > LAG_WARN_SECONDS:
+                    lag_placeholder.warning(text)
+                else:
+                    lag_placeholder.caption(text)
+
             # Filter Data (Last 2 Seconds)
             if not df_live.empty:
                 pos_totals = []
@@ -175,6 +343,12 @@ def update_dashboard():
                 avg_pos = sum(pos_totals) / len(pos_totals) if pos_totals else 0.5
                 avg_neg = sum(neg_totals) / len(neg_totals) if neg_totals else 0.5
 
+                if not df_users.empty:
+                    # Seconds with more distinct chatters carry more weight
+                    weights = df_users["chatters"]
+                    avg_pos = (df_users["user_pos"] * weights).sum() / weights.sum()
+                    avg_neg = (df_users["user_neg"] * weights).sum() / weights.sum()
+
                 # Smooth bar and blend with previous values (0.4 = 40% new, 60% old)
                 smoothing_factor = 0.4
                 st.session_state.smoothed_pos = (
@@ -251,23 +425,252 @@ def update_dashboard():
         status_area.info("👈 Enter a channel and click Connect to start.")
 
 
+def distinct_chatters(conn, start, end):
+    """Estimate distinct chatters in [start, end) by merging stored HyperLogLogs.
+    Whole minutes use the per-minute sketches; the partial edges use per-second ones.
+    """
+    first_minute = math.ceil(start / 60) * 60
+    last_minute = end // 60 * 60
+    rows = conn.execute(
+        """
+        SELECT sketch FROM chatter_sketches
+        WHERE (resolution = 60 AND bucket >= ? AND bucket + 60 <= ?)
+           OR (resolution = 1 AND bucket >= ? AND bucket < ?
+               AND (bucket < ? OR bucket >= ?))
+    """,
+        (first_minute, end, start, end, first_minute, last_minute),
+    ).fetchall()
+    if not rows:
+        return 0
+    merged = HyperLogLog.from_bytes(rows[0][0])
+    for (sketch,) in rows[1:]:
+        merged.merge(HyperLogLog.from_bytes(sketch))
+    return round(merged.count())
+
+
+@st.cache_data(ttl=SLOW_TTL, max_entries=16, show_spinner=False)
+def recent_chatters(end, key):
+    """Distinct chatters in the minute before `end`, shared across viewers."""
+    with read_pool(key).connection() as conn:
+        return distinct_chatters(conn, end - 60, end)
+
+
+@st.fragment(run_every=5)
+def trending_panel():
+    if not (st.session_state.connected and db_ready()):
+        return
+    try:
+        # Newest minute first; it is still filling up and refreshed every few seconds
+        key = db_key(st.session_state.db_path)
+        # Rounded to the refresh interval so viewers share one HyperLogLog merge
+        chatters = recent_chatters(int(time.time() // 5 * 5), key)
+        df_terms = slow_query(
+            """
+            SELECT term, count, sentiment FROM trending_terms
+            WHERE bucket = (SELECT MAX(bucket) FROM trending_terms)
+            ORDER BY count - error DESC
+            LIMIT ?
+        """,
+            (TRENDING_LIMIT,),
+            key,
+        )
+    except Exception:
+        return
+    if df_terms.empty:
+        return
+
+    lines = []
+    for row in df_terms.itertuples():
+        marker = "🟢" if row.sentiment > 0.2 else "🔴" if row.sentiment < -0.2 else "⚪"
+        lines.append(f"{marker} **{row.term}** · {row.count}")
+    trending_placeholder.markdown(
+        f"~{chatters} unique chatters in the last minute\n\n"
+        "**Trending this minute**\n\n" + "\n\n".join(lines)
+    )
+
+
+@st.fragment(run_every=2)
+def alert_panel():
+    if not (st.session_state.connected and db_ready()):
+        return
+    try:
+        df_alerts = live_query(
+            "SELECT * FROM alerts ORDER BY id DESC LIMIT ?",
+            (ALERT_LIMIT,),
+            db_key(st.session_state.db_path),
+        )
+    except Exception:
+        return
+    if df_alerts.empty:
+        return
+
+    # Alerts fired since this viewer last looked pop up as toasts
+    newest = int(df_alerts["id"].iloc[0])
+    if st.session_state.last_alert_id is not None:
+        for row in df_alerts[
+            df_alerts["id"] > st.session_state.last_alert_id
+        ].itertuples():
+            st.toast(f'🔔 "{row.phrase}" x{row.count} in {row.seconds}s', icon="🔔")
+    st.session_state.last_alert_id = newest
+
+    lines = [
+        f"🔔 **{row.phrase}** · {row.count} in {row.seconds}s "
+        f"({time.strftime('%H:%M:%S', time.localtime(row.time))})"
+        for row in df_alerts.itertuples()
+    ]
+    alert_placeholder.markdown("**Keyword alerts**\n\n" + "\n\n".join(lines))
+
+
+def format_vod_minutes(minutes):
+    """Format a Series of whole VOD minutes as H:MM without a per-row lambda."""
+    minutes = minutes.astype(int)
+    return (minutes // 60).astype(str) + ":" + (minutes % 60).astype(str).str.zfill(2)
+
+
+def session_origin():
+    """Minute bucket the running backend started monitoring in. A kept store also
+    holds chat from earlier backends, which the timeline, highlights and search skip.
+    """
+    return int(st.session_state.monitor_start // 60 * 60)
+
+
+def fetch_timeline_buckets():
+    """Return per-minute counts for the session, only querying minutes not yet cached."""
+    cached = st.session_state.timeline_buckets
+    # The newest cached minute may still be filling up, so it is always re-read
+    if cached is not None and len(cached):
+        since = cached["bucket"].iloc[-1]
+    else:
+        since = session_origin()
+
+    df_new = slow_query(
+        """
+        SELECT 
+            CAST(timestamp / 60 AS INT) * 60 as bucket,
+            SUM(CASE WHEN label='positive' THEN 1 ELSE 0 END) as pos_count,
+            SUM(CASE WHEN label='negative' THEN 1 ELSE 0 END) as neg_count,
+            SUM(CASE WHEN label='neutral' THEN 1 ELSE 0 END) as neu_count
+        FROM chat_log
+        WHERE timestamp >= ?
+        GROUP BY bucket
+        ORDER BY bucket
+    """,
+        (int(since),),
+        db_key(st.session_state.db_path),
+    )
+
+    if cached is not None and len(cached):
+        cached = cached[cached["bucket"] < since]
+        df_new = pd.concat([cached, df_new], ignore_index=True)
+    st.session_state.timeline_buckets = df_new
+    return df_new
+
+
+def coarsen_timeline(df, origin):
+    """Merge older minutes into wider buckets so long streams send a bounded number of bars."""
+    # Offsets are minutes since the session start, so group edges never move between refreshes
+    offset = (df["bucket"] - origin) // 60
+    newest = offset.iloc[-1]
+
+    width = pd.Series(TIMELINE_TIERS[0][1], index=df.index)
+    for (max_age, _), (_, older_width) in zip(TIMELINE_TIERS, TIMELINE_TIERS[1:]):
+        # Tier edges land on multiples of the coarser width so no group straddles one
+        edge = (newest - max_age) // older_width * older_width
+        width[offset < edge] = older_width
+
+    return (
+        df.assign(start=offset // width * width, width=width)
+        .groupby(["start", "width"], as_index=False)[
+            ["pos_count", "neu_count", "neg_count"]
+        ]
+        .sum()
+        .sort_values("start", ignore_index=True)
+    )
+
+
+def load_session_info():
+    """Fetch the VOD id and offset once per session. Returns False until the
+    running backend has written its session_info row, so a later rerun tries again.
+    A kept store also holds the rows of earlier backends, which are skipped.
+    """
+    if st.session_state.vod_offset is not None:
+        return True
+    started = sessions.backend_started(st.session_state.current_channel) or 0
+    session_row = slow_query(
+        """SELECT * FROM session_info WHERE monitor_start_time >= ?
+        ORDER BY monitor_start_time DESC LIMIT 1""",
+        (started,),
+        db_key(st.session_state.db_path),
+    )
+    if session_row.empty:
+        return False
+    st.session_state.monitor_start = session_row["monitor_start_time"].iloc[0]
+    if session_row["stream_start_time"].iloc[0]:
+        gap = (
+            session_row["monitor_start_time"].iloc[0]
+            - session_row["stream_start_time"].iloc[0]
+        )
+        st.session_state.vod_offset = gap
+        st.session_state.vod_id = session_row["vod_id"].iloc[0]
+    else:
+        st.session_state.vod_offset = 0
+    return True
+
+
+def vod_link(timestamp):
+    """Return (H:MM:SS label, VOD url or None) for a unix timestamp in this session."""
+    seconds = int(
+        st.session_state.vod_offset + timestamp - st.session_state.monitor_start
+    )
+    label = f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if not st.session_state.vod_id:
+        return label, None
+    url = f"https://twitch.tv/videos/{st.session_state.vod_id}?t={seconds // 60}m{seconds % 60}s"
+    return label, url
+
+
+def fetch_highlights(limit=HIGHLIGHT_LIMIT):
+    """Most recent highlights of this session from the backend's spike detector."""
+    return slow_query(
+        """SELECT * FROM highlights WHERE start_time >= ?
+        ORDER BY start_time DESC LIMIT ?""",
+        (st.session_state.monitor_start, limit),
+        db_key(st.session_state.db_path),
+    )
+
+
+def fetch_search_matches(text):
+    """Minutes whose chat matches the search box, from the backend's FTS index."""
+    query = fts_query(text)
+    if not query:
+        return pd.DataFrame()
+    return slow_query(
+        SEARCH_SQL,
+        (60, 60, query, st.session_state.monitor_start),
+        db_key(st.session_state.db_path),
+    )
+
+
 def handle_click():
     selection = st.session_state.timeline_chart["selection"]
     points = selection.get("points", [])
     if points and st.session_state.vod_id:
-        clicked_minute = points[0].get("x")
-        if clicked_minute and ":" in str(clicked_minute):
-            h, m = str(clicked_minute).split(":")
-            total_minutes = int(h) * 60 + int(m)
+        # Bars are looked up by index, so links stay exact whatever the bucket width;
+        # the search markers (the trace after the three bars) have their own list
+        index = points[0].get("point_index")
+        starts = st.session_state.timeline_starts
+        if points[0].get("curve_number") == 3:
+            starts = st.session_state.match_minutes
+        if index is not None and index < len(starts):
+            total_minutes = int(starts[index])
             st.session_state.pending_vod_url = f"https://twitch.tv/videos/{st.session_state.vod_id}?t={total_minutes}m0s"
-            st.session_state.pending_vod_time = clicked_minute
+            st.session_state.pending_vod_time = (
+                f"{total_minutes // 60}:{total_minutes % 60:02d}"
+            )
 
 
 @st.fragment(run_every=30)
 def session_timeline():
-    existing_selection = st.session_state.get("timeline_chart", {}).get("selection", {})
-    existing_points = existing_selection.get("points", [])
-
     # Check if a channel name is valid in the session memory
     if st.session_state.get("connected") and st.session_state.current_channel:
         title_text = (
@@ -276,104 +679,142 @@ def session_timeline():
     else:
         title_text = "Chat Activity Timeline"
 
-    if st.session_state.connected and os.path.exists(DB_PATH):
+    if st.session_state.connected and db_ready():
+        search = st.text_input(
+            "Search chat",
+            key="chat_search",
+            placeholder="clip it, scuff*",
+            help="Comma-separated phrases; a trailing * matches prefixes.",
+        )
         try:
-            conn = sqlite3.connect(DB_PATH)
-            df_timeline = pd.read_sql_query(
-                """
-                SELECT 
-                    CAST(timestamp / 60 AS INT) * 60 as bucket,
-                    SUM(CASE WHEN label='positive' THEN 1 ELSE 0 END) as pos_count,
-                    SUM(CASE WHEN label='negative' THEN 1 ELSE 0 END) as neg_count,
-                    SUM(CASE WHEN label='neutral' THEN 1 ELSE 0 END) as neu_count
-                FROM chat_log
-                GROUP BY bucket
-                ORDER BY bucket
-            """,
-                conn,
-            )
-            conn.close()
+            # Queries start at the session's monitor_start, so wait for its row
+            if not load_session_info():
+                return
+            df_minutes = fetch_timeline_buckets()
+            df_matches = fetch_search_matches(search) if search else pd.DataFrame()
         except Exception:
             return
 
-        if not df_timeline.empty:
-            # Fetch VOD offset once per session
-            if st.session_state.vod_offset is None:
-                conn = sqlite3.connect(DB_PATH)
-                session_row = pd.read_sql_query(
-                    "SELECT * FROM session_info LIMIT 1", conn
-                )
-                conn.close()
-                if not session_row.empty and session_row["stream_start_time"].iloc[0]:
-                    gap = (
-                        session_row["monitor_start_time"].iloc[0]
-                        - session_row["stream_start_time"].iloc[0]
-                    )
-                    st.session_state.vod_offset = gap
-                    st.session_state.vod_id = session_row["vod_id"].iloc[0]
-                else:
-                    st.session_state.vod_offset = 0
+        if not df_minutes.empty:
+            origin = session_origin()
+            df_timeline = coarsen_timeline(df_minutes, origin)
 
             # Convert to true VOD-relative minutes
-            start_bucket = df_timeline["bucket"].iloc[0]
-            df_timeline["minute"] = (
-                (df_timeline["bucket"] - start_bucket) / 60
-                + (st.session_state.vod_offset / 60)
-            ).astype(int)
-
-            # Format as H:MM
-            df_timeline["time_label"] = df_timeline["minute"].apply(
-                lambda m: f"{m // 60}:{m % 60:02d}"
+            df_timeline["minute"] = df_timeline["start"] + int(
+                st.session_state.vod_offset / 60
             )
-
-            fig = go.Figure(
-                data=[
-                    go.Bar(
-                        name="Positive",
-                        x=df_timeline["time_label"],
-                        y=df_timeline["pos_count"],
-                        marker_color="#00CC96",
-                        hovertemplate="Timestamp: %{x}<br>Positive: %{y} msgs<extra></extra>",
-                    ),
-                    go.Bar(
-                        name="Neutral",
-                        x=df_timeline["time_label"],
-                        y=df_timeline["neu_count"],
-                        marker_color="#636EFA",
-                        hovertemplate="Timestamp: %{x}<br>Neutral: %{y} msgs<extra></extra>",
-                    ),
+            df_timeline["time_label"] = format_vod_minutes(df_timeline["minute"])
+            st.session_state.timeline_starts = df_timeline["minute"].tolist()
+
+            # Bars sit on a numeric minute axis so wide (older) buckets take up
+            # their real span; heights are per-minute rates so tiers stay comparable
+            x = df_timeline["minute"] + df_timeline["width"] / 2
+            hover = (
+                df_timeline["time_label"]
+                + " ("
+                + df_timeline["width"].astype(str)
+                + " min)"
+            )
+            traces = []
+            for name, column, color in [
+                ("Positive", "pos_count", "#00CC96"),
+                ("Neutral", "neu_count", "#636EFA"),
+                ("Negative", "neg_count", "#EF553B"),
+            ]:
+                traces.append(
                     go.Bar(
-                        name="Negative",
-                        x=df_timeline["time_label"],
-                        y=df_timeline["neg_count"],
-                        marker_color="#EF553B",
-                        hovertemplate="Timestamp: %{x}<br>Negative: %{y} msgs<extra></extra>",
-                    ),
-                ]
+                        name=name,
+                        x=x,
+                        y=df_timeline[column] / df_timeline["width"],
+                        width=df_timeline["width"],
+                        customdata=np.stack([hover, df_timeline[column]], axis=-1),
+                        marker_color=color,
+                        hovertemplate="Timestamp: %{customdata[0]}<br>"
+                        + name
+                        + ": %{customdata[1]} msgs<extra></extra>",
+                    )
+                )
+            vod_minute = int(st.session_state.vod_offset / 60)
+            st.session_state.match_minutes = []
+            if not df_matches.empty:
+                # Matches per minute share the bars' messages/min axis
+                match_minute = (df_matches["bucket"] - origin) // 60 + vod_minute
+                st.session_state.match_minutes = match_minute.tolist()
+                traces.append(
+                    go.Scatter(
+                        name=f'"{search}"',
+                        x=match_minute + 0.5,
+                        y=df_matches["matches"],
+                        mode="markers",
+                        marker=dict(
+                            symbol="diamond",
+                            size=9,
+                            color="#FECB52",
+                            line=dict(color="black", width=1),
+                        ),
+                        customdata=np.stack(
+                            [format_vod_minutes(match_minute), df_matches["sentiment"]],
+                            axis=-1,
+                        ),
+                        hovertemplate="Timestamp: %{customdata[0]}<br>"
+                        + "Matches: %{y}<br>Sentiment: %{customdata[1]:+.2f}"
+                        + "<extra></extra>",
+                    )
+                )
+            fig = go.Figure(data=traces)
+
+            totals = (
+                df_timeline[["pos_count", "neu_count", "neg_count"]].sum(axis=1)
+                / df_timeline["width"]
             )
+            # Cap slightly above the 95th percentile, not the absolute max, so one
+            # huge spike doesn't flatten every other bar
+            y_cap = np.percentile(totals, 95) * 1.15
 
-            totals = df_timeline[["pos_count", "neu_count", "neg_count"]].sum(axis=1)
-            y_cap = (
-                np.percentile(totals, 95) * 1.15
-            )  # cap slightly above the 95th percentile, not the absolute max
+            # Label roughly 20 ticks as H:MM on the numeric axis
+            first = df_timeline["minute"].iloc[0]
+            last = df_timeline["minute"].iloc[-1] + df_timeline["width"].iloc[-1]
+            step = max(1, int(np.ceil((last - first) / 20)))
+            tick_vals = pd.Series(np.arange(first, last + 1, step))
 
             fig.update_layout(
-                yaxis=dict(fixedrange=True),
+                yaxis=dict(fixedrange=True, range=[0, y_cap]),
                 barmode="stack",
                 bargap=0,
                 barcornerradius=3,
                 title=title_text,
                 xaxis_title="Stream Time (VOD timestamp)",
-                yaxis_title="Messages",
+                yaxis_title="Messages / min",
                 height=300,
                 margin=dict(t=40, b=10),
                 xaxis=dict(
-                    tickmode="auto",
-                    nticks=20,
+                    tickmode="array",
+                    tickvals=tick_vals,
+                    ticktext=format_vod_minutes(tick_vals),
                 ),
             )
 
-            fig.update_traces(marker_line_color="black", marker_line_width=0.5)
+            fig.update_traces(
+                marker_line_color="black",
+                marker_line_width=0.5,
+                selector=dict(type="bar"),
+            )
+
+            # Shade detected highlights on the same minute axis as the bars
+            try:
+                df_highlights = fetch_highlights()
+            except Exception:
+                df_highlights = pd.DataFrame()
+            for row in df_highlights.itertuples():
+                fig.add_vrect(
+                    x0=(row.start_time - origin) / 60 + vod_minute,
+                    x1=(row.end_time - origin) / 60 + vod_minute,
+                    fillcolor=HIGHLIGHT_COLORS.get(row.kind, "#FFA15A"),
+                    opacity=0.2,
+                    line_width=0,
+                    layer="below",
+                )
+
             st.plotly_chart(
                 fig,
                 width="stretch",
@@ -397,7 +838,129 @@ def session_timeline():
                     st.session_state.pending_vod_url,
                 )  # noqa
 
+            if search and df_matches.empty:
+                st.caption(f'No messages match "{search}" yet.')
+            elif search and st.session_state.monitor_start is not None:
+                total = int(df_matches["matches"].sum())
+                first_label, first_url = vod_link(df_matches["bucket"].iloc[0])
+                st.caption(
+                    f'"{search}": {total} messages in {len(df_matches)} minutes, '
+                    f"first at {first_label}"
+                )
+                if first_url:
+                    st.link_button(f"⏮️ First match at {first_label}", first_url)
+                busiest = df_matches.nlargest(SEARCH_LINKS, "matches")
+                for row in busiest.sort_values("bucket").itertuples():
+                    label, url = vod_link(row.bucket)
+                    text = f"{label} · {row.matches} matches · sentiment {row.sentiment:+.2f}"
+                    if url:
+                        st.link_button(f"🔎 {text}", url)
+                    else:
+                        st.write(text)
+
+
+@st.fragment(run_every=10)
+def session_highlights():
+    if not (st.session_state.connected and db_ready()):
+        return
+    try:
+        if not load_session_info():
+            return  # no session_info row yet; try again on the next run
+        df_highlights = fetch_highlights()
+    except Exception:
+        return
+    if df_highlights.empty:
+        return
+
+    st.subheader("Highlights")
+    for row in df_highlights.itertuples():
+        label, url = vod_link(row.start_time)
+        duration = int(row.end_time - row.start_time)
+        if row.kind == "hype":
+            detail = f"peak {row.peak_value:.0f} msgs/sec"
+        else:
+            detail = f"peak balance {row.peak_value:+.2f}"
+        text = (
+            f"{HIGHLIGHT_NAMES.get(row.kind, row.kind)} at {label} "
+            f"({duration}s, {row.messages} msgs, {detail})"
+        )
+        if url:
+            st.link_button(f"🎬 {text}", url)
+        else:
+            st.write(text)
+
+
+@st.fragment(run_every=10)
+def topic_panel():
+    """Busiest chat topics of the last minutes and their sentiment per minute.
+    Only filled when the backend stores message embeddings.
+    """
+    if not (st.session_state.connected and db_ready()):
+        return
+    try:
+        df_topics = slow_query(
+            """
+            SELECT bucket, topic, label, messages, sentiment, example
+            FROM topic_clusters
+            WHERE bucket >= (SELECT MAX(bucket) FROM topic_clusters) - ?
+            ORDER BY bucket
+        """,
+            ((TOPIC_MINUTES - 1) * 60,),
+            db_key(st.session_state.db_path),
+        )
+    except Exception:
+        return
+    if df_topics.empty:
+        return
+
+    busiest = df_topics.groupby("topic")["messages"].sum().nlargest(TOPIC_LIMIT)
+    df_topics = df_topics[df_topics["topic"].isin(busiest.index)].copy()
+    # Labels come from each minute's terms; name a topic after its latest minute
+    names = df_topics.groupby("topic")["label"].last()
+    df_topics["minute"] = [
+        time.strftime("%H:%M", time.localtime(b)) for b in df_topics["bucket"]
+    ]
+
+    st.subheader("Chat Topics")
+    fig = go.Figure()
+    for topic in busiest.index:
+        rows = df_topics[df_topics["topic"] == topic]
+        fig.add_trace(
+            go.Scatter(
+                name=names[topic],
+                x=rows["minute"],
+                y=rows["sentiment"],
+                mode="lines+markers",
+                marker_size=np.sqrt(rows["messages"]) + 4,
+                customdata=rows["messages"],
+                hovertemplate="%{x}: %{customdata} msgs, sentiment %{y:+.2f}",
+            )
+        )
+    fig.update_layout(
+        height=300,
+        margin=dict(t=10, b=10),
+        yaxis_title="Sentiment",
+        yaxis_range=[-1, 1],
+        legend=dict(orientation="h"),
+    )
+    st.plotly_chart(fig, width="stretch", key="topic_chart")
+
+    latest = df_topics[df_topics["bucket"] == df_topics["bucket"].max()]
+    total = latest["messages"].sum()
+    lines = []
+    for row in latest.sort_values("messages", ascending=False).itertuples():
+        marker = "🟢" if row.sentiment > 0.2 else "🔴" if row.sentiment < -0.2 else "⚪"
+        lines.append(
+            f"{marker} **{row.label}** · {row.messages / total:.0%} of this minute "
+            f"· _{row.example[:100]}_"
+        )
+    st.markdown("\n\n".join(lines))
+
 
 # Run the fragments
 update_dashboard()
+alert_panel()
+trending_panel()
 session_timeline()
+topic_panel()
+session_highlights()
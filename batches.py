@@ -0,0 +1,142 @@
+# Column-oriented message batches passed between the backend's pipeline stages.
+# Chat is collected into MessageBatch objects as it arrives, so the asyncio
+# queues, the classifier and the SQLite writer each handle one object per batch
+# instead of one tuple per message. Numeric columns are compact array.arrays.
+import asyncio
+from array import array
+from collections import deque
+
+# Small-integer codes for channels and labels, shared by every batch
+CHANNEL_NAMES = []
+CHANNEL_IDS = {}
+LABEL_NAMES = ["negative", "neutral", "positive"]
+LABEL_IDS = {name: i for i, name in enumerate(LABEL_NAMES)}
+
+
+def channel_id(name):
+    cid = CHANNEL_IDS.get(name)
+    if cid is None:
+        cid = CHANNEL_IDS[name] = len(CHANNEL_NAMES)
+        CHANNEL_NAMES.append(name)
+    return cid
+
+
+def label_id(name):
+    """Code for a label; labels from other models are added on first sight."""
+    lid = LABEL_IDS.get(name)
+    if lid is None:
+        lid = LABEL_IDS[name] = len(LABEL_NAMES)
+        LABEL_NAMES.append(name)
+    return lid
+
+
+class MessageBatch:
+    """Messages as parallel columns. Label/score columns are filled after inference."""
+
+    __slots__ = (
+        "channel_ids",
+        "texts",
+        "users",
+        "offsets",
+        "sent",
+        "received",
+        "labels",
+        "scores",
+        "latency_ms",
+        "scored",
+        "versions",
+        "embeddings",
+    )
+
+    def __init__(self):
+        self.channel_ids = array("H")
+        self.texts = []
+        self.users = []
+        self.offsets = array("q")
+        self.sent = array("d")  # Twitch server time (tmi-sent-ts), in seconds
+        self.received = array("d")
+        self.labels = array("b")
+        self.scores = array("f")
+        self.latency_ms = array("f")
+        self.scored = array("d")
+        self.versions = []  # model version that scored each message
+        self.embeddings = []  # (scale, blob) per message, None when not embedded
+
+    def __len__(self):
+        return len(self.texts)
+
+    def append(self, channel, text, user, offset, sent, received):
+        self.channel_ids.append(channel_id(channel))
+        self.texts.append(text)
+        self.users.append(user)
+        self.offsets.append(offset)
+        self.sent.append(sent)
+        self.received.append(received)
+
+    def set_results(self, results, latency_ms, scored, version, embeddings=None):
+        """Store the top label/score of each pipeline result, the batch's model time,
+        the wall-clock time scoring finished, which model version did it and the
+        encoded embeddings if the classifier produced them.
+        """
+        self.labels = array("b", [label_id(r[0]["label"]) for r in results])
+        self.scores = array("f", [r[0]["score"] for r in results])
+        self.latency_ms = array("f", [latency_ms]) * len(results)
+        self.scored = array("d", [scored]) * len(results)
+        self.versions = [version] * len(results)
+        self.embeddings = embeddings or [None] * len(results)
+
+    def extend(self, other):
+        for name in self.__slots__:
+            getattr(self, name).extend(getattr(other, name))
+
+    def channels(self):
+        return [CHANNEL_NAMES[c] for c in self.channel_ids]
+
+    def label_names(self):
+        return [LABEL_NAMES[lid] for lid in self.labels]
+
+
+class BatchQueue:
+    """Queue of MessageBatch objects filled one message at a time.
+
+    put() appends to an open batch and seals it at batch_size; get() returns the
+    oldest sealed batch, or the open one if nothing is sealed, so a quiet chat
+    is still processed immediately (natural batching).
+    """
+
+    def __init__(self, batch_size=16):
+        self.batch_size = batch_size
+        self.sealed = deque()
+        self.open = MessageBatch()
+        self.ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.open) + sum(len(b) for b in self.sealed)
+
+    def put(self, channel, text, user, offset, sent, received):
+        self.open.append(channel, text, user, offset, sent, received)
+        if len(self.open) >= self.batch_size:
+            self.sealed.append(self.open)
+            self.open = MessageBatch()
+        self.ready.set()
+
+    def put_batch(self, batch):
+        self.sealed.append(batch)
+        self.ready.set()
+
+    def get_nowait(self):
+        """Return the next batch, or None if the queue is empty."""
+        if self.sealed:
+            return self.sealed.popleft()
+        if len(self.open):
+            batch, self.open = self.open, MessageBatch()
+            return batch
+        return None
+
+    async def get(self):
+        while True:
+            batch = self.get_nowait()
+            if batch is not None:
+                return batch
+            self.ready.clear()
+            await self.ready.wait()
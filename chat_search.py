@@ -0,0 +1,65 @@
+# Full-text search over chat_log through an external-content FTS5 index.
+# chat_fts only stores the inverted index; message text stays in chat_log and is
+# looked up by rowid, so nothing is stored twice. The backend's writer indexes
+# each batch in the same transaction that inserts it.
+import pandas as pd
+
+FTS_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(
+        message,
+        content='chat_log',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+# chat_log is append-only, so rows above the previous max rowid are the new batch
+INDEX_NEW_ROWS_SQL = """
+    INSERT INTO chat_fts(rowid, message)
+    SELECT rowid, message FROM chat_log WHERE rowid > ?
+"""
+REBUILD_SQL = "INSERT INTO chat_fts(chat_fts) VALUES('rebuild')"
+
+# Matching messages per time bucket since a start time, with the same signed
+# sentiment as trending terms
+SEARCH_SQL = """
+    SELECT
+        CAST(c.timestamp / ? AS INT) * ? AS bucket,
+        COUNT(*) AS matches,
+        SUM(c.label = 'positive') AS pos_count,
+        SUM(c.label = 'negative') AS neg_count,
+        SUM(c.label = 'neutral') AS neu_count,
+        AVG(CASE c.label WHEN 'positive' THEN c.score
+                         WHEN 'negative' THEN -c.score ELSE 0 END) AS sentiment
+    FROM chat_fts f JOIN chat_log c ON c.rowid = f.rowid
+    WHERE chat_fts MATCH ? AND c.timestamp >= ?
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+
+def fts_query(text):
+    """Turn search box input into an FTS5 query.
+    Each comma-separated part is matched as a phrase ("clip it, clip that"), and a
+    trailing * keeps prefix matching ("scuff*"). Everything else is quoted, so
+    FTS5 operators typed by users can't cause syntax errors.
+    """
+    terms = []
+    for part in text.split(","):
+        part = part.strip()
+        prefix = part.endswith("*")
+        part = part.rstrip("*").strip()
+        if part:
+            terms.append('"' + part.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " OR ".join(terms)
+
+
+def search_buckets(conn, text, bucket_seconds=60, since=0):
+    """DataFrame of bucket, matches, pos/neg/neu counts and average sentiment, for
+    messages sent at or after `since`.
+    """
+    query = fts_query(text)
+    if not query:
+        return pd.DataFrame()
+    return pd.read_sql_query(
+        SEARCH_SQL, conn, params=(bucket_seconds, bucket_seconds, query, since)
+    )
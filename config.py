@@ -8,6 +8,16 @@ client_secret = os.getenv("TWITCH_CLIENT_SECRET")
 user_token = os.getenv("TWITCH_USER_TOKEN")
 refresh_token = os.getenv("TWITCH_REFRESH_TOKEN")
 
+# Optional compiled inference path: "trace" (TorchScript) or "compile" (torch.compile)
+compile_mode = os.getenv("MODEL_COMPILE_MODE") or None
+
+# Chat ingest backend: "twitchapi" (default) or "irc" (raw IRC, for busy channels)
+ingest_backend = os.getenv("CHAT_INGEST", "twitchapi")
+use_uvloop = os.getenv("USE_UVLOOP", "0") == "1"
+
+# Keep a message embedding from the classifier's forward pass: "float16" or "int8"
+embedding_format = os.getenv("MESSAGE_EMBEDDINGS") or None
+
 bot_list = [
     "fossabot",
     "nightbot",
@@ -0,0 +1,214 @@
+# Compact message embeddings and an in-process approximate nearest-neighbour index.
+# With embeddings enabled, the classifier keeps a mean-pooled, L2-normalized
+# vector of every message from the forward pass it already runs, and the writer
+# stores it in chat_embeddings as float16 or as int8 with a per-vector scale.
+# IvfIndex searches them with an inverted file: k-means centroids partition the
+# vectors, and a query only scans the lists of its nprobe nearest centroids.
+import numpy as np
+
+FORMATS = ("float16", "int8")
+
+# Keyed by chat_log rowid; scale is NULL for float16 vectors
+EMBEDDINGS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS chat_embeddings (
+        message_rowid INTEGER PRIMARY KEY,
+        scale REAL,
+        vector BLOB
+    )
+"""
+# Vectors from different models are not comparable, so they are read per version
+LOAD_SQL = """
+    SELECT e.message_rowid, e.scale, e.vector
+    FROM chat_embeddings e JOIN chat_log c ON c.rowid = e.message_rowid
+    WHERE c.model_version = ? AND e.message_rowid > ?
+    ORDER BY e.message_rowid
+"""
+ASSIGN_BLOCK = 65_536  # vectors scored against the centroids at a time
+PAIR_BLOCK = 2_048  # rows of an inverted list compared at a time
+
+
+def encode(vectors, fmt):
+    """(scale, blob) per row of a float16 (n, dim) array of unit vectors."""
+    if fmt == "float16":
+        return [(None, row.tobytes()) for row in vectors]
+    vectors = vectors.astype(np.float32)
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-8) / 127
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return [(float(s), row.tobytes()) for s, row in zip(scales, codes)]
+
+
+def decode(scales, blobs):
+    """Stack stored vectors back into a float16 (n, dim) array."""
+    rows = [
+        np.frombuffer(blob, dtype=np.float16)
+        if scale is None
+        else np.frombuffer(blob, dtype=np.int8).astype(np.float32) * scale
+        for scale, blob in zip(scales, blobs)
+    ]
+    if not rows:
+        return np.empty((0, 0), dtype=np.float16)
+    return np.stack(rows).astype(np.float16)
+
+
+def load_embeddings(conn, version, after_rowid=0):
+    """(rowids, float16 vectors) stored for one model version."""
+    rows = conn.execute(LOAD_SQL, (version, after_rowid)).fetchall()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    return ids, decode([r[1] for r in rows], [r[2] for r in rows])
+
+
+def nearest_centroids(vectors, centroids, count=1):
+    """Indices of each vector's `count` most similar centroids, in blocks."""
+    out = np.empty((len(vectors), count), dtype=np.int32)
+    for lo in range(0, len(vectors), ASSIGN_BLOCK):
+        sims = vectors[lo : lo + ASSIGN_BLOCK].astype(np.float32) @ centroids.T
+        if count == 1:
+            out[lo : lo + len(sims), 0] = sims.argmax(axis=1)
+        else:
+            top = np.argpartition(-sims, count - 1, axis=1)[:, :count]
+            order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+            out[lo : lo + len(sims)] = np.take_along_axis(top, order, axis=1)
+    return out
+
+
+def spherical_kmeans(vectors, k, iters=10, seed=0):
+    """Unit-length centroids that maximize cosine similarity to their members."""
+    rng = np.random.default_rng(seed)
+    vectors = vectors.astype(np.float32)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)]
+    for _ in range(iters):
+        assign = nearest_centroids(vectors, centroids)[:, 0]
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums[filled] = np.add.reduceat(vectors[order], starts)
+        # Empty lists restart from random vectors rather than staying dead
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-8)
+    return centroids
+
+
+class IvfIndex:
+    """Inverted-file index over unit vectors (cosine similarity = dot product).
+
+    Vectors are kept as float16, grouped by their nearest centroid: list i holds
+    ids[offsets[i]:offsets[i + 1]], ascending. Search cost is about
+    nprobe / nlist of a brute-force scan.
+    """
+
+    def __init__(self, centroids, ids, vectors, offsets, version=None):
+        self.centroids = centroids
+        self.ids = ids
+        self.vectors = vectors
+        self.offsets = offsets
+        self.version = version
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, vectors, nlist=None, iters=10, seed=0, version=None):
+        """Train centroids on a sample (at most 64 vectors per list) and fill the lists."""
+        nlist = min(len(ids), nlist or max(1, int(np.sqrt(len(ids)))))
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(ids), min(len(ids), 64 * nlist), replace=False)
+        centroids = spherical_kmeans(vectors[sample], nlist, iters, seed)
+        assign = nearest_centroids(vectors, centroids)[:, 0]
+        # Stable sort keeps ids ascending within each list
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(centroids, ids[order], vectors[order], offsets, version)
+
+    def add(self, ids, vectors):
+        """Insert vectors into the lists of their nearest centroids (which are not
+        retrained, so rebuild once the index has grown a lot).
+        """
+        nlist = len(self.centroids)
+        assign = np.concatenate(
+            [
+                np.repeat(np.arange(nlist), np.diff(self.offsets)),
+                nearest_centroids(vectors, self.centroids)[:, 0],
+            ]
+        )
+        ids = np.concatenate([self.ids, ids])
+        order = np.lexsort((ids, assign))
+        self.ids = ids[order]
+        self.vectors = np.concatenate([self.vectors, vectors])[order]
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assign, minlength=nlist))]
+        )
+
+    def search(self, queries, k=10, nprobe=8):
+        """(ids, similarities) of the k nearest stored vectors to each query row;
+        rows are padded with -1 / -inf when the probed lists hold fewer than k.
+        Each probed list is scanned once for all the queries that probe it.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        nprobe = min(nprobe, len(self.centroids))
+        probes = nearest_centroids(queries, self.centroids, nprobe)
+        found_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        found_sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i in np.unique(probes):
+            lo, hi = self.offsets[i], self.offsets[i + 1]
+            if lo == hi:
+                continue
+            asking = np.flatnonzero((probes == i).any(axis=1))
+            sims = queries[asking] @ self.vectors[lo:hi].astype(np.float32).T
+            # Merge this list's candidates into each query's running top k
+            rows = np.concatenate(
+                [found_rows[asking], np.broadcast_to(np.arange(lo, hi), sims.shape)],
+                axis=1,
+            )
+            sims = np.concatenate([found_sims[asking], sims], axis=1)
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            found_rows[asking] = np.take_along_axis(rows, top, axis=1)
+            found_sims[asking] = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-found_sims, axis=1)
+        found_rows = np.take_along_axis(found_rows, order, axis=1)
+        found_sims = np.take_along_axis(found_sims, order, axis=1)
+        return np.where(found_rows >= 0, self.ids[found_rows], -1), found_sims
+
+    def duplicate_groups(self, threshold=0.95):
+        """Star-cluster near-identical messages: each vector joins the earliest
+        vector in its list with similarity >= threshold (possibly itself).
+        Returns the representative id of every stored id, aligned with self.ids.
+        Near-duplicates almost always share a list, so lists are not probed further.
+        """
+        labels = self.ids.copy()
+        for i in range(len(self.offsets) - 1):
+            lo, hi = self.offsets[i], self.offsets[i + 1]
+            members = self.vectors[lo:hi].astype(np.float32)
+            for start in range(0, hi - lo, PAIR_BLOCK):
+                close = members[start : start + PAIR_BLOCK] @ members.T >= threshold
+                # Every row matches itself, so argmax finds its earliest match
+                labels[lo + start : lo + start + len(close)] = self.ids[
+                    lo + close.argmax(axis=1)
+                ]
+        return labels
+
+    def save(self, path, last_rowid):
+        np.savez(
+            path,
+            centroids=self.centroids,
+            ids=self.ids,
+            vectors=self.vectors,
+            offsets=self.offsets,
+            version=np.array(self.version or ""),
+            last_rowid=np.array(last_rowid),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """(index, last chat_log rowid it covers)."""
+        with np.load(path) as data:
+            index = cls(
+                data["centroids"],
+                data["ids"],
+                data["vectors"],
+                data["offsets"],
+                str(data["version"]) or None,
+            )
+            return index, int(data["last_rowid"])
@@ -0,0 +1,182 @@
+# Online hype/spike detection for live chat.
+# Each channel keeps O(1) state: running counters for the current second and
+# EWMA mean/variance + CUSUM statistics for message rate and sentiment balance.
+# Finished spikes are returned as highlight dicts for the backend to store.
+import math
+
+# Tuning (in standard deviations of the per-second signal)
+EWMA_ALPHA = 0.02  # baseline adapts over roughly the last minute
+CUSUM_SLACK = 0.5  # drift ignored per second before evidence accumulates
+CUSUM_THRESHOLD = 6.0  # accumulated evidence needed to open a highlight
+CUSUM_RELEASE = 2.0  # a highlight ends once the evidence decays below this
+CUSUM_CAP = 12.0  # bounds how long a huge spike takes to decay
+WARMUP_SECONDS = 30  # samples used to learn a baseline before alerting
+MIN_BALANCE_MESSAGES = 3  # seconds with fewer messages don't move the balance
+MAX_GAP_SECONDS = 120  # empty seconds replayed after a silence, at most
+
+
+class EwmaCusum:
+    """Exponentially weighted z-score with one-sided CUSUM alarms in both directions."""
+
+    def __init__(self, alpha=EWMA_ALPHA, slack=CUSUM_SLACK, min_std=1.0):
+        self.alpha = alpha
+        self.slack = slack
+        self.min_std = min_std
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+        self.up = 0.0  # evidence the signal is above baseline
+        self.down = 0.0  # evidence the signal is below baseline
+
+    def update(self, x):
+        """Score x against the baseline, update the CUSUMs and return its z-score."""
+        self.samples += 1
+        diff = x - self.mean
+        if self.samples <= WARMUP_SECONDS:
+            # Plain running mean/variance until there is a baseline worth scoring against
+            self.mean += diff / self.samples
+            self.var += (diff * (x - self.mean) - self.var) / self.samples
+            return 0.0
+
+        z = diff / max(math.sqrt(self.var), self.min_std)
+        self.up = min(CUSUM_CAP, max(0.0, self.up + z - self.slack))
+        self.down = min(CUSUM_CAP, max(0.0, self.down - z - self.slack))
+
+        # Adapt much more slowly during an alarm so a spike isn't learned as normal,
+        # while a lasting level shift is still absorbed eventually
+        alpha = self.alpha
+        if self.up >= CUSUM_THRESHOLD or self.down >= CUSUM_THRESHOLD:
+            alpha *= 0.1
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+        return z
+
+
+class Highlight:
+    """A spike in progress; becomes a dict row once it ends."""
+
+    __slots__ = (
+        "kind",
+        "sign",
+        "start",
+        "peak_time",
+        "peak_value",
+        "peak_z",
+        "last_active",
+        "messages",
+    )
+
+    def __init__(self, kind, start):
+        self.kind = kind
+        self.sign = -1 if kind == "negative_swing" else 1
+        self.start = start
+        self.peak_time = start
+        self.peak_value = 0.0
+        self.peak_z = 0.0
+        self.last_active = start
+        self.messages = 0
+
+    def observe(self, second, value, z, count):
+        self.messages += count
+        if z * self.sign > CUSUM_SLACK:
+            self.last_active = second
+        if z * self.sign > self.peak_z * self.sign:
+            self.peak_time, self.peak_value, self.peak_z = second, value, z
+
+
+class SpikeDetector:
+    """Detect message-rate spikes ("hype") and sentiment swings for one channel.
+
+    add() is called once per scored message and only touches counters, except
+    when a new second begins, which closes the previous one.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.rate = EwmaCusum(min_std=1.0)
+        self.balance = EwmaCusum(min_std=0.1)
+        self.second = None
+        self.count = 0
+        self.pos = 0
+        self.neg = 0
+        self.rise = {}  # kind -> [second its CUSUM left zero, messages since]
+        self.open = {}  # kind -> Highlight currently in progress
+        self.finished = []
+
+    def add(self, timestamp, label):
+        second = int(timestamp)
+        if self.second is None:
+            self.second = second
+        elif second > self.second:
+            self.advance(second)
+        self.count += 1
+        if label == "positive":
+            self.pos += 1
+        elif label == "negative":
+            self.neg += 1
+
+    def advance(self, now):
+        """Close every second before `now` (also called on a timer so silence ends spikes)."""
+        if self.second is None:
+            return
+        now = int(now)
+        # After a long silence only the most recent empty seconds matter to the EWMA
+        self.second = max(self.second, now - MAX_GAP_SECONDS)
+        while self.second < now:
+            self._close_second()
+            self.second += 1
+            self.count = self.pos = self.neg = 0
+
+    def drain(self):
+        """Return and clear the highlights finished since the last call."""
+        finished, self.finished = self.finished, []
+        return finished
+
+    def _close_second(self):
+        second, count = self.second, self.count
+        z_rate = self.rate.update(count)
+        self._track("hype", self.rate.up, second, count, z_rate, count)
+
+        if count >= MIN_BALANCE_MESSAGES:
+            balance = (self.pos - self.neg) / count
+            z_bal = self.balance.update(balance)
+            self._track(
+                "positive_swing", self.balance.up, second, balance, z_bal, count
+            )
+            self._track(
+                "negative_swing", self.balance.down, second, balance, z_bal, count
+            )
+
+    def _track(self, kind, cusum, second, value, z, count):
+        if kind in self.open and cusum < CUSUM_RELEASE:
+            self._finish(self.open.pop(kind))
+        if cusum == 0:
+            self.rise.pop(kind, None)
+            return
+
+        # CUSUM's change-point estimate is the second the statistic left zero
+        rise = self.rise.setdefault(kind, [second, 0])
+        rise[1] += count
+        event = self.open.get(kind)
+        if event is None:
+            if cusum < CUSUM_THRESHOLD:
+                return
+            event = self.open[kind] = Highlight(kind, rise[0])
+            event.messages = rise[1] - count  # observe() adds this second
+        event.observe(second, value, z, count)
+
+    def _finish(self, event):
+        self.finished.append(
+            {
+                "channel": self.channel,
+                "kind": event.kind,
+                "start_time": float(event.start),
+                # The CUSUM takes a while to decay, so end at the last elevated second
+                "end_time": float(event.last_active + 1),
+                "peak_time": float(event.peak_time),
+                "peak_value": float(event.peak_value),
+                "peak_z": float(event.peak_z),
+                "messages": event.messages,
+            }
+        )
@@ -0,0 +1,292 @@
+# Bucketed sequence classification for the live backend.
+# Messages are padded to a small set of fixed lengths so each shape can be
+# traced (TorchScript) or compiled (torch.compile) once and reused.
+# Imported lazily by primary.load_model(), so torch is only loaded when needed.
+import hashlib
+import os
+import time
+
+import torch
+
+LENGTH_BUCKETS = (8, 16, 32, 64)
+CACHE_DIR = "models/compiled"
+COMPILE_MODES = ("trace", "compile")
+
+
+class LogitsOnly(torch.nn.Module):
+    """Wrap a HF classifier so forward() takes positional tensors and returns logits."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(
+            input_ids=input_ids, attention_mask=attention_mask, return_dict=False
+        )[0]
+
+
+def model_fingerprint(model, device, mode):
+    """Hash everything that would make a cached trace invalid."""
+    name = model.config._name_or_path
+    parts = [name, model.config.to_json_string(), torch.__version__, str(device), mode]
+    # Locally retrained models keep their path, so include the weight files' mtimes
+    if os.path.isdir(name):
+        for file in sorted(os.listdir(name)):
+            if file.endswith((".safetensors", ".bin")):
+                parts.append(f"{file}:{os.path.getmtime(os.path.join(name, file))}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def pipeline_output(labels, probs):
+    """Format rows of class probabilities like pipeline(..., top_k=None)."""
+    return [
+        sorted(
+            ({"label": lbl, "score": p} for lbl, p in zip(labels, row)),
+            key=lambda r: r["score"],
+            reverse=True,
+        )
+        for row in probs
+    ]
+
+
+class BucketedClassifier:
+    """Drop-in replacement for the sentiment pipeline with shape-specialized graphs.
+
+    Called with a list of texts, returns one list of {"label", "score"} dicts per
+    text sorted by score, like pipeline(..., top_k=None). Batches are padded to
+    the smallest length bucket and batch bucket that fit; anything longer than
+    the largest bucket runs the eager model with dynamic padding.
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        device=-1,
+        batch_size=16,
+        mode="trace",
+        length_buckets=LENGTH_BUCKETS,
+        cache_dir=CACHE_DIR,
+    ):
+        if mode not in COMPILE_MODES:
+            raise ValueError(f"mode must be one of {COMPILE_MODES}, got {mode!r}")
+        self.tokenizer = tokenizer
+        self.device = torch.device("cpu" if device == -1 else f"cuda:{device}")
+        self.model = model.to(self.device).eval()
+        self.mode = mode
+        self.batch_size = batch_size
+        self.length_buckets = tuple(sorted(length_buckets))
+        self.batch_buckets = tuple(sorted({1, max(1, batch_size // 4), batch_size}))
+        self.labels = [model.config.id2label[i] for i in range(model.num_labels)]
+        self.cache_dir = cache_dir
+        self.fingerprint = model_fingerprint(model, self.device, mode)
+        self.graphs = {}  # (batch, length) -> traced module, filled on first use
+        self.fallbacks = 0  # batches that ran eagerly because no bucket fit
+
+        self.wrapper = LogitsOnly(self.model).eval()
+        if mode == "compile":
+            # Inductor keeps its compiled kernels in this directory between launches
+            os.environ.setdefault(
+                "TORCHINDUCTOR_CACHE_DIR", os.path.abspath(f"{cache_dir}/inductor")
+            )
+            self.compiled = torch.compile(self.wrapper, dynamic=False)
+
+    def __call__(self, texts):
+        texts = list(texts)
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            results.extend(self._run_batch(texts[i : i + self.batch_size]))
+        return results
+
+    def warmup(self):
+        """Build (or load from disk) the graph for every bucket ahead of real traffic."""
+        for batch in self.batch_buckets:
+            for length in self.length_buckets:
+                ids = torch.full(
+                    (batch, length), self.tokenizer.pad_token_id, dtype=torch.long
+                )
+                mask = torch.ones_like(ids)
+                self._forward(ids.to(self.device), mask.to(self.device))
+
+    def _run_batch(self, texts):
+        encoded = self.tokenizer(
+            texts, truncation=True, return_tensors="pt", padding=True
+        )
+        rows, longest = encoded["input_ids"].shape
+        length = next((b for b in self.length_buckets if b >= longest), None)
+        batch = next((b for b in self.batch_buckets if b >= rows), None)
+
+        if length is None or batch is None:
+            self.fallbacks += 1
+            with torch.inference_mode():
+                logits = self.wrapper(
+                    encoded["input_ids"].to(self.device),
+                    encoded["attention_mask"].to(self.device),
+                )
+        else:
+            ids, mask = self._pad(encoded, batch, length)
+            logits = self._forward(ids, mask)[:rows]
+
+        probs = torch.softmax(logits.float(), dim=-1).cpu().tolist()
+        return pipeline_output(self.labels, probs)
+
+    def _pad(self, encoded, batch, length):
+        """Pad a tokenized batch out to exactly (batch, length)."""
+        ids, mask = encoded["input_ids"], encoded["attention_mask"]
+        rows, cols = ids.shape
+        ids = torch.nn.functional.pad(
+            ids, (0, length - cols), value=self.tokenizer.pad_token_id
+        )
+        mask = torch.nn.functional.pad(mask, (0, length - cols), value=0)
+        if batch > rows:
+            # Filler rows repeat the first message; their outputs are sliced off
+            ids = torch.cat([ids, ids[:1].expand(batch - rows, -1)])
+            mask = torch.cat([mask, mask[:1].expand(batch - rows, -1)])
+        return ids.to(self.device), mask.to(self.device)
+
+    def _forward(self, ids, mask):
+        if self.mode == "compile":
+            graph = self.compiled
+        else:
+            # Tracing has to happen outside inference_mode, so resolve the graph first
+            key = tuple(ids.shape)
+            if key not in self.graphs:
+                self.graphs[key] = self._load_or_trace(ids, mask)
+            graph = self.graphs[key]
+        with torch.inference_mode():
+            return graph(ids, mask)
+
+    def _load_or_trace(self, ids, mask):
+        batch, length = ids.shape
+        path = os.path.join(self.cache_dir, f"{self.fingerprint}_b{batch}_l{length}.pt")
+        if os.path.exists(path):
+            try:
+                return torch.jit.load(path, map_location=self.device)
+            except Exception as e:
+                print(f"Ignoring unreadable trace {path}: {e}")
+
+        start = time.perf_counter()
+        try:
+            with torch.no_grad():
+                traced = torch.jit.trace(self.wrapper, (ids, mask), check_trace=False)
+            traced = torch.jit.freeze(traced.eval())
+        except Exception as e:
+            # Keep serving this shape eagerly rather than failing the batch
+            print(f"Tracing {batch}x{length} failed, using eager: {e}")
+            return self.wrapper
+        os.makedirs(self.cache_dir, exist_ok=True)
+        torch.jit.save(traced, path)
+        print(f"Traced {batch}x{length} in {(time.perf_counter() - start):.1f}s")
+        return traced
+
+
+def mean_pool(hidden, mask):
+    """Average the unpadded token states of each row, L2-normalized, as float16."""
+    mask = mask.unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+    return torch.nn.functional.normalize(pooled.float(), dim=-1).half().cpu()
+
+
+class EmbeddingClassifier:
+    """Eager classifier that also keeps a sentence embedding of every message.
+
+    Same call format as the sentiment pipeline. classify_and_embed() additionally
+    returns a float16 (n, hidden) array of unit vectors, mean-pooled from the last
+    hidden layer of the same forward pass, so embeddings cost no second model run.
+    """
+
+    def __init__(self, model, tokenizer, device=-1, batch_size=16):
+        self.tokenizer = tokenizer
+        self.device = torch.device("cpu" if device == -1 else f"cuda:{device}")
+        self.model = model.to(self.device).eval()
+        self.batch_size = batch_size
+        self.labels = [model.config.id2label[i] for i in range(model.num_labels)]
+
+    def __call__(self, texts):
+        return self.classify_and_embed(texts)[0]
+
+    def classify_and_embed(self, texts):
+        texts = list(texts)
+        results, vectors = [], []
+        for i in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(
+                texts[i : i + self.batch_size],
+                truncation=True,
+                padding=True,
+                return_tensors="pt",
+            ).to(self.device)
+            with torch.inference_mode():
+                output = self.model(**encoded, output_hidden_states=True)
+            probs = torch.softmax(output.logits.float(), dim=-1).cpu().tolist()
+            results.extend(pipeline_output(self.labels, probs))
+            vectors.append(
+                mean_pool(output.hidden_states[-1], encoded["attention_mask"])
+            )
+        if not vectors:
+            return results, torch.empty(0, self.model.config.hidden_size).half().numpy()
+        return results, torch.cat(vectors).numpy()
+
+
+class OnnxClassifier:
+    """Run an exported ONNX classifier (see scripts/export_model.py) with onnxruntime.
+
+    Same call format as the sentiment pipeline. The tokenizer and config.json are
+    read from the directory next to the .onnx file.
+    """
+
+    def __init__(self, onnx_path, tokenizer, labels, batch_size=16):
+        import onnxruntime as ort
+
+        available = ort.get_available_providers()
+        providers = [
+            p
+            for p in ("CUDAExecutionProvider", "CPUExecutionProvider")
+            if p in available
+        ]
+        self.session = ort.InferenceSession(onnx_path, providers=providers)
+        self.tokenizer = tokenizer
+        self.labels = labels
+        self.batch_size = batch_size
+
+    def __call__(self, texts):
+        texts = list(texts)
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(
+                texts[i : i + self.batch_size],
+                truncation=True,
+                padding=True,
+                return_tensors="np",
+            )
+            (logits,) = self.session.run(
+                None,
+                {
+                    "input_ids": encoded["input_ids"].astype("int64"),
+                    "attention_mask": encoded["attention_mask"].astype("int64"),
+                },
+            )
+            probs = torch.softmax(torch.from_numpy(logits).float(), dim=-1).tolist()
+            results.extend(pipeline_output(self.labels, probs))
+        return results
+
+
+def export_onnx(model, tokenizer, path, opset=17):
+    """Export a HF sequence classifier to ONNX with dynamic batch and length axes."""
+    wrapper = LogitsOnly(model.cpu().eval()).eval()
+    encoded = tokenizer(["pog"] * 2, return_tensors="pt", padding=True)
+    axes = {0: "batch", 1: "length"}
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (encoded["input_ids"], encoded["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": axes,
+                "attention_mask": axes,
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+        )
@@ -0,0 +1,149 @@
+# Durable append-only log of raw chat, written before any filtering or inference.
+# Records live in size-rotated segment files named after the offset of their first
+# record, so any offset can be found without an index. Each record is
+#   <payload length u32><crc32 u32><received f64><len u16 x2><len u32><channel><user><text>
+# A torn write at the tail (crash mid-flush) fails its length/CRC check and is
+# truncated away when the log is reopened.
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+HEADER = struct.Struct("<II")
+FIELDS = struct.Struct("<dHHI")
+
+
+def encode(received, channel, user, text):
+    c, u, t = channel.encode(), user.encode(), text.encode()
+    payload = FIELDS.pack(received, len(c), len(u), len(t)) + c + u + t
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode(payload):
+    """Return (received, channel, user, text) from a record payload."""
+    received, lc, lu, lt = FIELDS.unpack_from(payload)
+    start = FIELDS.size
+    channel = bytes(payload[start : start + lc]).decode()
+    user = bytes(payload[start + lc : start + lc + lu]).decode()
+    text = bytes(payload[start + lc + lu : start + lc + lu + lt]).decode()
+    return received, channel, user, text
+
+
+def scan(buffer, size):
+    """Yield (position, payload) for each intact record in a segment buffer."""
+    pos = 0
+    while pos + HEADER.size <= size:
+        length, crc = HEADER.unpack_from(buffer, pos)
+        end = pos + HEADER.size + length
+        if end > size:
+            return
+        payload = buffer[pos + HEADER.size : end]
+        if zlib.crc32(payload) != crc:
+            return
+        yield pos, payload
+        pos = end
+
+
+class IngestLog:
+    """Segment-rotated, group-committed append-only log.
+
+    append() only encodes into an in-memory buffer and hands out the record's
+    offset. take_pending() + write() move a whole group to disk with a single
+    write and fsync; write() is safe to run in a worker thread.
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.bases = sorted(
+            int(name[:-4]) for name in os.listdir(directory) if name.endswith(".log")
+        ) or [0]
+        path = self._path(self.bases[-1])
+        count, valid_end = 0, 0
+        if os.path.exists(path) and os.path.getsize(path):
+            with (
+                open(path, "rb") as f,
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+            ):
+                for pos, payload in scan(mm, len(mm)):
+                    count += 1
+                    valid_end = pos + HEADER.size + len(payload)
+        self.file = open(path, "ab")
+        self.file.truncate(valid_end)  # drop a torn tail record, if any
+
+        self.written = self.bases[-1] + count  # offsets below this are on disk
+        self.next_offset = self.written
+        self.pending = bytearray()
+        self.pending_count = 0
+        self.lock = threading.Lock()  # serializes worker-thread writes with close()
+
+    def _path(self, base):
+        return os.path.join(self.directory, f"{base:020d}.log")
+
+    def append(self, channel, user, text, received):
+        """Buffer one message and return its offset."""
+        self.pending += encode(received, channel, user, text)
+        self.pending_count += 1
+        offset = self.next_offset
+        self.next_offset += 1
+        return offset
+
+    def take_pending(self):
+        """Swap out the buffered group so appends can continue during the write."""
+        data, count = self.pending, self.pending_count
+        self.pending, self.pending_count = bytearray(), 0
+        return data, count
+
+    def write(self, data, count):
+        """Write and fsync one group, rotating to a new segment when this one is full."""
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.written += count
+            if self.file.tell() >= self.segment_bytes:
+                self.file.close()
+                self.bases.append(self.written)
+                self.file = open(self._path(self.written), "ab")
+
+    def flush(self):
+        data, count = self.take_pending()
+        if count:
+            self.write(data, count)
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.file.close()
+
+    def read(self, start=0):
+        return read_log(self.directory, start)
+
+
+def read_log(directory, start=0):
+    """Yield (offset, (received, channel, user, text)) from `start` onward.
+    Read-only, so it is safe to run against a log the backend is still writing.
+    Segments are memory-mapped, so replaying a large log doesn't load it into RAM.
+    """
+    bases = sorted(
+        int(name[:-4]) for name in os.listdir(directory) if name.endswith(".log")
+    )
+    for i, base in enumerate(bases):
+        if i + 1 < len(bases) and bases[i + 1] <= start:
+            continue
+        path = os.path.join(directory, f"{base:020d}.log")
+        if not os.path.getsize(path):
+            continue
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            offset = base
+            for _, payload in scan(mm, len(mm)):
+                if offset >= start:
+                    yield offset, decode(payload)
+                offset += 1
@@ -0,0 +1,237 @@
+# Lightweight Twitch chat ingest over raw IRC-on-websocket.
+# An alternative to twitchAPI.chat.Chat for very busy channels: each PRIVMSG is
+# cut out of the line with a few str.find() calls and handed straight to the
+# backend, without building room/user objects. IRCv3 tags are kept as the raw
+# string and only parsed if something asks for them.
+import asyncio
+import random
+import time
+
+import aiohttp
+
+TWITCH_IRC_URL = "wss://irc-ws.chat.twitch.tv:443"
+RECONNECT_MAX_SECONDS = 30
+# Twitch allows 20 channel joins per 10 seconds per account
+JOIN_BATCH = 20
+JOIN_INTERVAL_SECONDS = 10.5
+
+
+class IrcMessage:
+    """One PRIVMSG. Tags are parsed on first access."""
+
+    __slots__ = ("channel", "user", "text", "raw_tags", "_tags")
+
+    def __init__(self, channel, user, text, raw_tags):
+        self.channel = channel
+        self.user = user
+        self.text = text
+        self.raw_tags = raw_tags
+        self._tags = None
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            self._tags = dict(
+                tag.split("=", 1) if "=" in tag else (tag, "")
+                for tag in self.raw_tags.split(";")
+                if tag
+            )
+        return self._tags
+
+    def tag(self, key):
+        """Look up one tag without parsing the others."""
+        start = self.raw_tags.find(key + "=")
+        # Only match at a tag boundary (start of string or after ';')
+        while start > 0 and self.raw_tags[start - 1] != ";":
+            start = self.raw_tags.find(key + "=", start + 1)
+        if start < 0:
+            return None
+        start += len(key) + 1
+        end = self.raw_tags.find(";", start)
+        return self.raw_tags[start : end if end >= 0 else None]
+
+
+def parse_privmsg(line):
+    """Return an IrcMessage for a PRIVMSG line, or None for anything else.
+
+    Expected shape: @tags :nick!nick@nick.tmi.twitch.tv PRIVMSG #channel :text
+    """
+    raw_tags = ""
+    rest = 0
+    if line.startswith("@"):
+        rest = line.find(" ") + 1
+        raw_tags = line[1 : rest - 1]
+    if not line.startswith(":", rest):
+        return None
+    nick_end = line.find("!", rest)
+    command = line.find(" ", rest) + 1
+    if nick_end < 0 or not line.startswith("PRIVMSG #", command):
+        return None
+    channel_start = command + 9
+    channel_end = line.find(" ", channel_start)
+    if channel_end < 0:
+        return None
+    text_start = (
+        channel_end + 2 if line.startswith(" :", channel_end) else channel_end + 1
+    )
+    return IrcMessage(
+        line[channel_start:channel_end],
+        line[rest + 1 : nick_end],
+        line[text_start:],
+        raw_tags,
+    )
+
+
+class IrcClient:
+    """Read-only Twitch IRC connection that calls on_message(IrcMessage) per chat line.
+
+    Logs in anonymously (justinfan) unless a token and nick are given, and
+    reconnects with exponential backoff. record_path appends every raw line to
+    a file, which scripts/fake_irc_server.py can replay.
+
+    Channels are joined in paced batches; joined_channels holds the ones the
+    server confirmed and failed_channels the ones it refused (channel -> NOTICE
+    msg-id), so callers can move or drop channels that never join.
+    """
+
+    def __init__(
+        self,
+        channels,
+        on_message,
+        url=TWITCH_IRC_URL,
+        token=None,
+        nick=None,
+        record_path=None,
+        join_interval=JOIN_INTERVAL_SECONDS,
+    ):
+        self.channels = [c.lower().lstrip("#") for c in channels]
+        self.on_message = on_message
+        self.url = url
+        self.token = token
+        self.nick = nick
+        self.record_path = record_path
+        self.join_interval = join_interval
+        self.joined = asyncio.Event()
+        self.joined_channels = set()
+        self.failed_channels = {}
+        self.join_requested = {}  # channel -> time its JOIN was sent
+        self.next_join_at = 0.0
+        self.ws = None
+        self.lines = 0  # every line seen, for throughput stats
+
+    async def run(self):
+        """Connect and read until cancelled, reconnecting on errors."""
+        backoff = 1
+        while True:
+            try:
+                await self._session()
+                backoff = 1
+            except (aiohttp.ClientError, ConnectionError, OSError) as e:
+                print(f"IRC connection lost: {e}")
+            self.ws = None
+            self.joined.clear()
+            self.joined_channels.clear()
+            self.join_requested.clear()
+            await asyncio.sleep(backoff + random.random())
+            backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+
+    async def _session(self):
+        record = (
+            open(self.record_path, "a", encoding="utf-8") if self.record_path else None
+        )
+        try:
+            async with (
+                aiohttp.ClientSession() as session,
+                session.ws_connect(self.url, heartbeat=None, max_msg_size=0) as ws,
+            ):
+                await self._login(ws)
+                self.ws = ws
+                joining = asyncio.create_task(self._send_joins(ws, self.channels))
+                try:
+                    await self._read(ws, record)
+                finally:
+                    joining.cancel()
+        finally:
+            if record is not None:
+                record.close()
+
+    async def _read(self, ws, record):
+        async for frame in ws:
+            if frame.type != aiohttp.WSMsgType.TEXT:
+                if frame.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    return
+                continue
+            if record is not None:
+                record.write(frame.data)
+            if await self._handle_frame(ws, frame.data):
+                return  # server asked us to reconnect
+
+    async def _login(self, ws):
+        await ws.send_str("CAP REQ :twitch.tv/tags twitch.tv/commands")
+        if self.token and self.nick:
+            await ws.send_str(f"PASS oauth:{self.token.removeprefix('oauth:')}")
+            await ws.send_str(f"NICK {self.nick.lower()}")
+        else:
+            await ws.send_str(f"NICK justinfan{random.randint(10000, 99999)}")
+
+    async def _send_joins(self, ws, channels):
+        # Twitch accepts a comma-separated JOIN; keep lines well under the 512 byte limit
+        channels = list(channels)
+        for i in range(0, len(channels), JOIN_BATCH):
+            # Shared deadline, so concurrent join() calls are paced together
+            while (delay := self.next_join_at - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+            batch = [c for c in channels[i : i + JOIN_BATCH] if c in self.channels]
+            if not batch:
+                continue
+            now = time.monotonic()
+            for channel in batch:
+                self.join_requested[channel] = now
+            await ws.send_str("JOIN " + ",".join(f"#{c}" for c in batch))
+            self.next_join_at = time.monotonic() + self.join_interval
+
+    async def join(self, channels):
+        """Add channels; joined right away if connected, otherwise on (re)connect."""
+        channels = [c.lower().lstrip("#") for c in channels]
+        channels = [c for c in channels if c not in self.channels]
+        self.channels.extend(channels)
+        for channel in channels:
+            self.failed_channels.pop(channel, None)
+        if self.ws is not None and not self.ws.closed:
+            await self._send_joins(self.ws, channels)
+
+    async def part(self, channels):
+        """Stop following channels."""
+        channels = [c.lower().lstrip("#") for c in channels]
+        self.channels = [c for c in self.channels if c not in channels]
+        for channel in channels:
+            self.joined_channels.discard(channel)
+            self.join_requested.pop(channel, None)
+        if self.ws is not None and not self.ws.closed and channels:
+            await self.ws.send_str("PART " + ",".join(f"#{c}" for c in channels))
+
+    async def _handle_frame(self, ws, data):
+        """Dispatch every line in one websocket frame; True means reconnect."""
+        for line in data.split("\r\n"):
+            if not line:
+                continue
+            self.lines += 1
+            msg = parse_privmsg(line)
+            if msg is not None:
+                self.on_message(msg)
+            elif line.startswith("PING"):
+                await ws.send_str("PONG" + line[4:])
+            elif " JOIN #" in line:
+                self.joined_channels.add(line[line.find(" JOIN #") + 7 :])
+                self.joined.set()
+            elif " 366 " in line:
+                self.joined.set()
+            elif " NOTICE #" in line:
+                # e.g. @msg-id=msg_channel_suspended :tmi.twitch.tv NOTICE #chan :...
+                start = line.find(" NOTICE #") + 9
+                channel = line[start : line.find(" ", start)]
+                if channel not in self.joined_channels and line.startswith("@msg-id="):
+                    self.failed_channels[channel] = line[8 : line.find(" ")]
+            elif " RECONNECT" in line:
+                return True
+        return False
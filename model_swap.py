@@ -0,0 +1,79 @@
+# Shadow comparison of a candidate model against the live one.
+# While a trial runs, scored batches are also sent to the candidate in the
+# background, skipping any that arrive while it is still busy; the backend
+# promotes the candidate between batches once enough traffic has been compared,
+# or keeps the live model if the candidate disagrees or is too slow.
+import time
+
+SHADOW_MESSAGES = 2000  # messages compared before deciding
+SHADOW_MAX_SECONDS = 300  # decide with whatever was seen after this long
+MIN_AGREEMENT = 0.8  # share of top labels that must match the live model
+MAX_SLOWDOWN = 2.0  # candidate p50 batch time may be at most this x live
+
+
+def top_labels(results):
+    return [r[0]["label"] for r in results]
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else 0.0
+
+
+class ShadowTrial:
+    """Agreement and latency of a candidate model on the live model's batches."""
+
+    def __init__(
+        self,
+        swap_id,
+        classifier,
+        version,
+        min_agreement=MIN_AGREEMENT,
+        max_slowdown=MAX_SLOWDOWN,
+        force=False,
+    ):
+        self.swap_id = swap_id
+        self.classifier = classifier
+        self.version = version
+        self.min_agreement = min_agreement
+        self.max_slowdown = max_slowdown
+        self.force = force
+        self.started = time.time()
+        self.messages = 0
+        self.agreed = 0
+        self.live_ms = []
+        self.candidate_ms = []
+
+    def compare(self, live_results, candidate_results, live_ms, candidate_ms):
+        live, candidate = top_labels(live_results), top_labels(candidate_results)
+        self.messages += len(live)
+        self.agreed += sum(a == b for a, b in zip(live, candidate))
+        self.live_ms.append(live_ms)
+        self.candidate_ms.append(candidate_ms)
+
+    def done(self):
+        return (
+            self.messages >= SHADOW_MESSAGES
+            or time.time() - self.started >= SHADOW_MAX_SECONDS
+        )
+
+    def stats(self):
+        return {
+            "messages": self.messages,
+            "agreement": self.agreed / self.messages if self.messages else None,
+            "live_p50_ms": median(self.live_ms),
+            "candidate_p50_ms": median(self.candidate_ms),
+        }
+
+    def verdict(self):
+        """Return (promote, reason)."""
+        if self.force:
+            return True, "forced"
+        stats = self.stats()
+        if not self.messages:
+            return False, "no chat traffic to compare on"
+        if stats["agreement"] < self.min_agreement:
+            return False, f"agreement {stats['agreement']:.1%} below threshold"
+        if stats["candidate_p50_ms"] > self.max_slowdown * stats["live_p50_ms"]:
+            return False, "candidate too slow"
+        return True, "passed shadow comparison"
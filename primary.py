@@ -2,65 +2,235 @@ from twitchAPI.chat import Chat, ChatMessage
 from twitchAPI.type import AuthScope, ChatEvent, VideoType, SortMethod
 from twitchAPI.twitch import Twitch
 import asyncio
+import hashlib
 import os
-
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
-import torch
-from torch.utils.data import Dataset
+import signal
 
 import aiosqlite
 import time
 
+# transformers/torch are imported inside load_model() so chat can be joined
+# while they load in a background thread
+
 # Config
 import config
+from alerts import WATCHLIST_PATH, AlertMonitor
+from batches import BatchQueue
+from chat_search import FTS_TABLE_SQL, INDEX_NEW_ROWS_SQL, REBUILD_SQL
+from embeddings import EMBEDDINGS_TABLE_SQL, decode, encode
+from highlights import SpikeDetector
+from ingest_log import IngestLog
+from model_swap import ShadowTrial
+from sketches import TrendingTerms, UniqueChatters
+from topics import TopicClusters
+
+# Message flow: chat is collected into MessageBatch columns, and each stage moves
+# whole batches, so queue overhead is paid per batch rather than per message
+BATCH_SIZE = 16
+raw_queue = BatchQueue(BATCH_SIZE)
+results_queue = asyncio.Queue()  # scored MessageBatch objects
+
+# Watched phrases are matched on the ingest path, before the model sees a message
+alert_monitor = AlertMonitor(WATCHLIST_PATH)
 
-# Async queues for message flow
-raw_queue = asyncio.Queue()
-results_queue = asyncio.Queue()
+# Per-channel online spike detectors, trending-term sketches and (with embeddings)
+# topic clusters, fed by writer_worker
+detectors = {}
+trending = {}
+chatters = {}
+topics = {}
+TRENDING_TOP_K = 15  # terms stored per channel per minute
+TRENDING_FLUSH_SECONDS = 5  # how often the in-progress minute is persisted
 
 HF_REPO = "muyihenhen/twitch-roberta-sentiment-v1"
 LOCAL_DIR = "models/twitch-sentiment-v2"  # local filepath for model
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "twitch_data.db")
+INGEST_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_log")
+GROUP_COMMIT_SECONDS = 0.05  # max time a received message waits to reach disk
+LAG_REPORT_SECONDS = 10  # how often end-to-end lag percentiles are stored
+LAG_ALERT_SECONDS = float(os.getenv("LAG_ALERT_SECONDS", "5"))  # warn above this p95
+CONSUMER = "inference"  # name under which the writer records its log offset
+
+# Opened by run_backend_async; every received message is appended before filtering
+ingest_log = None
+
+# End-to-end lag (commit time - Twitch send time) of messages committed since the
+# last report, and the latest batch's median, which the timer workers subtract
+# from the clock so their windows close in step with the chat being processed
+lag_samples = []
+current_lag = 0.0
+# Messages replayed from the ingest log at startup have offsets below this. Their
+# send time is the old receive time, so they are kept out of the lag samples and
+# the live detectors, which would otherwise see hours of lag and a clock going back
+live_offset = 0
+
+# (classifier, version) used for the next batch. Only reassigned on the event
+# loop, so a hot swap takes effect between batches and never drops messages
+live_model = None
+shadow = None  # ShadowTrial while a candidate model is being compared
+SWAP_POLL_SECONDS = 2
+# Batches waiting for the candidate model. The trial only samples live traffic:
+# when the candidate falls behind, batches are skipped rather than delaying chat
+SHADOW_QUEUE_BATCHES = 2
+shadow_queue = asyncio.Queue(maxsize=SHADOW_QUEUE_BATCHES)
+
+# "float16" or "int8" to store an embedding of every message (see embeddings.py)
+embedding_format = None
 
 TARGET_SCOPES = [AuthScope.CHAT_READ, AuthScope.CHAT_EDIT]
 
+# Approximate token lengths of typical chat messages, used to warm up kernels
+WARMUP_LENGTHS = (8, 16, 32, 64)
+
+# Seconds spent in each startup phase, reported once chat and model are both ready
+startup_times = {}
+
 
-class ListDataset(Dataset):
-    def __init__(self, original_list):
-        self.original_list = original_list
+def use_store(directory):
+    """Keep this backend's database and ingest log in `directory` (one per session)."""
+    global DB_PATH, INGEST_LOG_DIR
+    DB_PATH = os.path.join(directory, "twitch_data.db")
+    INGEST_LOG_DIR = os.path.join(directory, "ingest_log")
 
-    def __len__(self):
-        return len(self.original_list)
 
-    def __getitem__(self, i):
-        return self.original_list[i]
+def record_startup(phase, start):
+    """Store how long a startup phase took, measured from a perf_counter() start."""
+    startup_times[phase] = time.perf_counter() - start
 
 
-def load_model():
-    """Load sentiment classifier from local or HuggingFace."""
+def report_startup(launch_start):
+    """Print the startup time breakdown."""
+    total = time.perf_counter() - launch_start
+    print("--- Startup Breakdown ---")
+    for phase, seconds in startup_times.items():
+        print(f"  {phase:<14} {seconds * 1000:8.0f} ms")
+    print(f"  {'total':<14} {total * 1000:8.0f} ms (model and chat phases overlap)")
+    print(f"  {len(raw_queue)} messages buffered while the model was loading")
+
+
+def load_model(
+    warmup=True, compile_mode=None, model_path=None, model_format=None, embed=False
+):
+    """Load sentiment classifier from local or HuggingFace.
+    compile_mode "trace" or "compile" swaps the eager pipeline for a BucketedClassifier.
+    model_format "onnx" loads an exported .onnx file (or a directory holding
+    model.onnx) with onnxruntime; "quantized" applies dynamic int8 quantization
+    to the Linear layers and runs on CPU. embed loads an EmbeddingClassifier,
+    which also returns message embeddings; traced, compiled and ONNX graphs only
+    output logits, so they run without embeddings.
+    """
     print("Loading model...")
-    MODEL_PATH = LOCAL_DIR if os.path.exists(LOCAL_DIR) else HF_REPO
+    start = time.perf_counter()
+    import torch
+    from transformers import (
+        AutoConfig,
+        AutoModelForSequenceClassification,
+        AutoTokenizer,
+        pipeline,
+    )
+
+    record_startup("imports", start)
+    MODEL_PATH = model_path or (LOCAL_DIR if os.path.exists(LOCAL_DIR) else HF_REPO)
 
     try:
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-        model = AutoModelForSequenceClassification.from_pretrained(
-            MODEL_PATH, num_labels=3
-        )
-        device = 0 if torch.cuda.is_available() else -1
-        classifier = pipeline(
-            "sentiment-analysis",
-            model=model,
-            tokenizer=tokenizer,
-            device=device,
-            top_k=None,
-            batch_size=16,
-        )
+        start = time.perf_counter()
+        if model_format == "onnx":
+            from inference import OnnxClassifier
+
+            onnx_path = MODEL_PATH
+            if os.path.isdir(MODEL_PATH):
+                onnx_path = os.path.join(MODEL_PATH, "model.onnx")
+            model_dir = os.path.dirname(onnx_path)
+            model_config = AutoConfig.from_pretrained(model_dir)
+            labels = [model_config.id2label[i] for i in range(model_config.num_labels)]
+            classifier = OnnxClassifier(
+                onnx_path, AutoTokenizer.from_pretrained(model_dir), labels
+            )
+            record_startup("load_weights", start)
+        else:
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+            # safetensors checkpoints are memory-mapped rather than read into a buffer,
+            # and low_cpu_mem_usage skips the random init that gets overwritten anyway
+            local_safetensors = os.path.join(MODEL_PATH, "model.safetensors")
+            model = AutoModelForSequenceClassification.from_pretrained(
+                MODEL_PATH,
+                num_labels=3,
+                low_cpu_mem_usage=True,
+                use_safetensors=True if os.path.exists(local_safetensors) else None,
+            )
+            record_startup("load_weights", start)
+
+            device = 0 if torch.cuda.is_available() else -1
+            if model_format == "quantized":
+                # Dynamic quantization kernels are CPU-only
+                model = torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                device = -1
+            if embed and not compile_mode:
+                from inference import EmbeddingClassifier
+
+                classifier = EmbeddingClassifier(
+                    model, tokenizer, device=device, batch_size=16
+                )
+            elif compile_mode:
+                from inference import BucketedClassifier
+
+                classifier = BucketedClassifier(
+                    model, tokenizer, device=device, batch_size=16, mode=compile_mode
+                )
+            else:
+                classifier = pipeline(
+                    "sentiment-analysis",
+                    model=model,
+                    tokenizer=tokenizer,
+                    device=device,
+                    top_k=None,
+                    batch_size=16,
+                )
+        if embed and not hasattr(classifier, "classify_and_embed"):
+            print("This model format outputs logits only; embeddings are disabled")
+        if warmup:
+            start = time.perf_counter()
+            warmup_model(classifier)
+            record_startup("warmup", start)
         return classifier
     except Exception as e:
         print(f"Error loading model: {e}")
         return None
 
 
+def model_version(model_path=None, model_format=None, compile_mode=None):
+    """Name stored with every scored row, e.g. "twitch-sentiment-v2:eager@3f2a9c1e".
+    Local models get a short hash of their weight files' mtimes, so a retrained
+    checkpoint at the same path gets a new version.
+    """
+    path = model_path or (LOCAL_DIR if os.path.exists(LOCAL_DIR) else HF_REPO)
+    version = f"{os.path.basename(path.rstrip('/'))}:{model_format or compile_mode or 'eager'}"
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    if os.path.isdir(directory):
+        stamps = [
+            f"{name}:{os.path.getmtime(os.path.join(directory, name))}"
+            for name in sorted(os.listdir(directory))
+            if name.endswith((".safetensors", ".bin", ".onnx"))
+        ]
+        if stamps:
+            version += "@" + hashlib.sha1("|".join(stamps).encode()).hexdigest()[:8]
+    return version
+
+
+def warmup_model(classifier, batch_size=16):
+    """Run throwaway batches at typical lengths so the first real batches are not cold."""
+    if hasattr(classifier, "warmup"):
+        # Compiled classifiers build (or load from disk) one graph per shape bucket
+        classifier.warmup()
+        return
+    for length in WARMUP_LENGTHS:
+        text = " ".join(["pog"] * length)
+        classifier([text])
+        classifier([text] * batch_size)
+
+
 async def get_session_info(twitch, channel_name):
     """Get the broadcaster's user ID and current VOD ID at connect time."""
     user_id = None
@@ -91,6 +261,8 @@ async def init_db():
     async with aiosqlite.connect(DB_PATH) as db:
         # Set timeout to prevent "database is locked" errors
         await db.execute("PRAGMA busy_timeout = 5000")  # 5 second timeout
+        # timestamp is when Twitch received the message (tmi-sent-ts); latency is
+        # the model time of the message's batch in ms
         await db.execute("""
             CREATE TABLE IF NOT EXISTS chat_log (
                 timestamp REAL,
@@ -98,12 +270,39 @@ async def init_db():
                 message TEXT,
                 label TEXT,
                 score REAL,
-                latency REAL
+                latency REAL,
+                received_time REAL,
+                scored_time REAL,
+                committed_time REAL,
+                model_version TEXT
             )
         """)
+        # Databases from before the pipeline timestamps and model versions were added
+        async with db.execute("PRAGMA table_info(chat_log)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        for column, kind in (
+            ("received_time", "REAL"),
+            ("scored_time", "REAL"),
+            ("committed_time", "REAL"),
+            ("model_version", "TEXT"),
+        ):
+            if column not in columns:
+                await db.execute(f"ALTER TABLE chat_log ADD COLUMN {column} {kind}")
+
+        # Full-text index over chat_log.message, filled by writer_worker
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'chat_fts'"
+        ) as cursor:
+            has_fts = await cursor.fetchone() is not None
+        await db.execute(FTS_TABLE_SQL)
+        if not has_fts:
+            await db.execute(REBUILD_SQL)  # index rows written before it existed
         # The index makes querying the last 2 seconds instant
         await db.execute("CREATE INDEX IF NOT EXISTS idx_time ON chat_log(timestamp)")
 
+        # Message embeddings, when the backend runs with embeddings enabled
+        await db.execute(EMBEDDINGS_TABLE_SQL)
+
         await db.execute("""
             CREATE TABLE IF NOT EXISTS session_info (
                 user_id TEXT,
@@ -113,16 +312,198 @@ async def init_db():
             )
         """)
 
+        # Clip-worthy spikes found by the online detector (highlights.py)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS highlights (
+                channel TEXT,
+                kind TEXT,
+                start_time REAL,
+                end_time REAL,
+                peak_time REAL,
+                peak_value REAL,
+                peak_z REAL,
+                messages INTEGER
+            )
+        """)
+
+        # Top terms per channel per minute, from fixed-size Space-Saving sketches
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS trending_terms (
+                bucket REAL,
+                channel TEXT,
+                term TEXT,
+                count INTEGER,
+                error INTEGER,
+                sentiment REAL
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_trending ON trending_terms(bucket, channel)"
+        )
+
+        # Chat topics per channel per minute, from online k-means on the message
+        # embeddings (topics.py); topic ids stay the same across minutes
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS topic_clusters (
+                bucket REAL,
+                channel TEXT,
+                topic INTEGER,
+                label TEXT,
+                messages INTEGER,
+                sentiment REAL,
+                pos_count INTEGER,
+                neg_count INTEGER,
+                example TEXT
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_topics ON topic_clusters(bucket, channel)"
+        )
+
+        # Distinct chatters per channel per second (resolution 1) and minute (60).
+        # Each row keeps a compressed HyperLogLog so ranges can be merged later,
+        # plus sentiment averaged per user instead of per message
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS chatter_sketches (
+                bucket REAL,
+                channel TEXT,
+                resolution INTEGER,
+                chatters REAL,
+                messages INTEGER,
+                user_pos REAL,
+                user_neg REAL,
+                sketch BLOB
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chatters ON chatter_sketches(resolution, bucket)"
+        )
+
+        # Next ingest log offset each consumer still has to process. Updated in the
+        # same transaction as the rows it covers, so a restart resumes exactly
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_offsets (
+                consumer TEXT PRIMARY KEY,
+                next_offset INTEGER
+            )
+        """)
+
+        # End-to-end lag percentiles in seconds, one row per LAG_REPORT_SECONDS
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_lag (
+                time REAL,
+                messages INTEGER,
+                p50 REAL,
+                p95 REAL,
+                p99 REAL,
+                max REAL
+            )
+        """)
+
+        # Hot-swap requests (scripts/swap_model.py) and their shadow comparison results
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS model_swaps (
+                id INTEGER PRIMARY KEY,
+                requested REAL,
+                path TEXT,
+                format TEXT,
+                force INTEGER,
+                status TEXT,
+                version TEXT,
+                messages INTEGER,
+                agreement REAL,
+                live_p50_ms REAL,
+                candidate_p50_ms REAL,
+                note TEXT
+            )
+        """)
+
+        # Watched phrases that crossed their rate threshold (see alerts.py)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY,
+                time REAL,
+                channel TEXT,
+                phrase TEXT,
+                count INTEGER,
+                seconds INTEGER,
+                threshold INTEGER,
+                message TEXT
+            )
+        """)
+
         # WAL mode allows Streamlit to read while this script is writing
         await db.execute("PRAGMA journal_mode=WAL")
         await db.commit()
 
 
-async def on_message(msg: ChatMessage):
-    """Twitch chat event handler. Filter and queue valid messages."""
-    if msg.user in config.bot_list or msg.text.startswith("!") or "http" in msg.text:
+def should_skip(user, text):
+    """Filter out bots, commands and links."""
+    return user in config.bot_list or text.startswith("!") or "http" in text
+
+
+def ingest(channel, user, text, sent_ms=None):
+    """Log, filter and queue one chat message. Shared by both ingest backends.
+    sent_ms is Twitch's tmi-sent-ts; the local receive time stands in if it's missing.
+    """
+    received = time.time()
+    offset = ingest_log.append(channel, user, text, received)
+    if should_skip(user, text):
         return
-    raw_queue.put_nowait((msg.room.name, msg.text))
+    sent = int(sent_ms) / 1000 if sent_ms else received
+    alert_monitor.check(channel, sent, text)
+    # The user only feeds the unique-chatter sketches; it is never stored per row
+    raw_queue.put(channel, text, user, offset, sent, received)
+
+
+async def on_message(msg: ChatMessage):
+    """Twitch chat event handler."""
+    ingest(msg.room.name, msg.user.name, msg.text, msg.sent_timestamp)
+
+
+def on_irc_message(msg):
+    """Raw IRC ingest handler (irc_client.IrcClient)."""
+    ingest(msg.channel, msg.user, msg.text, msg.tag("tmi-sent-ts"))
+
+
+async def ingest_log_worker(stop):
+    """Group commit: write everything appended since the last tick with one fsync.
+    Once `stop` is set, the group being written finishes, then the rest is flushed
+    and the log closed from the event loop, so no append or write can race it.
+    """
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), GROUP_COMMIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        data, count = ingest_log.take_pending()
+        if count:
+            await asyncio.to_thread(ingest_log.write, data, count)
+    ingest_log.close()
+
+
+async def resume_from_log():
+    """Requeue logged messages the writer never committed (e.g. after a crash).
+    A fresh database has no offset yet, so it starts from the end of the log.
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            "SELECT next_offset FROM ingest_offsets WHERE consumer = ?", (CONSUMER,)
+        ) as cursor:
+            row = await cursor.fetchone()
+    global live_offset
+    live_offset = ingest_log.next_offset
+    if row is None:
+        return 0
+
+    resumed = 0
+    # The log keeps only the receive time, so it stands in for the send time here
+    for offset, (received, channel, user, text) in ingest_log.read(row[0]):
+        if not should_skip(user, text):
+            raw_queue.put(channel, text, user, offset, received, received)
+            resumed += 1
+    print(f"Resumed {resumed} unprocessed messages from offset {row[0]}")
+    return resumed
 
 
 # async def run_inference(classifier, text):
@@ -151,95 +532,501 @@ async def on_message(msg: ChatMessage):
 #         print(f"Inference Error: {e}")
 
 
-async def model_worker(classifier, batch_size=16):
+async def model_worker(model_task, version):
     """Process messages using Natural Batching.
     Instant response on low load, automatically batches on high load.
+    Messages queued before the model finishes loading are buffered in raw_queue.
+    If it fails to load, nothing is scored; serve() then stops the backend, and the
+    buffered messages stay in the ingest log for the next start.
     """
-    print("Model worker started.")
+    global live_model
+    classifier = await model_task
+    if classifier is None:
+        return
+    live_model = (classifier, version)
+    print(f"Model worker started ({version}).")
     while True:
-        # 1. Wait for at least one message (0% CPU when chat is silent)
-        channel, text = await raw_queue.get()
-        batch = [(channel, text)]
-        raw_queue.task_done()
-
-        # 2. Grab any other messages that accumulated while the GPU was busy
-        while len(batch) < batch_size and not raw_queue.empty():
-            try:
-                channel_next, text_next = raw_queue.get_nowait()
-                batch.append((channel_next, text_next))
-                raw_queue.task_done()
-            except asyncio.QueueEmpty:
-                break
-
-        # 3. Process batch sequentially to keep GPU operations ordered and simple
-        await process_batch(classifier, batch)
-
-
-async def process_batch(classifier, batch):
-    """Helper to send a batch of messages to the classifier using PyTorch Datasets."""
-    try:
-        channels = [item[0] for item in batch]
-        texts = [item[1] for item in batch]
+        # 1. Wait for a batch (0% CPU when chat is silent). Messages that arrived
+        # while the GPU was busy are already collected into it, up to BATCH_SIZE
+        batch = await raw_queue.get()
+
+        # 2. Process batches sequentially to keep GPU operations ordered and simple
+        await process_batch(batch)
+
+
+def classify(classifier, texts):
+    """Return (pipeline results, encoded embeddings or None). Embeddings come from
+    the same forward pass when they are enabled and the classifier supports them.
+    """
+    if embedding_format and hasattr(classifier, "classify_and_embed"):
+        results, vectors = classifier.classify_and_embed(texts)
+        return results, encode(vectors, embedding_format)
+    return classifier(texts), None
 
-        # Wrap texts in ListDataset so Hugging Face uses native GPU pipelining
-        dataset = ListDataset(texts)
 
+async def process_batch(batch):
+    """Score one MessageBatch with the live model and pass it on to the writer."""
+    classifier, version = live_model
+    try:
+        # A plain list is batched through the same DataLoader as a Dataset, but the
+        # pipeline returns a finished list, so inference stays off the event loop
         start = time.perf_counter()
-        results = await asyncio.to_thread(classifier, dataset)
+        results, embedded = await asyncio.to_thread(classify, classifier, batch.texts)
         latency_ms = (time.perf_counter() - start) * 1000
+        batch.set_results(results, latency_ms, time.time(), version, embedded)
+        results_queue.put_nowait(batch)
+
+    except Exception as e:
+        print(f"Batch Inference Error: {e}")
+        return
+
+    # 3. During a trial, hand a copy of the batch to the candidate (the writer
+    # merges batches in place) unless it is still busy with earlier ones
+    if shadow is not None:
+        try:
+            shadow_queue.put_nowait((shadow, list(batch.texts), results, latency_ms))
+        except asyncio.QueueFull:
+            pass
 
-        for i, result in enumerate(results):
-            top_label = result[0]["label"]
-            top_score = result[0]["score"]
 
-            results_queue.put_nowait(
-                (channels[i], texts[i], (top_label, top_score, latency_ms))
+async def shadow_worker():
+    """Score sampled live batches with the candidate model, off the live path."""
+    while True:
+        trial, texts, results, latency_ms = await shadow_queue.get()
+        if trial is not shadow:
+            continue  # the trial ended while this batch was queued
+        try:
+            start = time.perf_counter()
+            candidate = await asyncio.to_thread(trial.classifier, texts)
+            trial.compare(
+                results, candidate, latency_ms, (time.perf_counter() - start) * 1000
             )
+        except Exception as e:
+            print(f"Shadow Inference Error ({trial.version}): {e}")
 
-    except Exception as e:
-        print(f"Batch Inference Error: {e}")
+
+async def update_swap(swap_id, **fields):
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute(
+            f"UPDATE model_swaps SET {', '.join(f'{k} = ?' for k in fields)} "
+            "WHERE id = ?",
+            [*fields.values(), swap_id],
+        )
+        await db.commit()
+
+
+async def swap_worker():
+    """Load requested models in the background, shadow them, then promote or reject."""
+    global live_model, shadow
+    while True:
+        await asyncio.sleep(SWAP_POLL_SECONDS)
+        if shadow is not None:
+            if not shadow.done():
+                continue
+            trial, shadow = shadow, None
+            promote, reason = trial.verdict()
+            if promote:
+                live_model = (trial.classifier, trial.version)
+            print(
+                f"Model {trial.version} {'promoted' if promote else 'rejected'}: {reason}"
+            )
+            await update_swap(
+                trial.swap_id,
+                status="live" if promote else "rejected",
+                note=reason,
+                **trial.stats(),
+            )
+            continue
+
+        if live_model is None:
+            continue
+        async with aiosqlite.connect(DB_PATH) as db:
+            async with db.execute(
+                """SELECT id, path, format, force FROM model_swaps
+                WHERE status = 'pending' ORDER BY id LIMIT 1"""
+            ) as cursor:
+                request = await cursor.fetchone()
+        if request is None:
+            continue
+
+        swap_id, path, model_format, force = request
+        await update_swap(swap_id, status="loading")
+        print(f"Loading candidate model {path} ({model_format or 'eager'})...")
+        classifier = await asyncio.to_thread(
+            load_model,
+            model_path=path,
+            model_format=model_format,
+            compile_mode=model_format if model_format in ("trace", "compile") else None,
+            embed=bool(embedding_format),
+        )
+        if classifier is None:
+            await update_swap(swap_id, status="failed", note="could not load model")
+            continue
+        version = model_version(path, model_format)
+        await update_swap(swap_id, status="shadow", version=version)
+        shadow = ShadowTrial(swap_id, classifier, version, force=bool(force))
 
 
 async def writer_worker():
     """Write results to SQLite."""
     while True:
-        # 1. Wait for at least one item
-        channel, text, sentiment = await results_queue.get()
-        label, score, latency = sentiment
-
-        rows = [[time.time(), channel, text, label, score, latency]]
+        # 1. Wait for at least one batch, then merge any others already waiting
+        batch = await results_queue.get()
         results_queue.task_done()
-
         while not results_queue.empty():
-            try:
-                c, t, s = results_queue.get_nowait()
-                lbl, scr, lat = s
-                rows.append([time.time(), c, t, lbl, scr, lat])
-                results_queue.task_done()
-            except asyncio.QueueEmpty:
-                break
-
-        # Bulk insert and commit once
+            batch.extend(results_queue.get_nowait())
+            results_queue.task_done()
+
+        channels = batch.channels()
+        labels = batch.label_names()
+
+        # Feed the spike detectors and sketches by send time (bounded work per message)
+        for channel, sent, text, user, label, score, offset in zip(
+            channels,
+            batch.sent,
+            batch.texts,
+            batch.users,
+            labels,
+            batch.scores,
+            batch.offsets,
+        ):
+            if offset < live_offset:
+                continue
+            detector = detectors.get(channel)
+            if detector is None:
+                detector = detectors[channel] = SpikeDetector(channel)
+                trending[channel] = TrendingTerms(channel)
+                chatters[channel] = UniqueChatters(channel)
+            detector.add(sent, label)
+            trending[channel].add(sent, text, label, score)
+            chatters[channel].add(sent, user, label, score)
+        feed_topics(batch, channels, labels)
+
+        # Bulk insert straight from the columns and commit once, together with
+        # how far into the log we are
         async with aiosqlite.connect(DB_PATH) as db:
-            await db.executemany("INSERT INTO chat_log VALUES (?, ?, ?, ?, ?, ?)", rows)
+            async with db.execute(
+                "SELECT IFNULL(MAX(rowid), 0) FROM chat_log"
+            ) as cursor:
+                (last_rowid,) = await cursor.fetchone()
+            committed = time.time()
+            rows = zip(
+                batch.sent,
+                channels,
+                batch.texts,
+                labels,
+                batch.scores,
+                batch.latency_ms,
+                batch.received,
+                batch.scored,
+                [committed] * len(batch),
+                batch.versions,
+            )
+            await db.executemany(
+                "INSERT INTO chat_log VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            await db.execute(INDEX_NEW_ROWS_SQL, (last_rowid,))
+            # New rows were appended with consecutive rowids after last_rowid
+            embedded = [
+                (last_rowid + i, *vector)
+                for i, vector in enumerate(batch.embeddings, start=1)
+                if vector is not None
+            ]
+            if embedded:
+                await db.executemany(
+                    "INSERT INTO chat_embeddings VALUES (?, ?, ?)", embedded
+                )
+            await db.execute(
+                "INSERT OR REPLACE INTO ingest_offsets VALUES (?, ?)",
+                (CONSUMER, max(batch.offsets) + 1),
+            )
+
+            await db.commit()
+        record_lag(batch, committed)
+
+
+def feed_topics(batch, channels, labels):
+    """Cluster a batch's embedded messages, per channel and model version."""
+    groups = {}
+    for i, vector in enumerate(batch.embeddings):
+        if vector is not None and batch.offsets[i] >= live_offset:
+            groups.setdefault((channels[i], batch.versions[i]), []).append(i)
+    for (channel, version), rows in groups.items():
+        tracker = topics.get(channel)
+        if tracker is None:
+            tracker = topics[channel] = TopicClusters(channel)
+        vectors = decode(
+            [batch.embeddings[i][0] for i in rows],
+            [batch.embeddings[i][1] for i in rows],
+        )
+        tracker.add(
+            [batch.sent[i] for i in rows],
+            vectors,
+            [batch.texts[i] for i in rows],
+            [labels[i] for i in rows],
+            [batch.scores[i] for i in rows],
+            version,
+        )
+
+
+def record_lag(batch, committed):
+    """Collect the end-to-end lag of a committed batch's live messages."""
+    global current_lag
+    lags = sorted(
+        committed - sent
+        for sent, offset in zip(batch.sent, batch.offsets)
+        if offset >= live_offset
+    )
+    if not lags:
+        return
+    lag_samples.extend(lags)
+    current_lag = max(0.0, lags[len(lags) // 2])
+
+
+def stream_clock():
+    """Wall-clock time minus the pipeline's current lag."""
+    return time.time() - current_lag
 
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q / 100 * len(sorted_values)))]
+
+
+async def lag_worker():
+    """Store end-to-end lag percentiles every LAG_REPORT_SECONDS and warn when behind."""
+    global lag_samples
+    while True:
+        await asyncio.sleep(LAG_REPORT_SECONDS)
+        if not lag_samples:
+            continue
+        lags, lag_samples = sorted(lag_samples), []
+        p50, p95, p99 = (percentile(lags, q) for q in (50, 95, 99))
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.execute(
+                "INSERT INTO pipeline_lag VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), len(lags), p50, p95, p99, lags[-1]),
+            )
             await db.commit()
+        if p95 > LAG_ALERT_SECONDS:
+            print(
+                f"Sentiment is running behind chat: lag p50 {p50:.1f}s, "
+                f"p95 {p95:.1f}s, p99 {p99:.1f}s"
+            )
 
 
-async def run_backend_async(target_channel, loaded_classifier):
-    """Main backend: authenticate, connect to chat, and process messages."""
+async def highlight_worker():
+    """Close finished seconds once a second and store any completed highlights."""
+    while True:
+        await asyncio.sleep(1)
+        finished = []
+        for detector in detectors.values():
+            detector.advance(stream_clock())
+            finished.extend(detector.drain())
+        if not finished:
+            continue
+
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.executemany(
+                """INSERT INTO highlights VALUES (:channel, :kind, :start_time,
+                :end_time, :peak_time, :peak_value, :peak_z, :messages)""",
+                finished,
+            )
+            await db.commit()
+        for h in finished:
+            print(f"[{h['channel']}] Highlight: {h['kind']} (peak z {h['peak_z']:.1f})")
+
+
+async def trending_worker():
+    """Persist each channel's top terms for finished minutes and the current one."""
+    while True:
+        await asyncio.sleep(TRENDING_FLUSH_SECONDS)
+        now = stream_clock()
+        windows = []
+        for tracker in trending.values():
+            # Close the minute on time even if chat has gone quiet
+            if tracker.bucket is not None and now >= tracker.bucket + tracker.window:
+                tracker.roll(int(now // tracker.window * tracker.window))
+            windows.extend((tracker.channel, b, sk) for b, sk in tracker.drain())
+            if tracker.sketch.total:
+                windows.append((tracker.channel, tracker.bucket, tracker.sketch))
+        if not windows:
+            continue
+
+        async with aiosqlite.connect(DB_PATH) as db:
+            for channel, bucket, sketch in windows:
+                # The in-progress minute is rewritten on every flush
+                await db.execute(
+                    "DELETE FROM trending_terms WHERE bucket = ? AND channel = ?",
+                    (bucket, channel),
+                )
+                await db.executemany(
+                    "INSERT INTO trending_terms VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        # Weight only accrues while a term is tracked, so average it
+                        # over the guaranteed count rather than the inflated one
+                        (bucket, channel, term, count, error, weight / (count - error))
+                        for term, count, error, weight in sketch.top(TRENDING_TOP_K)
+                    ],
+                )
+            await db.commit()
+
+
+async def topic_worker():
+    """Persist each channel's topics for finished minutes and the current one."""
+    while True:
+        await asyncio.sleep(TRENDING_FLUSH_SECONDS)
+        now = stream_clock()
+        rows = []
+        for tracker in topics.values():
+            if tracker.bucket is not None and now >= tracker.bucket + tracker.window:
+                tracker.roll(int(now // tracker.window * tracker.window))
+            rows.extend(tracker.drain())
+            rows.extend(tracker.rows())
+        if not rows:
+            continue
+
+        async with aiosqlite.connect(DB_PATH) as db:
+            # The in-progress minute is rewritten on every flush
+            await db.executemany(
+                "DELETE FROM topic_clusters WHERE bucket = ? AND channel = ?",
+                {(row[0], row[1]) for row in rows},
+            )
+            await db.executemany(
+                "INSERT INTO topic_clusters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            await db.commit()
+
+
+async def chatter_worker():
+    """Store closed per-second and per-minute unique-chatter sketches."""
+    while True:
+        await asyncio.sleep(1)
+        now = stream_clock()
+        rows = []
+        for tracker in chatters.values():
+            tracker.roll(now)
+            rows.extend(tracker.drain())
+        if not rows:
+            continue
+
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.executemany(
+                "INSERT INTO chatter_sketches VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            await db.commit()
+
+
+async def alert_worker():
+    """Pick up watch list edits, expire rate windows and store fired alerts."""
+    while True:
+        alert_monitor.reload_if_changed()
+        await asyncio.sleep(1)
+        alert_monitor.advance(time.time())
+        fired = alert_monitor.drain()
+        if not fired:
+            continue
+
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.executemany(
+                """INSERT INTO alerts (time, channel, phrase, count, seconds,
+                threshold, message) VALUES (:time, :channel, :phrase, :count,
+                :seconds, :threshold, :message)""",
+                fired,
+            )
+            await db.commit()
+        for a in fired:
+            print(
+                f'[{a["channel"]}] Alert: "{a["phrase"]}" '
+                f"{a['count']} times in {a['seconds']}s"
+            )
+
+
+async def run_backend_async(
+    target_channel,
+    loaded_classifier,
+    launch_start,
+    compile_mode=None,
+    ingest_backend="twitchapi",
+    embeddings=None,
+):
+    """Main backend: open the store, then serve chat until SIGTERM/SIGINT."""
+    global ingest_log, embedding_format
+    embedding_format = embeddings
     await init_db()
-    asyncio.create_task(model_worker(loaded_classifier))
+    ingest_log = IngestLog(INGEST_LOG_DIR)
+    await resume_from_log()
+
+    # Disconnect sends SIGTERM. Handling it on the loop (rather than flushing from a
+    # signal handler) lets an in-flight log write finish before the log is closed
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows event loops
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+    log_task = asyncio.create_task(ingest_log_worker(stop))
+    try:
+        await serve(
+            target_channel,
+            loaded_classifier,
+            launch_start,
+            compile_mode,
+            embeddings,
+            ingest_backend,
+            stop,
+        )
+    finally:
+        stop.set()
+        await log_task
+        print("Ingest log flushed, backend stopped.")
+
+
+async def serve(
+    target_channel,
+    loaded_classifier,
+    launch_start,
+    compile_mode,
+    embeddings,
+    ingest_backend,
+    stop,
+):
+    """Start the pipeline workers, join chat and run until `stop` is set."""
+    # Load the model in a thread while we authenticate and join chat
+    if loaded_classifier is None:
+        model_task = asyncio.create_task(
+            asyncio.to_thread(
+                load_model, compile_mode=compile_mode, embed=bool(embeddings)
+            )
+        )
+    else:
+        model_task = asyncio.get_running_loop().create_future()
+        model_task.set_result(loaded_classifier)
+    asyncio.create_task(
+        model_worker(model_task, model_version(compile_mode=compile_mode))
+    )
     asyncio.create_task(writer_worker())
+    asyncio.create_task(highlight_worker())
+    asyncio.create_task(trending_worker())
+    asyncio.create_task(topic_worker())
+    asyncio.create_task(chatter_worker())
+    asyncio.create_task(lag_worker())
+    asyncio.create_task(swap_worker())
+    asyncio.create_task(shadow_worker())
+    asyncio.create_task(alert_worker())
 
+    start = time.perf_counter()
     twitch = await Twitch(
         config.client_id, config.client_secret, authenticate_app=False
     )
     await twitch.set_user_authentication(
         config.user_token, TARGET_SCOPES, config.refresh_token
     )
+    record_startup("auth", start)
 
+    start = time.perf_counter()
     user_id, vod_id, stream_start = await get_session_info(twitch, target_channel)
+    record_startup("session_info", start)
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
             "INSERT INTO session_info VALUES (?, ?, ?, ?)",
@@ -247,25 +1034,77 @@ async def run_backend_async(target_channel, loaded_classifier):
         )
         await db.commit()
 
-    chat = await Chat(twitch)
-    chat.register_event(ChatEvent.MESSAGE, on_message)
-    chat.start()
+    start = time.perf_counter()
+    if ingest_backend == "irc":
+        # Raw IRC skips twitchAPI's per-message object construction
+        from irc_client import IrcClient
 
-    try:
-        await chat.join_room(target_channel)
-        print(f"Joined {target_channel}, vod_id: {vod_id}")
-    except Exception as e:
-        print(f"Failed to join: {e}")
+        irc = IrcClient([target_channel], on_irc_message)
+        asyncio.create_task(irc.run())
+        try:
+            await asyncio.wait_for(irc.joined.wait(), timeout=15)
+        except asyncio.TimeoutError:
+            print(f"Failed to join {target_channel} over IRC")
+            return
+        record_startup("join_chat", start)
+        print(f"Joined {target_channel} (raw IRC), vod_id: {vod_id}")
+    else:
+        chat = await Chat(twitch)
+        chat.register_event(ChatEvent.MESSAGE, on_message)
+        chat.start()
+
+        try:
+            await chat.join_room(target_channel)
+            record_startup("join_chat", start)
+            print(f"Joined {target_channel}, vod_id: {vod_id}")
+        except Exception as e:
+            print(f"Failed to join: {e}")
+            return
+
+    if await model_task is None:
+        print("Could not load the model; stopping the backend.")
         return
+    report_startup(launch_start)
 
-    while True:
-        await asyncio.sleep(1)
+    await stop.wait()
 
 
-def start_backend(target_channel, ui_queue, classifier):
-    """Entry point called by run.py. Starts the async backend in a new event loop."""
+def start_backend(
+    target_channel,
+    ui_queue,
+    classifier=None,
+    launch_start=None,
+    compile_mode=None,
+    ingest_backend="twitchapi",
+    use_uvloop=False,
+    store_dir=None,
+    embedding_format=None,
+):
+    """Entry point called by run.py. Starts the async backend in a new event loop.
+    If no classifier is passed, it is loaded concurrently with joining chat.
+    """
+    if store_dir is not None:
+        use_store(store_dir)
+    if launch_start is None:
+        launch_start = time.perf_counter()
     if os.name == "nt":
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    elif use_uvloop:
+        try:
+            import uvloop
+
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            print("uvloop is not installed, using the default event loop")
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(run_backend_async(target_channel, classifier))
+    loop.run_until_complete(
+        run_backend_async(
+            target_channel,
+            classifier,
+            launch_start,
+            compile_mode,
+            ingest_backend,
+            embedding_format,
+        )
+    )
@@ -0,0 +1,93 @@
+# Read-only SQLite connections shared by every dashboard viewer.
+# The backend is the only writer; readers open the database with mode=ro and
+# query_only so they can never take a write lock, and memory-map it so repeated
+# reads of hot pages skip the read() syscalls.
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+POOL_SIZE = 4
+MMAP_BYTES = 256 * 1024 * 1024
+
+# path -> (key, pool) of the newest file seen at each path
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def db_key(path):
+    """Identifies one incarnation of a database file. A channel's store can be
+    deleted and recreated, and pools for the old file must not be reused.
+    """
+    stat = os.stat(path)
+    return path, stat.st_ino, stat.st_ctime_ns
+
+
+class ReadPool:
+    """A fixed set of read-only connections handed out one caller at a time."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.closed = False
+        self.idle = queue.Queue()
+        for _ in range(size):
+            self.idle.put(self._open())
+
+    def _open(self):
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+        )
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        conn.execute("PRAGMA busy_timeout = 2000")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.idle.get()
+        if conn is None:
+            self.idle.put(None)  # wake the next waiter too
+            raise sqlite3.ProgrammingError(f"Read pool for {self.path} is closed")
+        try:
+            yield conn
+        finally:
+            if self.closed:
+                conn.close()
+            else:
+                self.idle.put(conn)
+
+    def read_df(self, sql, params=()):
+        with self.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def fetchone(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def close(self):
+        """Close idle connections now and busy ones when they are handed back."""
+        self.closed = True
+        while not self.idle.empty():
+            conn = self.idle.get_nowait()
+            if conn is not None:
+                conn.close()
+        self.idle.put(None)
+
+
+def pool_for(key):
+    """The pool for a db_key(), closing the pool of the file it replaced.
+    A key older than the newest one seen for its path gets the newest pool.
+    """
+    path = key[0]
+    with _pools_lock:
+        current = _pools.get(path)
+        if current is not None and (current[0] == key or current[0][2] > key[2]):
+            return current[1]
+        pool = ReadPool(path)
+        _pools[path] = key, pool
+    if current is not None:
+        current[1].close()
+    return pool
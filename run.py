@@ -1,16 +1,61 @@
 # run.py
 import argparse
-from primary import load_model, start_backend  # Imports from primary.py
+import time
 
 if __name__ == "__main__":
+    launch_start = time.perf_counter()
+
     # Accept channel name from command line
     parser = argparse.ArgumentParser()
     parser.add_argument("--channel", type=str, required=True)
+    parser.add_argument(
+        "--compile",
+        choices=["trace", "compile"],
+        default=None,
+        help="Run the classifier as shape-bucketed TorchScript or torch.compile graphs "
+        "(defaults to MODEL_COMPILE_MODE)",
+    )
+    parser.add_argument(
+        "--ingest",
+        choices=["twitchapi", "irc"],
+        default=None,
+        help="Chat ingest backend (defaults to CHAT_INGEST)",
+    )
+    parser.add_argument(
+        "--uvloop", action="store_true", help="Use uvloop if installed (USE_UVLOOP=1)"
+    )
+    parser.add_argument(
+        "--embeddings",
+        choices=["float16", "int8"],
+        default=None,
+        help="Store an embedding of every message for similarity search "
+        "(defaults to MESSAGE_EMBEDDINGS)",
+    )
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="Directory for this session's database and ingest log (set by the app)",
+    )
     args = parser.parse_args()
 
     print(f"--- Launching Backend for {args.channel} ---")
 
-    # Load the heavy model (happens in this separate process)
-    # pass 'None' for the queue because we are using CSV mode.
-    clf = load_model()
-    start_backend(args.channel, None, clf)
+    # Imported here so a bad argument fails before any backend imports
+    import config
+    from primary import record_startup, start_backend
+
+    record_startup("backend_import", launch_start)
+    compile_mode = args.compile or config.compile_mode
+
+    # The heavy model is loaded inside the backend, concurrently with joining chat.
+    # pass 'None' for the queue because we are using SQLite mode.
+    start_backend(
+        args.channel,
+        None,
+        launch_start=launch_start,
+        compile_mode=compile_mode,
+        ingest_backend=args.ingest or config.ingest_backend,
+        use_uvloop=args.uvloop or config.use_uvloop,
+        store_dir=args.store,
+        embedding_format=args.embeddings or config.embedding_format,
+    )
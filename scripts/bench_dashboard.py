@@ -0,0 +1,164 @@
+# Dashboard Read Benchmark
+# Simulates N viewers each running the live panel's queries every 0.4s against a
+# database the size of a long stream, and compares a fresh sqlite3.connect() per
+# refresh with the app's shared read-only pool plus short-TTL result sharing.
+# (st.cache_data needs a running Streamlit server, so the TTL cache is mirrored here.)
+# Usage: python scripts/bench_dashboard.py --viewers 1 10 50
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from read_pool import ReadPool  # noqa: E402
+
+REFRESH_SECONDS = 0.4
+LIVE_TTL = 0.3
+
+
+def build_db(path, hours, rate):
+    """Write a chat_log with `rate` messages/sec for `hours`, ending now."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """CREATE TABLE chat_log (timestamp REAL, channel TEXT, message TEXT,
+        label TEXT, score REAL, latency REAL, received_time REAL, scored_time REAL,
+        committed_time REAL, model_version TEXT)"""
+    )
+    conn.execute("CREATE INDEX idx_time ON chat_log(timestamp)")
+    conn.execute(
+        "CREATE TABLE pipeline_lag (time REAL, messages INTEGER, p50 REAL, p95 REAL, p99 REAL, max REAL)"
+    )
+    now = time.time()
+    start = now - hours * 3600
+    total = int(hours * 3600 * rate)
+    labels = ["positive", "negative", "neutral"]
+    rows = (
+        (
+            start + i / rate,
+            "bench",
+            "KEKW",
+            random.choice(labels),
+            random.random(),
+            5.0,
+            0,
+            0,
+            0,
+            "bench",
+        )
+        for i in range(total)
+    )
+    conn.executemany("INSERT INTO chat_log VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+    conn.execute("INSERT INTO pipeline_lag VALUES (?, 100, 0.3, 0.6, 0.9, 1.2)", (now,))
+    conn.commit()
+    conn.close()
+    return total
+
+
+def live_queries(read):
+    """The queries update_dashboard runs on every refresh."""
+    latest = read("SELECT MAX(timestamp) AS latest FROM chat_log", ())["latest"].iloc[0]
+    read("SELECT p50, p95, p99 FROM pipeline_lag ORDER BY time DESC LIMIT 1", ())
+    read("SELECT * FROM chat_log WHERE timestamp > ?", (latest - 1,))
+
+
+def naive_reader(path):
+    def read(sql, params):
+        conn = sqlite3.connect(path)
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    return read
+
+
+def shared_reader(path):
+    """ReadPool plus a process-wide TTL cache keyed like st.cache_data."""
+    pool = ReadPool(path)
+    cache = {}
+    lock = threading.Lock()
+
+    def read(sql, params):
+        key = (sql, params)
+        now = time.monotonic()
+        with lock:
+            hit = cache.get(key)
+        if hit is not None and now - hit[0] < LIVE_TTL:
+            return hit[1].copy()  # st.cache_data hands each caller its own copy
+        df = pool.read_df(sql, params)
+        with lock:
+            cache[key] = (now, df)
+        return df
+
+    return read
+
+
+def simulate(read, viewers, seconds):
+    """Run `viewers` refresh loops in threads; return per-refresh latencies in ms."""
+    latencies = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def viewer():
+        # Viewers don't refresh in lockstep
+        time.sleep(random.random() * REFRESH_SECONDS)
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            live_queries(read)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000)
+            time.sleep(max(0.0, REFRESH_SECONDS - elapsed))
+
+    threads = [threading.Thread(target=viewer) for _ in range(viewers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--hours", type=float, default=4, help="Stream length in DB")
+    parser.add_argument("--rate", type=float, default=20, help="Messages/sec in DB")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        total = build_db(path, args.hours, args.rate)
+        print(f"Database: {total:,} chat rows ({args.hours}h at {args.rate}/s)\n")
+        print(
+            f"{'viewers':>7} {'mode':>8} {'refreshes':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for viewers in args.viewers:
+            for name, reader in (
+                ("connect", naive_reader(path)),
+                ("shared", shared_reader(path)),
+            ):
+                latencies = simulate(reader, viewers, args.seconds)
+                print(
+                    f"{viewers:>7} {name:>8} {len(latencies):>9} "
+                    f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Inference Benchmark: eager pipeline vs. compiled (bucketed) classifier
+# Runs the same chat messages through each execution path on CPU and reports
+# throughput, batch latency percentiles and how often the top labels agree.
+# Usage: python scripts/bench_inference.py --input twitch_data_1m.csv --modes trace compile
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import time
+
+# Force CPU before torch is imported (the benchmark targets CPU deployments)
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from primary import load_model  # noqa: E402
+
+SYNTHETIC = ["W", "LUL", "that was actually insane", "L streamer", "no way he hit that"]
+
+
+def load_messages(path, limit, seed):
+    """Read messages from a scraper CSV (channel, message), or make synthetic ones."""
+    rng = random.Random(seed)
+    if path and os.path.exists(path):
+        with open(path, newline="", encoding="utf-8", errors="ignore") as f:
+            messages = [row[1] for row in csv.reader(f) if len(row) > 1 and row[1]]
+        rng.shuffle(messages)
+        return messages[:limit]
+    # Mix short spam with longer sentences so every length bucket gets used
+    return [
+        " ".join(rng.choice(SYNTHETIC) for _ in range(rng.randint(1, 6)))
+        for _ in range(limit)
+    ]
+
+
+def run(classifier, messages, batch_size):
+    """Return (top labels, per-batch latencies in ms, total seconds)."""
+    labels, latencies = [], []
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        batch = messages[i : i + batch_size]
+        t0 = time.perf_counter()
+        results = classifier(batch)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        labels.extend(r[0]["label"] for r in results)
+    return labels, latencies, time.perf_counter() - start
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="twitch_data_1m.csv")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", default=["trace"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    messages = load_messages(args.input, args.limit, args.seed)
+    print(f"Benchmarking {len(messages)} messages, batch size {args.batch_size}")
+
+    baseline = None
+    for mode in [None, *args.modes]:
+        name = mode or "eager"
+        start = time.perf_counter()
+        classifier = load_model(compile_mode=mode)
+        setup = time.perf_counter() - start
+        if classifier is None:
+            print(f"{name}: failed to load")
+            continue
+
+        labels, latencies, total = run(classifier, messages, args.batch_size)
+        if baseline is None:
+            baseline = labels
+        agreement = sum(a == b for a, b in zip(labels, baseline)) / len(labels)
+
+        print(f"\n[{name}]")
+        print(f"  setup (load + warmup): {setup:.1f}s")
+        print(f"  throughput: {len(messages) / total:.1f} msgs/sec")
+        print(
+            f"  batch latency: p50 {percentile(latencies, 50):.1f} ms"
+            f" | p99 {percentile(latencies, 99):.1f} ms"
+        )
+        print(f"  label agreement with eager: {agreement:.2%}")
+        if hasattr(classifier, "fallbacks"):
+            print(f"  eager fallbacks (no bucket fit): {classifier.fallbacks}")
+
+
+if __name__ == "__main__":
+    main()
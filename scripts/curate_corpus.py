@@ -0,0 +1,292 @@
+# Corpus Curation
+# Near-duplicate clustering and rebalancing for scraped chat (scraper.py output).
+# Messages are normalized (case, whitespace, stretched letters, repeated emotes),
+# MinHashed over character shingles in parallel worker processes, and grouped
+# with LSH banding; each cluster keeps at most --cluster-cap messages and each
+# channel at most --channel-cap. The input is streamed twice in chunks, so memory
+# grows with a few small integers per row rather than with the text.
+# Usage: python scripts/curate_corpus.py twitch_data_1m.csv --out curated.csv --cluster-cap 3 --balance
+import argparse
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 20_000
+# Messages hashed together; bounds the (permutations x shingles) array
+SLICE_ROWS = 1_000
+SHINGLE = 4
+PRIME = (1 << 61) - 1
+STRETCH_RE = re.compile(r"(.)\1{2,}")
+
+
+def normalize(text):
+    """Lowercase, squeeze stretched letters ("nooooo" -> "noo") and drop repeated
+    words, so "LUL LUL LUL" and "LUL" hash the same.
+    """
+    words = STRETCH_RE.sub(r"\1\1", text.lower()).split()
+    kept = [w for i, w in enumerate(words) if i == 0 or w != words[i - 1]]
+    return " ".join(kept)
+
+
+def permutations(count, seed):
+    rng = np.random.default_rng(seed)
+    # Below 2**31 so a * x + b stays under 2**64 for 32-bit shingle hashes
+    a = rng.integers(1, 1 << 31, count, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, count, dtype=np.uint64)
+    return a, b
+
+
+def band_hashes(texts, bands, rows, seed):
+    """(len(texts), bands) uint64 LSH keys; similar messages share at least one."""
+    a, b = permutations(bands * rows, seed)
+    out = np.empty((len(texts), bands), dtype=np.uint64)
+    for lo in range(0, len(texts), SLICE_ROWS):
+        hashes, counts = [], []
+        for text in texts[lo : lo + SLICE_ROWS]:
+            text = normalize(text)
+            grams = {
+                text[i : i + SHINGLE] for i in range(max(1, len(text) - SHINGLE + 1))
+            }
+            hashes.extend(zlib.crc32(g.encode()) for g in grams)
+            counts.append(len(grams))
+        x = np.array(hashes, dtype=np.uint64)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        mixed = (a[:, None] * x[None, :] + b[:, None]) % PRIME
+        signature = np.minimum.reduceat(mixed, starts, axis=1)  # (perms, messages)
+        keys = np.zeros((bands, len(counts)), dtype=np.uint64)
+        for row in range(rows):
+            keys = keys * np.uint64(0x100000001B3) ^ signature[row::rows][:bands]
+        out[lo : lo + len(counts)] = keys.T
+    return out
+
+
+def open_output(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard
+
+        return zstandard.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def read_chunks(path):
+    return pd.read_csv(
+        path,
+        header=None,
+        dtype=str,
+        keep_default_na=False,
+        on_bad_lines="skip",
+        chunksize=CHUNK_ROWS,
+    )
+
+
+def hash_corpus(args, band_file):
+    """Pass 1: band keys (memory-mapped to disk), channel codes and empty flags per row."""
+    channel_codes, empty = [], []
+    channel_names = {}
+    total = 0
+    pending = deque()
+
+    def collect(future):
+        nonlocal total
+        block = future.result()
+        band_file.write(block.tobytes())
+        total += len(block)
+        print(f"Hashed {total} rows...", end="\r")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for chunk in read_chunks(args.input):
+            channels = chunk[0].str.strip().str.lower()
+            codes = [channel_names.setdefault(c, len(channel_names)) for c in channels]
+            channel_codes.append(np.array(codes, dtype=np.int32))
+            texts = chunk[1].str.strip().tolist()
+            empty.append(np.array([not t for t in texts]))
+            pending.append(
+                pool.submit(band_hashes, texts, args.bands, args.rows, args.seed)
+            )
+            # A few chunks in flight per worker keeps every core busy with bounded memory
+            while len(pending) >= 2 * args.workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+    print()
+    band_file.flush()
+    names = sorted(channel_names, key=channel_names.get)
+    return np.concatenate(channel_codes), np.concatenate(empty), names, total
+
+
+def cluster(bands_map, valid):
+    """Star clustering: each row joins the earliest row it shares a band key with.
+    Unlike connected components this never chains A~B~C~... into one giant
+    cluster of messages that have little in common.
+    """
+    labels = np.arange(len(valid))
+    rows = np.flatnonzero(valid)
+    for band in range(bands_map.shape[1]):
+        keys = bands_map[rows, band]
+        # Stable sort keeps rows ascending within a bucket, so each bucket starts
+        # with its earliest row
+        order = np.argsort(keys, kind="stable")
+        sorted_rows, keys = rows[order], keys[order]
+        new_bucket = np.concatenate([[True], keys[1:] != keys[:-1]])
+        bucket_start = np.maximum.accumulate(
+            np.where(new_bucket, np.arange(len(keys)), 0)
+        )
+        labels[sorted_rows] = np.minimum(labels[sorted_rows], sorted_rows[bucket_start])
+    return labels
+
+
+def rank_within(groups, order):
+    """Position of each row among the rows of its group, counting only the rows
+    listed in `order` and in that order. Rows not listed get a rank past any cap.
+    """
+    ordered = groups[order]
+    sort = np.argsort(ordered, kind="stable")
+    sorted_groups = ordered[sort]
+    starts = np.concatenate([[True], sorted_groups[1:] != sorted_groups[:-1]])
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(sort)), 0))
+    rank = np.full(len(groups), len(groups), dtype=np.int64)
+    rank[order[sort]] = np.arange(len(sort)) - group_start
+    return rank
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "input", help="Scraped CSV (channel, message, ...); .gz/.zst ok"
+    )
+    parser.add_argument("--out", default="curated_chat.csv")
+    parser.add_argument("--stats", default=None, help="Defaults to <out>.stats.json")
+    parser.add_argument(
+        "--cluster-cap",
+        type=int,
+        default=3,
+        help="Messages kept per near-duplicate cluster",
+    )
+    parser.add_argument(
+        "--channel-cap",
+        type=int,
+        default=0,
+        help="Messages kept per channel (0 = no cap)",
+    )
+    parser.add_argument(
+        "--balance",
+        action="store_true",
+        help="Cap every channel at the median channel size after deduplication",
+    )
+    parser.add_argument("--bands", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=6, help="MinHash rows per band")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--top", type=int, default=20, help="Largest clusters to report"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    threshold = (1 / args.bands) ** (1 / args.rows)
+    print(
+        f"MinHash {args.bands}x{args.rows} (similarity threshold ~{threshold:.2f}), "
+        f"{args.workers} workers"
+    )
+
+    # 1. Hash every message; band keys go to a temporary file, not memory
+    with tempfile.NamedTemporaryFile(suffix=".bands") as band_file:
+        channels, empty, channel_names, total = hash_corpus(args, band_file)
+        bands_map = np.memmap(
+            band_file.name, dtype=np.uint64, mode="r", shape=(total, args.bands)
+        )
+
+        # 2. Cluster near-duplicates
+        print("Clustering...")
+        labels = cluster(bands_map, ~empty)
+        del bands_map
+
+    # 3. Cluster caps keep the earliest messages of each cluster
+    rows = np.arange(total)
+    keep = ~empty & (rank_within(labels, rows) < args.cluster_cap)
+    deduped = keep.copy()
+
+    # 4. Channel caps keep a random sample, so the kept rows span the whole scrape
+    channel_counts = np.bincount(channels[deduped], minlength=len(channel_names))
+    channels_in = np.bincount(channels, minlength=len(channel_names))
+    cap = args.channel_cap
+    if args.balance:
+        cap = int(np.median(channel_counts[channel_counts > 0]))
+    if cap > 0:
+        shuffled = np.random.default_rng(args.seed).permutation(total)
+        shuffled = shuffled[keep[shuffled]]
+        keep &= rank_within(channels, shuffled) < cap
+
+    # 5. Stream the input again, writing kept rows and grabbing example texts
+    cluster_sizes = np.bincount(labels[~empty], minlength=total)
+    largest = np.argsort(cluster_sizes)[::-1][: args.top]
+    largest = largest[cluster_sizes[largest] > 1]
+    examples = {}
+    wanted = set(largest.tolist())
+    offset = 0
+    with open_output(args.out) as out:
+        for chunk in read_chunks(args.input):
+            chunk_keep = keep[offset : offset + len(chunk)]
+            chunk[chunk_keep].to_csv(out, header=False, index=False)
+            for row in wanted.intersection(range(offset, offset + len(chunk))):
+                examples[row] = chunk.iloc[row - offset, 1]
+            offset += len(chunk)
+
+    # 6. Stats
+    elapsed = time.perf_counter() - start
+    multi = cluster_sizes > 1
+    channels_out = np.bincount(channels[keep], minlength=len(channel_names))
+    stats = {
+        "rows_in": int(total),
+        "empty": int(empty.sum()),
+        "clusters": int(multi.sum()),
+        "rows_in_clusters": int(cluster_sizes[multi].sum()),
+        "removed_by_cluster_cap": int((~empty).sum() - deduped.sum()),
+        "removed_by_channel_cap": int(deduped.sum() - keep.sum()),
+        "rows_out": int(keep.sum()),
+        "channel_cap": int(cap),
+        "similarity_threshold": round(threshold, 3),
+        "seconds": round(elapsed, 1),
+        "rows_per_second": round(total / elapsed) if elapsed else None,
+        "channels": {
+            name: {
+                "in": int(channels_in[code]),
+                "deduped": int(channel_counts[code]),
+                "out": int(channels_out[code]),
+            }
+            for code, name in enumerate(channel_names)
+        },
+        "largest_clusters": [
+            {"size": int(cluster_sizes[row]), "example": examples.get(row, "")}
+            for row in largest
+        ],
+    }
+    stats_path = args.stats or f"{args.out}.stats.json"
+    with open(stats_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+    print(
+        f"{stats['rows_in']} rows -> {stats['rows_out']} "
+        f"({stats['removed_by_cluster_cap']} near-duplicates, "
+        f"{stats['removed_by_channel_cap']} over channel cap, {stats['empty']} empty)"
+    )
+    print(f"{stats['clusters']} clusters; largest:")
+    for entry in stats["largest_clusters"][:5]:
+        print(f"  {entry['size']:>7}  {entry['example'][:70]}")
+    print(f"Done in {elapsed:.1f}s ({stats['rows_per_second']} rows/s) -> {args.out}")
+    print(f"Stats written to {stats_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# Masked Word Evaluation
+# Offline replacement for the old interactive test_mlm.py: masks one word in each
+# held-out chat message (seeded, so every model sees the same masks), predicts
+# the masked word in length-sorted batches across worker processes, and reports
+# top-1/top-3 accuracy by message length and by channel, plus throughput.
+# Usage: python scripts/eval_mlm.py --input heldout.csv --models ./twitch-roberta-v1 ./twitch-roberta-v2
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import config  # noqa: E402
+
+BOT_LIST = config.bot_list
+MIN_WORDS = 4
+LENGTH_BUCKETS = [(4, 5), (6, 9), (10, 19), (20, None)]
+
+
+def load_items(path, limit, seed):
+    """Seeded (channel, word count, words, mask position) for each usable message.
+
+    Uses the scraper's filters (bots, when the file has a user column, commands
+    and links) and never masks an @mention.
+    """
+    df = pd.read_csv(
+        path, header=None, dtype=str, keep_default_na=False, on_bad_lines="skip"
+    )
+    if df.shape[1] > 3:  # channel, message, timestamp, user
+        df = df[~df[3].str.lower().isin(BOT_LIST)]
+    rng = random.Random(seed)
+    order = list(range(len(df)))
+    rng.shuffle(order)
+    channels, messages = df[0].tolist(), df[1].tolist()
+
+    items = []
+    for i in order:
+        text = messages[i]
+        if text.startswith("!") or "http" in text.lower():
+            continue
+        words = text.split()
+        if len(words) < MIN_WORDS:
+            continue
+        candidates = [j for j, w in enumerate(words) if not w.startswith("@")]
+        if not candidates:
+            continue
+        items.append((channels[i].lower(), len(words), words, rng.choice(candidates)))
+        if len(items) == limit:
+            break
+    return items
+
+
+def length_bucket(words):
+    for low, high in LENGTH_BUCKETS:
+        if words >= low and (high is None or words <= high):
+            return f"{low}+" if high is None else f"{low}-{high}"
+    return "short"
+
+
+def predict_shard(model_path, threads, batches):
+    """Worker process: load the model, then predict every batch of texts.
+    Returns (top-3 word lists per batch, load seconds, predict seconds).
+    """
+    import torch
+    from transformers import AutoModelForMaskedLM, AutoTokenizer
+
+    start = time.perf_counter()
+    torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForMaskedLM.from_pretrained(model_path).eval()
+    loaded = time.perf_counter()
+
+    results = []
+    for texts in batches:
+        inputs = tokenizer(
+            texts, padding=True, truncation=True, max_length=256, return_tensors="pt"
+        )
+        with torch.inference_mode():
+            logits = model(**inputs).logits
+        rows, cols = (inputs["input_ids"] == tokenizer.mask_token_id).nonzero(
+            as_tuple=True
+        )
+        top = logits[rows, cols].topk(3, dim=-1).indices.tolist()
+        # None where truncation cut the mask off
+        predictions = [None] * len(texts)
+        for row, ids in zip(rows.tolist(), top):
+            if predictions[row] is None:
+                tokens = tokenizer.convert_ids_to_tokens(ids)
+                predictions[row] = [t.replace("Ġ", "").strip().lower() for t in tokens]
+        results.append(predictions)
+    return results, loaded - start, time.perf_counter() - loaded
+
+
+def evaluate(model_path, items, args):
+    """Run one model over every item; returns (top-3 lists, load secs, predict secs).
+    Batches are dealt round-robin to the workers, which run in parallel, so the
+    slowest worker's time is the wall time.
+    """
+    from transformers import AutoTokenizer
+
+    mask = AutoTokenizer.from_pretrained(model_path).mask_token
+    texts = [
+        " ".join(mask if j == pos else w for j, w in enumerate(words))
+        for _, _, words, pos in items
+    ]
+    # Length-sorted batches keep padding small
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches = [
+        order[i : i + args.batch_size] for i in range(0, len(order), args.batch_size)
+    ]
+    shards = [batches[w :: args.workers] for w in range(args.workers)]
+
+    predictions = [None] * len(items)
+    load_seconds = predict_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(
+                predict_shard,
+                model_path,
+                args.threads,
+                [[texts[i] for i in batch] for batch in shard],
+            )
+            for shard in shards
+        ]
+        for shard, future in zip(shards, futures):
+            results, load, predict = future.result()
+            load_seconds = max(load_seconds, load)
+            predict_seconds = max(predict_seconds, predict)
+            for batch, batch_predictions in zip(shard, results):
+                for i, prediction in zip(batch, batch_predictions):
+                    predictions[i] = prediction
+    return predictions, load_seconds, predict_seconds
+
+
+def score(items, predictions, top_channels):
+    """Top-1/top-3 accuracy overall, by length bucket and by channel."""
+    groups = defaultdict(lambda: [0, 0, 0])  # count, top-1 hits, top-3 hits
+    for (channel, length, words, pos), prediction in zip(items, predictions):
+        target = words[pos].lower()
+        hit1 = bool(prediction) and prediction[0] == target
+        hit3 = bool(prediction) and target in prediction
+        keys = ["all", f"length {length_bucket(length)}"]
+        if channel in top_channels:
+            keys.append(f"#{channel}")
+        for key in keys:
+            groups[key][0] += 1
+            groups[key][1] += hit1
+            groups[key][2] += hit3
+    return {
+        key: {"messages": n, "top1": h1 / n, "top3": h3 / n}
+        for key, (n, h1, h3) in groups.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input", required=True, help="Held-out chat CSV (channel, message, ...)"
+    )
+    parser.add_argument(
+        "--models", nargs="+", default=["muyihenhen/twitch-roberta-base"]
+    )
+    parser.add_argument("--limit", type=int, default=20000, help="Messages to evaluate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4)
+    )
+    parser.add_argument(
+        "--threads", type=int, default=None, help="Torch threads per worker"
+    )
+    parser.add_argument(
+        "--channels", type=int, default=10, help="Busiest channels to break out"
+    )
+    parser.add_argument(
+        "--examples", type=int, default=0, help="Print this many predictions"
+    )
+    parser.add_argument("--json", default=None, help="Also write the report here")
+    args = parser.parse_args()
+    args.threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    items = load_items(args.input, args.limit, args.seed)
+    if not items:
+        raise SystemExit(f"No usable messages in {args.input}")
+    channel_counts = pd.Series([item[0] for item in items]).value_counts()
+    top_channels = set(channel_counts.index[: args.channels])
+    print(
+        f"{len(items)} masked messages (seed {args.seed}), "
+        f"{args.workers} workers x {args.threads} threads"
+    )
+
+    report = {
+        "input": args.input,
+        "seed": args.seed,
+        "messages": len(items),
+        "models": {},
+    }
+    for model_path in args.models:
+        print(f"\nEvaluating {model_path}...")
+        predictions, load_seconds, predict_seconds = evaluate(model_path, items, args)
+        results = score(items, predictions, top_channels)
+        results["throughput"] = {
+            "load_seconds": round(load_seconds, 1),
+            "predict_seconds": round(predict_seconds, 1),
+            "messages_per_second": round(len(items) / predict_seconds, 1),
+            "messages_per_second_per_core": round(
+                len(items) / predict_seconds / (args.workers * args.threads), 1
+            ),
+        }
+        report["models"][model_path] = results
+        print(
+            f"  top-1 {results['all']['top1']:.1%}  top-3 {results['all']['top3']:.1%}  "
+            f"{results['throughput']['messages_per_second']:,.0f} msgs/s"
+        )
+        for (_, _, words, pos), prediction in zip(items[: args.examples], predictions):
+            masked = " ".join("<mask>" if j == pos else w for j, w in enumerate(words))
+            print(f"    {masked!r} -> {prediction} (answer {words[pos]!r})")
+
+    # Side by side: one row per group, top-1 / top-3 per model
+    names = [os.path.basename(os.path.normpath(m)) or m for m in args.models]
+    rows = ["all"] + [f"length {length_bucket(low)}" for low, _ in LENGTH_BUCKETS]
+    rows += [f"#{c}" for c in channel_counts.index[: args.channels]]
+    print("\n" + f"{'':<22}{'messages':>9}" + "".join(f"{n[:20]:>22}" for n in names))
+    for row in rows:
+        stats = [report["models"][m].get(row) for m in args.models]
+        if stats[0] is None:
+            continue
+        cells = "".join(f" {s['top1']:>11.1%} / {s['top3']:>7.1%}" for s in stats)
+        print(f"{row:<22}{stats[0]['messages']:>9}{cells}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
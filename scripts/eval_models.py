@@ -0,0 +1,246 @@
+# Model Variant Evaluation
+# Scores sentiment model variants (HF-hosted, local retrains, ONNX, quantized,
+# compiled) on the held-out split of labeled_data_v2.csv, loading each one through
+# primary.load_model like the backend does. Reports accuracy, macro-F1 and the
+# confusion matrix, then throughput per core and p50/p99 batch latency at several
+# batch sizes, and marks which variants are on the accuracy/throughput Pareto front.
+# Usage: python scripts/eval_models.py --variants hf=muyihenhen/twitch-roberta-sentiment-v1 \
+#            v2=models/twitch-sentiment-v2 v2-int8=models/twitch-sentiment-v2@quantized \
+#            v2-onnx=models/export@onnx --out reports/models
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Force CPU before torch is imported (throughput per core is a CPU deployment number)
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from batches import LABEL_NAMES  # noqa: E402
+from primary import HF_REPO, LOCAL_DIR, load_model, percentile  # noqa: E402
+
+# Same split as src/training/train_sentiment.py, so the held-out rows were never trained on
+SPLIT_SEED = 42
+TRAIN_FRACTION = 0.85
+FORMATS = {
+    "eager": {},
+    "trace": {"compile_mode": "trace"},
+    "compile": {"compile_mode": "compile"},
+    "onnx": {"model_format": "onnx"},
+    "quantized": {"model_format": "quantized"},
+}
+
+
+def held_out(path):
+    df = pd.read_csv(path).dropna(subset=["message", "label"])
+    df = df.drop_duplicates(subset=["message"])
+    order = np.random.default_rng(SPLIT_SEED).permutation(len(df))
+    val = df.iloc[order[int(TRAIN_FRACTION * len(order)) :]]
+    return val["message"].astype(str).tolist(), val["label"].astype(int).to_numpy()
+
+
+def parse_variant(spec):
+    """Split name=path@format into (name, path, format); name and format are optional."""
+    name, _, rest = spec.rpartition("=")
+    path, _, fmt = rest.partition("@")
+    fmt = fmt or "eager"
+    if fmt not in FORMATS:
+        raise SystemExit(
+            f"Unknown format {fmt!r} in {spec!r} (use {', '.join(FORMATS)})"
+        )
+    return name or f"{os.path.basename(path.rstrip('/'))}@{fmt}", path, fmt
+
+
+def label_index(name):
+    """Model label name ("negative", "LABEL_0", ...) -> training label id."""
+    name = name.lower()
+    if name.startswith("label_"):
+        return int(name[6:])
+    return LABEL_NAMES.index(name)
+
+
+def run(classifier, messages, batch_size):
+    """Return (predicted label ids, sorted per-batch latencies in ms, total seconds)."""
+    predicted, latencies = [], []
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        t0 = time.perf_counter()
+        results = classifier(messages[i : i + batch_size])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        predicted.extend(label_index(r[0]["label"]) for r in results)
+    return np.array(predicted), sorted(latencies), time.perf_counter() - start
+
+
+def quality(truth, predicted, classes):
+    confusion = np.zeros((classes, classes), dtype=int)
+    np.add.at(confusion, (truth, predicted), 1)
+    tp = np.diag(confusion)
+    precision = tp / np.maximum(confusion.sum(axis=0), 1)
+    recall = tp / np.maximum(confusion.sum(axis=1), 1)
+    f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+    return {
+        "accuracy": float(tp.sum() / confusion.sum()),
+        "macro_f1": float(f1.mean()),
+        "f1": {LABEL_NAMES[i]: round(float(f), 4) for i, f in enumerate(f1)},
+        "confusion": confusion.tolist(),  # rows: true label, columns: predicted
+    }
+
+
+def pareto(results, batch_size):
+    """Variants no other variant beats on both macro-F1 and throughput."""
+    points = {
+        name: (r["macro_f1"], r["batches"][str(batch_size)]["msgs_per_sec_per_core"])
+        for name, r in results.items()
+    }
+    return [
+        name
+        for name, (f1, speed) in points.items()
+        if not any(
+            other != name
+            and of1 >= f1
+            and ospeed >= speed
+            and (of1, ospeed) != (f1, speed)
+            for other, (of1, ospeed) in points.items()
+        )
+    ]
+
+
+def markdown(report):
+    sizes = report["batch_sizes"]
+    ref = str(report["reference_batch_size"])
+    lines = [
+        "# Sentiment model variants",
+        "",
+        f"{report['messages']} held-out messages from `{report['input']}`, "
+        f"{report['threads']} CPU threads. Throughput and the Pareto front use batch size {ref}.",
+        "",
+        "| variant | accuracy | macro-F1 | msgs/s/core | "
+        + " | ".join(f"p50 / p99 ms @{b}" for b in sizes)
+        + " | Pareto |",
+        "|---|---|---|---|" + "---|" * len(sizes) + "---|",
+    ]
+    for name, r in report["variants"].items():
+        cells = " | ".join(
+            f"{r['batches'][str(b)]['p50_ms']:.1f} / {r['batches'][str(b)]['p99_ms']:.1f}"
+            for b in sizes
+        )
+        lines.append(
+            f"| {name} | {r['accuracy']:.1%} | {r['macro_f1']:.3f} | "
+            f"{r['batches'][ref]['msgs_per_sec_per_core']:.1f} | {cells} | "
+            f"{'★' if name in report['pareto'] else ''} |"
+        )
+    for name, r in report["variants"].items():
+        lines += [
+            "",
+            f"## {name}",
+            "",
+            f"`{r['path']}` ({r['format']}), load {r['load_seconds']}s",
+            "",
+        ]
+        lines.append("| true \\ predicted | " + " | ".join(LABEL_NAMES) + " |")
+        lines.append("|---" * (len(LABEL_NAMES) + 1) + "|")
+        for label, row in zip(LABEL_NAMES, r["confusion"]):
+            lines.append(f"| {label} | " + " | ".join(str(v) for v in row) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    default_variants = [f"hf={HF_REPO}"]
+    if os.path.exists(LOCAL_DIR):
+        default_variants += [f"v2={LOCAL_DIR}", f"v2-int8={LOCAL_DIR}@quantized"]
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="labeled_data_v2.csv")
+    parser.add_argument(
+        "--variants", nargs="+", default=default_variants, help="[name=]path[@format]"
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument(
+        "--timing-limit",
+        type=int,
+        default=1000,
+        help="Messages timed at each batch size (accuracy always uses all of them)",
+    )
+    parser.add_argument("--threads", type=int, default=None, help="Torch CPU threads")
+    parser.add_argument(
+        "--out", default="model_report", help="Writes <out>.json and <out>.md"
+    )
+    args = parser.parse_args()
+
+    import torch
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    threads = torch.get_num_threads()
+
+    messages, truth = held_out(args.input)
+    print(f"{len(messages)} held-out messages, {threads} threads")
+    timing_messages = messages[: args.timing_limit]
+    reference = max(args.batch_sizes)
+
+    results = {}
+    for spec in args.variants:
+        name, path, fmt = parse_variant(spec)
+        print(f"\n[{name}] {path} ({fmt})")
+        start = time.perf_counter()
+        classifier = load_model(model_path=path, **FORMATS[fmt])
+        load_seconds = time.perf_counter() - start
+        if classifier is None:
+            print("  failed to load, skipping")
+            continue
+
+        # Accuracy from one pass over every held-out message at the largest batch size
+        predicted, _, _ = run(classifier, messages, reference)
+        result = {"path": path, "format": fmt, "load_seconds": round(load_seconds, 1)}
+        result.update(quality(truth, predicted, len(LABEL_NAMES)))
+        print(
+            f"  accuracy {result['accuracy']:.1%} | macro-F1 {result['macro_f1']:.3f}"
+        )
+
+        result["batches"] = {}
+        for batch_size in args.batch_sizes:
+            _, latencies, total = run(classifier, timing_messages, batch_size)
+            per_second = len(timing_messages) / total
+            result["batches"][str(batch_size)] = {
+                "msgs_per_sec": round(per_second, 1),
+                "msgs_per_sec_per_core": round(per_second / threads, 2),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+            }
+            print(
+                f"  batch {batch_size:>3}: {per_second:8.1f} msgs/s "
+                f"({per_second / threads:.1f}/core) | p50 {percentile(latencies, 50):.1f} ms"
+                f" | p99 {percentile(latencies, 99):.1f} ms"
+            )
+        results[name] = result
+        del classifier
+
+    if not results:
+        raise SystemExit("No variant loaded")
+    report = {
+        "input": args.input,
+        "messages": len(messages),
+        "threads": threads,
+        "batch_sizes": args.batch_sizes,
+        "reference_batch_size": reference,
+        "pareto": pareto(results, reference),
+        "variants": results,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(f"{args.out}.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(f"{args.out}.md", "w", encoding="utf-8") as f:
+        f.write(markdown(report))
+    print(f"\nPareto front: {', '.join(report['pareto'])}")
+    print(f"Report written to {args.out}.json and {args.out}.md")
+
+
+if __name__ == "__main__":
+    main()
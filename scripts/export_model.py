@@ -0,0 +1,50 @@
+# Model Export
+# Writes an ONNX copy of a sentiment model (and optionally an int8-quantized one)
+# together with its tokenizer and config, ready for swap_model.py --format onnx.
+# Usage: python scripts/export_model.py --model models/twitch-sentiment-v2 --out models/export --quantize
+import argparse
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from primary import HF_REPO, LOCAL_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=None, help="Defaults to the live model")
+    parser.add_argument("--out", default="models/export")
+    parser.add_argument(
+        "--quantize", action="store_true", help="Also write model.int8.onnx"
+    )
+    args = parser.parse_args()
+
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    from inference import export_onnx
+
+    model_path = args.model or (LOCAL_DIR if os.path.exists(LOCAL_DIR) else HF_REPO)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+
+    os.makedirs(args.out, exist_ok=True)
+    onnx_path = os.path.join(args.out, "model.onnx")
+    export_onnx(model, tokenizer, onnx_path)
+    # OnnxClassifier reads the tokenizer and labels from the same directory
+    tokenizer.save_pretrained(args.out)
+    model.config.save_pretrained(args.out)
+    print(f"Exported {model_path} -> {onnx_path}")
+
+    if args.quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(args.out, "model.int8.onnx")
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized -> {quantized_path}")
+
+
+if __name__ == "__main__":
+    main()
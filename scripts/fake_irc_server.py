@@ -0,0 +1,172 @@
+# Fake Twitch IRC Server
+# Serves chat over a local websocket so the raw IRC ingest client can be load
+# tested without Twitch. Replays lines recorded with IrcClient(record_path=...)
+# or generates synthetic PRIVMSGs at a target rate (per connection, spread over
+# the channels it joined).
+# Usage: python scripts/fake_irc_server.py --rate 5000 --selftest
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+
+from aiohttp import WSMsgType, web
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from irc_client import IrcClient  # noqa: E402
+
+SAMPLE_TEXT = ["KEKW", "LUL that was insane", "PogChamp", "gg", "clip it", "W streamer"]
+
+
+def synthetic_lines(channels):
+    """Endless PRIVMSG lines shaped like real Twitch traffic (tags included),
+    spread over `channels` (a live list, updated as the client joins and parts).
+    """
+    for i in itertools.count():
+        channel = random.choice(channels) if channels else "nobody"
+        user = f"viewer{random.randint(1, 5000)}"
+        tags = (
+            f"badge-info=;color=#1E90FF;display-name={user};id={i};mod=0;"
+            f"room-id=1;subscriber=0;tmi-sent-ts={int(time.time() * 1000)};user-id={i}"
+        )
+        yield (
+            f"@{tags} :{user}!{user}@{user}.tmi.twitch.tv "
+            f"PRIVMSG #{channel} :{random.choice(SAMPLE_TEXT)}"
+        )
+
+
+def recorded_lines(path):
+    """Loop over the PRIVMSG lines of a recording forever."""
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f.read().split("\r\n") if " PRIVMSG #" in line]
+    if not lines:
+        raise SystemExit(f"No PRIVMSG lines in {path}")
+    return itertools.cycle(lines)
+
+
+async def stream(ws, lines, rate, frame_lines):
+    """Send lines in frames of frame_lines, paced to roughly `rate` lines/sec."""
+    start = time.perf_counter()
+    sent = 0
+    while not ws.closed:
+        frame = [next(lines) for _ in range(frame_lines)]
+        await ws.send_str("\r\n".join(frame) + "\r\n")
+        sent += frame_lines
+        ahead = sent / rate - (time.perf_counter() - start)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+def make_app(args):
+    async def handler(request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        streamer = None
+        joined = []
+        async for frame in ws:
+            if frame.type != WSMsgType.TEXT:
+                continue
+            for line in frame.data.split("\r\n"):
+                if line.startswith("CAP REQ"):
+                    await ws.send_str(f":tmi.twitch.tv CAP * ACK {line[8:]}\r\n")
+                elif line.startswith("NICK"):
+                    await ws.send_str(":tmi.twitch.tv 001 fake :Welcome, GLHF!\r\n")
+                elif line.startswith("JOIN"):
+                    for channel in line[5:].split(","):
+                        if channel.lstrip("#") in args.fail_channels:
+                            await ws.send_str(
+                                "@msg-id=msg_channel_suspended :tmi.twitch.tv "
+                                f"NOTICE {channel} :This channel has been suspended.\r\n"
+                            )
+                            continue
+                        joined.append(channel.lstrip("#"))
+                        await ws.send_str(
+                            f":fake!fake@fake.tmi.twitch.tv JOIN {channel}\r\n"
+                        )
+                    if streamer is None and joined:
+                        lines = (
+                            recorded_lines(args.replay)
+                            if args.replay
+                            else synthetic_lines(joined)
+                        )
+                        streamer = asyncio.create_task(
+                            stream(ws, lines, args.rate, args.frame_lines)
+                        )
+                elif line.startswith("PART"):
+                    for channel in line[5:].split(","):
+                        if channel.lstrip("#") in joined:
+                            joined.remove(channel.lstrip("#"))
+                elif line.startswith("PONG"):
+                    pass
+        if streamer is not None:
+            streamer.cancel()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    return app
+
+
+async def selftest(args):
+    """Run IrcClient against this server and report parsed messages/sec."""
+    runner = web.AppRunner(make_app(args))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    received = 0
+
+    def on_message(msg):
+        nonlocal received
+        received += 1
+
+    client = IrcClient(["fakechannel"], on_message, url=f"ws://127.0.0.1:{args.port}/")
+    task = asyncio.create_task(client.run())
+    await asyncio.wait_for(client.joined.wait(), timeout=5)
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.sleep(args.seconds)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    task.cancel()
+    await runner.cleanup()
+
+    # Server and client share this process, so CPU time is an upper bound for the client
+    print(f"Target rate:   {args.rate} lines/sec")
+    print(f"Received:      {received} messages in {elapsed:.1f}s")
+    print(f"Throughput:    {received / elapsed:,.0f} msgs/sec")
+    print(f"CPU per msg:   {cpu / max(received, 1) * 1e6:.1f} µs (server included)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=1000, help="Lines per second")
+    parser.add_argument("--frame-lines", type=int, default=10)
+    parser.add_argument("--replay", default=None, help="Raw IRC recording to replay")
+    parser.add_argument(
+        "--fail-channels",
+        default="",
+        help="Comma-separated channels whose JOIN is refused (suspended)",
+    )
+    parser.add_argument(
+        "--selftest", action="store_true", help="Connect IrcClient and measure"
+    )
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    args.fail_channels = {c.strip().lower() for c in args.fail_channels.split(",") if c}
+
+    if args.selftest:
+        asyncio.run(selftest(args))
+    else:
+        print(f"Fake IRC server on ws://127.0.0.1:{args.port}/")
+        web.run_app(make_app(args), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Ingest Log Replay
+# Re-scores raw chat from the backend's append-only ingest log with any model,
+# e.g. to compare a newly trained checkpoint against what was shown live.
+# Usage: python scripts/replay_log.py --model models/twitch-sentiment-v2 --out rescored.csv
+#        python scripts/replay_log.py --channel xqc --out rescored.csv
+import argparse
+import csv
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import sessions  # noqa: E402
+from ingest_log import read_log  # noqa: E402
+from primary import INGEST_LOG_DIR, load_model, should_skip  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--channel",
+        default=None,
+        help="Replay the ingest log of the app's store for this channel",
+    )
+    parser.add_argument("--log-dir", default=None, help="Overrides --channel")
+    parser.add_argument("--model", default=None, help="Defaults to the live model")
+    parser.add_argument("--from-offset", type=int, default=0)
+    parser.add_argument("--to-offset", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--out", default="rescored.csv")
+    args = parser.parse_args()
+    log_dir = args.log_dir or (
+        sessions.ingest_log_dir(args.channel) if args.channel else INGEST_LOG_DIR
+    )
+    if not os.path.isdir(log_dir):
+        print(f"No ingest log at {log_dir}")
+        return
+
+    classifier = load_model(model_path=args.model)
+    if classifier is None:
+        return
+
+    def score(batch, writer):
+        results = classifier([text for _, _, _, text in batch])
+        for (received, channel, offset, text), result in zip(batch, results):
+            writer.writerow(
+                [
+                    offset,
+                    received,
+                    channel,
+                    text,
+                    result[0]["label"],
+                    result[0]["score"],
+                ]
+            )
+
+    start = time.perf_counter()
+    scored = 0
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["offset", "received", "channel", "message", "label", "score"])
+        batch = []
+        for offset, (received, channel, user, text) in read_log(
+            log_dir, args.from_offset
+        ):
+            if args.to_offset is not None and offset >= args.to_offset:
+                break
+            if should_skip(user, text):
+                continue
+            batch.append((received, channel, offset, text))
+            if len(batch) == args.batch_size:
+                score(batch, writer)
+                scored += len(batch)
+                batch = []
+        if batch:
+            score(batch, writer)
+            scored += len(batch)
+
+    elapsed = time.perf_counter() - start
+    print(f"Rescored {scored} messages in {elapsed:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,35 @@
 # Twitch Chat Data Scraper
 # This script connects to various Twitch channels and collects chat messages,
-# saving them to a CSV for later use in model training.
+# saving them to CSV for later use in model training.
+# Rows (channel, message, sent timestamp, user) are buffered in memory and written
+# in batches to files that rotate by size or hour, optionally gzip/zstd compressed.
+# With --ingest irc, channels are sharded over anonymous IRC connections of at most
+# --per-connection channels, spread across --workers processes (one file set each).
+# Usage: python scripts/scraper.py --out-dir scraped --compress gzip --rotate-mb 256
+#        python scripts/scraper.py --ingest irc --channels-file channels.txt --workers 4
+import argparse
+import asyncio
+import csv
+import gzip
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from collections import defaultdict
+
 from twitchAPI.chat import Chat, ChatMessage
 from twitchAPI.type import AuthScope, ChatEvent
 from twitchAPI.oauth import UserAuthenticator
 from twitchAPI.twitch import Twitch
-import asyncio
-import aiofiles
-from aiocsv import AsyncWriter
-import config
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import config  # noqa: E402
+from irc_client import JOIN_INTERVAL_SECONDS, TWITCH_IRC_URL, IrcClient  # noqa: E402
 
 # Configuration
 CLIENT_ID = config.client_id
@@ -39,42 +60,200 @@ TARGET_CHANNELS = [
     "sakurashymko",
 ]
 
-output_file = "twitch_data_1m.csv"
+output_prefix = "twitch_chat"
+REPORT_SECONDS = 10
+EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
 
 
-# Save messages to CSV
-async def save_message(message_list):
-    async with aiofiles.open(output_file, mode="a", newline="", encoding="utf-8") as f:
-        writer = AsyncWriter(f)
-        await writer.writerow(message_list)
+class ChatWriter:
+    """Buffers chat rows and writes them in batches to rotating CSV files.
 
+    A batch is written when flush_rows rows are waiting or every flush_seconds,
+    on a worker thread so compression never stalls the event loop. A new file is
+    started when the current one reaches rotate_bytes on disk or, with hourly
+    rotation, when the hour changes.
+    """
 
-# Handle incoming chat messages
-async def on_message(msg: ChatMessage):
-    text = msg.text or ""
-    user = msg.user.display_name.lower()
+    def __init__(
+        self,
+        out_dir,
+        prefix=output_prefix,
+        compression="none",
+        rotate_bytes=256 * 1024 * 1024,
+        hourly=False,
+        flush_rows=2000,
+        flush_seconds=2.0,
+    ):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.hourly = hourly
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.buffer = []
+        self.wake = asyncio.Event()
+        self.file = None
+        self.writer = None
+        self.path = None
+        self.hour = None
+        self.rows = 0  # rows written so far
+        self.files = 0
+        self.stopped = False
+
+    def add(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.flush_rows:
+            self.wake.set()
+
+    async def run(self):
+        """Flush loop; returns once stop() has been called and everything is written."""
+        while not self.stopped:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            rows, self.buffer = self.buffer, []
+            if rows:
+                await asyncio.to_thread(self._write, rows)
+        await asyncio.to_thread(self.close)
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
+
+    def close(self):
+        rows, self.buffer = self.buffer, []
+        if rows:
+            self._write(rows)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _open(self, path):
+        if self.compression == "gzip":
+            return gzip.open(path, "wt", newline="", encoding="utf-8")
+        if self.compression == "zstd":
+            import zstandard
+
+            return zstandard.open(path, "wt", newline="", encoding="utf-8")
+        return open(path, "w", newline="", encoding="utf-8")
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        self.hour = time.strftime("%Y%m%d-%H")
+        os.makedirs(self.out_dir, exist_ok=True)
+        part = 0
+        while True:
+            self.path = os.path.join(
+                self.out_dir,
+                f"{self.prefix}-{self.hour}-{part:03d}.csv"
+                + EXTENSIONS[self.compression],
+            )
+            if not os.path.exists(self.path):
+                break
+            part += 1
+        self.file = self._open(self.path)
+        self.writer = csv.writer(self.file)
+        self.files += 1
+        print(f"Writing to {self.path}")
+
+    def _write(self, rows):
+        if (
+            self.file is None
+            or (self.hourly and time.strftime("%Y%m%d-%H") != self.hour)
+            or os.path.getsize(self.path) >= self.rotate_bytes
+        ):
+            self._rotate()
+        self.writer.writerows(rows)
+        if self.compression == "none":
+            # Compressed streams flush whole blocks on their own; flushing them
+            # per batch would only hurt the ratio
+            self.file.flush()
+        self.rows += len(rows)
+
+
+chat_writer = None
+verbose = False
+
+# Sharded IRC scraping
+MAX_JOIN_ATTEMPTS = 3  # connections a channel is tried on before it is dropped
+
+
+def unique_channels(channels):
+    """Lowercased channel names without '#' or duplicates, in first-seen order."""
+    return list(
+        dict.fromkeys(c.strip().lower().lstrip("#") for c in channels if c.strip())
+    )
+
+
+def keep_message(user, text):
     # Skip bots
     if user in BOT_LIST:
-        return
+        return False
     # Skip commands (starting with !)
     if text.startswith("!"):
-        return
+        return False
     # Skip links (http or https)
     if "http" in text.lower():  # cheaper than per-word slicing
+        return False
+    return True
+
+
+def make_writer(args, prefix=output_prefix):
+    return ChatWriter(
+        args.out_dir,
+        prefix=prefix,
+        compression=args.compress,
+        rotate_bytes=int(args.rotate_mb * 1024 * 1024),
+        hourly=args.rotate_hourly,
+        flush_rows=args.flush_rows,
+        flush_seconds=args.flush_seconds,
+    )
+
+
+# Handle incoming chat messages
+async def on_message(msg: ChatMessage):
+    text = msg.text or ""
+    user = msg.user.name.lower()
+    if not keep_message(user, text):
         return
 
     channel_name = msg.room.name
 
-    try:
-        print(f"[{channel_name}] {text}")  # Log message to console
-    except Exception:
-        pass  # Ignore emoji-related errors
+    if verbose:
+        try:
+            print(f"[{channel_name}] {text}")  # Log message to console
+        except Exception:
+            pass  # Ignore emoji-related errors
+
+    chat_writer.add([channel_name, text, msg.sent_timestamp / 1000, user])
 
-    await save_message([channel_name, text])  # Save message to CSV
 
+async def report_throughput(writer):
+    """Print sustained rows/sec every REPORT_SECONDS."""
+    start = time.perf_counter()
+    last_rows, last_time = 0, start
+    while True:
+        await asyncio.sleep(REPORT_SECONDS)
+        now = time.perf_counter()
+        rows = writer.rows + len(writer.buffer)
+        print(
+            f"{(rows - last_rows) / (now - last_time):,.0f} rows/s "
+            f"(avg {rows / (now - start):,.0f}) | {rows} rows | {writer.path}"
+        )
+        last_rows, last_time = rows, now
+
+
+# Main execution (twitchAPI: one authenticated connection)
+async def main(args, channels):
+    global chat_writer
+    chat_writer = make_writer(args)
+    writer_task = asyncio.create_task(chat_writer.run())
+    report_task = asyncio.create_task(report_throughput(chat_writer))
 
-# Main execution
-async def main():
     print("Authenticating...")
     twitch = await Twitch(CLIENT_ID, CLIENT_SECRET)
     auth = UserAuthenticator(twitch, USER_SCOPE)
@@ -86,13 +265,13 @@ async def main():
     chat = await Chat(twitch)
     chat.register_event(ChatEvent.MESSAGE, on_message)
     chat.start()
-    print(f"Connecting to {len(TARGET_CHANNELS)} channels...")
+    print(f"Connecting to {len(channels)} channels...")
 
     # Join target channels
     try:
-        await chat.join_room(TARGET_CHANNELS)
-        print(f"Successfully joined: {', '.join(TARGET_CHANNELS)}")
-        print(f"Scraping data to {output_file}...")
+        await chat.join_room(channels)
+        print(f"Successfully joined: {', '.join(channels)}")
+        print(f"Scraping data to {args.out_dir}/...")
         print("Press Ctrl+C to stop.")
     except Exception as e:
         print(f"Error joining channels: {e}")
@@ -100,16 +279,266 @@ async def main():
     # Keep running until interrupted
     try:
         await asyncio.Event().wait()
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         pass
     finally:
         print("\nStopping scraper...")
         chat.stop()
         await twitch.close()
+        report_task.cancel()
+        chat_writer.stop()
+        await writer_task
+        print(f"Saved {chat_writer.rows} rows in {chat_writer.files} files.")
 
 
-if __name__ == "__main__":
+def plan_shards(channels, per_connection, workers):
+    """Cut channels into connections of at most per_connection channels and deal
+    the connections round-robin to worker processes.
+    """
+    connections = [
+        channels[i : i + per_connection]
+        for i in range(0, len(channels), per_connection)
+    ]
+    return [connections[w::workers] for w in range(min(workers, len(connections)))]
+
+
+class Shard:
+    """One IRC connection inside a worker process, with its row counter."""
+
+    def __init__(self, name, channels, writer, args):
+        self.name = name
+        self.writer = writer
+        self.rows = 0
+        self.client = IrcClient(
+            channels, self.on_message, url=args.url, join_interval=args.join_interval
+        )
+        self.task = asyncio.create_task(self.client.run())
+
+    def on_message(self, msg):
+        if not keep_message(msg.user, msg.text):
+            return
+        self.rows += 1
+        sent = msg.tag("tmi-sent-ts")
+        timestamp = int(sent) / 1000 if sent else time.time()
+        self.writer.add([msg.channel, msg.text, timestamp, msg.user])
+
+
+async def rebalance(shards, attempts, dropped, worker_id, writer, args):
+    """Move channels a connection failed to join (refused, or no confirmation
+    within --join-timeout) to the least-loaded other connection, opening a new
+    one if all are full. A channel is dropped after MAX_JOIN_ATTEMPTS connections.
+    """
+    now = time.monotonic()
+    for shard in list(shards):
+        client = shard.client
+        stuck = {
+            c: reason
+            for c, reason in client.failed_channels.items()
+            if c in client.channels
+        }
+        for channel, requested in list(client.join_requested.items()):
+            if (
+                channel not in client.joined_channels
+                and channel not in stuck
+                and now - requested > args.join_timeout
+            ):
+                stuck[channel] = "join timeout"
+
+        for channel, reason in stuck.items():
+            await client.part([channel])
+            client.failed_channels.pop(channel, None)
+            attempts[channel] += 1
+            if attempts[channel] >= MAX_JOIN_ATTEMPTS:
+                dropped[channel] = reason
+                print(
+                    f"Dropped #{channel} after {attempts[channel]} attempts ({reason})"
+                )
+                continue
+            others = [
+                s
+                for s in shards
+                if s is not shard and len(s.client.channels) < args.per_connection
+            ]
+            if others:
+                target = min(others, key=lambda s: len(s.client.channels))
+                await target.client.join([channel])
+            else:
+                target = Shard(f"{worker_id}.{len(shards)}", [channel], writer, args)
+                shards.append(target)
+            print(f"Moved #{channel} from {shard.name} to {target.name} ({reason})")
+
+
+async def scrape_shards(worker_id, connections, args, stats_queue, stop_event):
+    writer = make_writer(args, prefix=f"{output_prefix}-w{worker_id}")
+    writer_task = asyncio.create_task(writer.run())
+    shards = [
+        Shard(f"{worker_id}.{i}", channels, writer, args)
+        for i, channels in enumerate(connections)
+    ]
+    attempts = defaultdict(int)
+    dropped = {}
+
+    def report():
+        stats_queue.put(
+            (
+                worker_id,
+                [
+                    (
+                        s.name,
+                        len(s.client.channels),
+                        len(s.client.joined_channels),
+                        s.rows,
+                    )
+                    for s in shards
+                ],
+                dict(dropped),
+            )
+        )
+
     try:
-        asyncio.run(main())
+        while not stop_event.is_set():
+            await asyncio.sleep(1)
+            await rebalance(shards, attempts, dropped, worker_id, writer, args)
+            report()
+    finally:
+        for shard in shards:
+            shard.task.cancel()
+        writer.stop()
+        await writer_task
+        report()
+
+
+def worker_process(worker_id, connections, args, stats_queue, stop_event):
+    # The parent handles Ctrl+C and tells workers to stop, so buffers get flushed
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if args.uvloop:
+        import uvloop
+
+        uvloop.install()
+    asyncio.run(scrape_shards(worker_id, connections, args, stats_queue, stop_event))
+
+
+def print_shard_stats(latest, previous, elapsed, interval):
+    shards = [shard for stats in latest.values() for shard in stats[0]]
+    dropped = {c: r for stats in latest.values() for c, r in stats[1].items()}
+    rows = sum(shard[3] for shard in shards)
+    rate = (rows - sum(previous.values())) / interval
+    assigned = sum(shard[1] for shard in shards)
+    joined = sum(shard[2] for shard in shards)
+    print(
+        f"[{elapsed:5.0f}s] {rate:,.0f} rows/s | {rows} rows | "
+        f"{joined}/{assigned} channels joined on {len(shards)} connections"
+        + (f", {len(dropped)} dropped" if dropped else "")
+    )
+    for name, assigned, joined, count in shards:
+        shard_rate = (count - previous.get(name, 0)) / interval
+        print(
+            f"  conn {name:<6} {joined:>4}/{assigned:<4} joined {shard_rate:>10,.0f} rows/s"
+        )
+    return {shard[0]: shard[3] for shard in shards}
+
+
+def run_sharded(args, channels):
+    """Scrape over raw IRC with channels sharded across connections and processes."""
+    plan = plan_shards(channels, args.per_connection, args.workers)
+    print(
+        f"{len(channels)} channels on {sum(map(len, plan))} connections "
+        f"in {len(plan)} worker processes"
+    )
+    ctx = multiprocessing.get_context("spawn")
+    stats_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    workers = [
+        ctx.Process(
+            target=worker_process, args=(w, connections, args, stats_queue, stop_event)
+        )
+        for w, connections in enumerate(plan)
+    ]
+    for worker in workers:
+        worker.start()
+
+    start = last_print = time.monotonic()
+    latest, previous = {}, {}
+    try:
+        while not args.seconds or time.monotonic() - start < args.seconds:
+            try:
+                worker_id, *stats = stats_queue.get(timeout=1)
+                latest[worker_id] = stats
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now - last_print >= REPORT_SECONDS and latest:
+                previous = print_shard_stats(
+                    latest, previous, now - start, now - last_print
+                )
+                last_print = now
     except KeyboardInterrupt:
-        print("Scraper stopped by user.")
+        pass
+    finally:
+        print("\nStopping scraper...")
+        stop_event.set()
+        # Keep draining so workers can't block on a full queue while exiting
+        while any(worker.is_alive() for worker in workers):
+            try:
+                worker_id, *stats = stats_queue.get(timeout=0.5)
+                latest[worker_id] = stats
+            except queue.Empty:
+                pass
+    now = time.monotonic()
+    print_shard_stats(latest, previous, now - start, now - last_print)
+    rows = sum(shard[3] for stats in latest.values() for shard in stats[0])
+    print(f"Saved {rows} rows ({rows / (now - start):,.0f} rows/s overall).")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out-dir", default="scraped")
+    parser.add_argument("--compress", choices=list(EXTENSIONS), default="none")
+    parser.add_argument(
+        "--rotate-mb", type=float, default=256, help="Start a new file past this size"
+    )
+    parser.add_argument(
+        "--rotate-hourly", action="store_true", help="Also start a new file every hour"
+    )
+    parser.add_argument("--flush-rows", type=int, default=2000)
+    parser.add_argument("--flush-seconds", type=float, default=2.0)
+    parser.add_argument("--verbose", action="store_true", help="Print every message")
+    parser.add_argument(
+        "--channels-file", default=None, help="One channel per line, added to the list"
+    )
+    parser.add_argument(
+        "--ingest",
+        choices=["twitchapi", "irc"],
+        default=config.ingest_backend,
+        help="irc shards channels over anonymous connections and processes",
+    )
+    parser.add_argument("--url", default=TWITCH_IRC_URL, help="IRC websocket URL")
+    parser.add_argument("--per-connection", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--join-interval", type=float, default=JOIN_INTERVAL_SECONDS)
+    parser.add_argument("--join-timeout", type=float, default=30)
+    parser.add_argument("--uvloop", action="store_true", default=config.use_uvloop)
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        default=0,
+        help="Stop after this long (0 = until Ctrl+C)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    verbose = args.verbose
+    channels = TARGET_CHANNELS
+    if args.channels_file:
+        with open(args.channels_file, encoding="utf-8") as f:
+            channels = channels + f.read().split()
+    channels = unique_channels(channels)
+    if args.ingest == "irc":
+        run_sharded(args, channels)
+    else:
+        try:
+            asyncio.run(main(args, channels))
+        except KeyboardInterrupt:
+            print("Scraper stopped by user.")
@@ -0,0 +1,185 @@
+# Similar Messages
+# Nearest-neighbour search over the message embeddings a backend stores when it
+# runs with --embeddings (or MESSAGE_EMBEDDINGS=float16|int8). Builds an IVF index
+# from chat_embeddings, caches it next to the database and adds newer rows on
+# later runs, then lists messages like a given one or the session's copypastas.
+# Usage: python scripts/similar_messages.py --channel xqc --like "is this a rerun"
+#        python scripts/similar_messages.py --channel xqc --rowid 1234
+#        python scripts/similar_messages.py --channel xqc --copypasta --threshold 0.95
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import sessions  # noqa: E402
+from embeddings import IvfIndex, decode, load_embeddings  # noqa: E402
+from primary import DB_PATH, HF_REPO, LOCAL_DIR, load_model, model_version  # noqa: E402
+
+LATEST_VERSION_SQL = """
+    SELECT c.model_version FROM chat_embeddings e
+    JOIN chat_log c ON c.rowid = e.message_rowid
+    ORDER BY e.message_rowid DESC LIMIT 1
+"""
+
+
+def open_index(conn, path, version, rebuild=False):
+    """Load the cached index for this model version and add rows stored since;
+    rebuild it when there is none or it has more than doubled since training.
+    """
+    start = time.perf_counter()
+    if not rebuild and os.path.exists(path):
+        index, last_rowid = IvfIndex.load(path)
+        if index.version == version:
+            ids, vectors = load_embeddings(conn, version, last_rowid)
+            if len(ids) <= len(index):
+                if len(ids):
+                    index.add(ids, vectors)
+                    index.save(path, int(ids[-1]))
+                print(
+                    f"Index: {len(index)} vectors (+{len(ids)} new) "
+                    f"in {time.perf_counter() - start:.1f}s"
+                )
+                return index
+
+    ids, vectors = load_embeddings(conn, version)
+    if not len(ids):
+        raise SystemExit(f"No embeddings stored for {version}")
+    index = IvfIndex.build(ids, vectors, version=version)
+    index.save(path, int(ids[-1]))
+    print(
+        f"Built index: {len(index)} vectors in {len(index.centroids)} lists "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return index
+
+
+def messages(conn, rowids):
+    """rowid -> (timestamp, channel, message, label)."""
+    rowids = [int(r) for r in rowids]
+    rows = conn.execute(
+        "SELECT rowid, timestamp, channel, message, label FROM chat_log "
+        f"WHERE rowid IN ({', '.join('?' * len(rowids))})",
+        rowids,
+    ).fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+def clock(timestamp):
+    return time.strftime("%H:%M:%S", time.localtime(timestamp))
+
+
+def print_neighbours(conn, ids, sims):
+    found = messages(conn, ids[ids >= 0])
+    for rowid, sim in zip(ids, sims):
+        if rowid < 0:
+            break
+        timestamp, channel, text, label = found[int(rowid)]
+        print(
+            f"  {sim:.3f}  #{rowid:<8} {clock(timestamp)} [{channel}] {label:<8} {text}"
+        )
+
+
+def print_copypastas(conn, index, threshold, min_size, top):
+    start = time.perf_counter()
+    labels = index.duplicate_groups(threshold)
+    heads, sizes = np.unique(labels, return_counts=True)
+    order = np.argsort(-sizes, kind="stable")
+    order = order[sizes[order] >= min_size][:top]
+    print(
+        f"{int((sizes >= min_size).sum())} groups of {min_size}+ near-identical "
+        f"messages (similarity >= {threshold}) in {time.perf_counter() - start:.1f}s"
+    )
+    found = messages(conn, heads[order])
+    for head, size in zip(heads[order], sizes[order]):
+        last = int(index.ids[labels == head].max())
+        timestamp, channel, text, _ = found[int(head)]
+        end = messages(conn, [last])[last][0]
+        print(f"  {size:>6}x  {clock(timestamp)}-{clock(end)} [{channel}] {text[:80]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--channel", default=None, help="The app's session for this channel"
+    )
+    parser.add_argument(
+        "--db", default=None, help="Database path (overrides --channel)"
+    )
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument(
+        "--like", default=None, help="Find messages similar to this text"
+    )
+    query.add_argument(
+        "--rowid", type=int, default=None, help="...or to this stored message"
+    )
+    query.add_argument(
+        "--copypasta", action="store_true", help="List recurring messages"
+    )
+    parser.add_argument("-k", type=int, default=10, help="Neighbours to list")
+    parser.add_argument("--nprobe", type=int, default=8, help="Lists scanned per query")
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--min-size", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument(
+        "--model",
+        default=None,
+        help="Model that embeds --like text; must be the one that stored the vectors",
+    )
+    parser.add_argument(
+        "--version", default=None, help="Defaults to the latest model version"
+    )
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    db = args.db or (sessions.db_path(args.channel) if args.channel else DB_PATH)
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    version = args.version
+    if version is None:
+        row = conn.execute(LATEST_VERSION_SQL).fetchone()
+        if row is None:
+            raise SystemExit(
+                f"No embeddings in {db}; run the backend with --embeddings"
+            )
+        version = row[0]
+    print(f"{db} ({version})")
+    index = open_index(
+        conn, f"{os.path.splitext(db)[0]}.ivf.npz", version, args.rebuild
+    )
+
+    if args.copypasta:
+        print_copypastas(conn, index, args.threshold, args.min_size, args.top)
+        return
+
+    if args.rowid is not None:
+        row = conn.execute(
+            "SELECT scale, vector FROM chat_embeddings WHERE message_rowid = ?",
+            (args.rowid,),
+        ).fetchone()
+        if row is None:
+            raise SystemExit(f"Message #{args.rowid} has no embedding")
+        vector = decode([row[0]], [row[1]])
+    else:
+        model_path = args.model or (LOCAL_DIR if os.path.exists(LOCAL_DIR) else HF_REPO)
+        if model_version(model_path).split(":")[0] != version.split(":")[0]:
+            print(f"Warning: {model_path} may not be the model that produced {version}")
+        classifier = load_model(warmup=False, model_path=model_path, embed=True)
+        if classifier is None:
+            return
+        _, vector = classifier.classify_and_embed([args.like])
+
+    start = time.perf_counter()
+    ids, sims = index.search(vector, args.k + (args.rowid is not None), args.nprobe)
+    print(f"Searched in {(time.perf_counter() - start) * 1000:.1f} ms")
+    keep = ids[0] != args.rowid  # a stored message is its own nearest neighbour
+    print_neighbours(conn, ids[0][keep][: args.k], sims[0][keep][: args.k])
+
+
+if __name__ == "__main__":
+    main()
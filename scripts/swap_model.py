@@ -0,0 +1,85 @@
+# Model Hot-Swap
+# Asks the running backend to load another model version, shadow it against the
+# live model on real chat, and switch over between batches if it passes.
+# Usage: python scripts/swap_model.py --path models/twitch-sentiment-v2
+#        python scripts/swap_model.py --path models/export/model.int8.onnx --format onnx
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import sessions  # noqa: E402
+from primary import DB_PATH  # noqa: E402
+
+FORMATS = ["eager", "onnx", "quantized", "trace", "compile"]
+FINAL_STATUSES = ("live", "rejected", "failed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", required=True, help="Model directory or .onnx file")
+    parser.add_argument("--format", choices=FORMATS, default="eager")
+    parser.add_argument(
+        "--force", action="store_true", help="Promote regardless of shadow results"
+    )
+    parser.add_argument("--no-wait", action="store_true")
+    parser.add_argument(
+        "--channel",
+        default=None,
+        help="Swap the model of the app's session for this channel",
+    )
+    args = parser.parse_args()
+
+    # Local paths are resolved by the backend, which runs from the repo root;
+    # anything else is treated as a HuggingFace repo id
+    path = args.path
+    if os.path.exists(path):
+        path = os.path.relpath(os.path.abspath(path), parent_dir)
+    conn = sqlite3.connect(sessions.db_path(args.channel) if args.channel else DB_PATH)
+    cursor = conn.execute(
+        """INSERT INTO model_swaps (requested, path, format, force, status)
+        VALUES (?, ?, ?, ?, 'pending')""",
+        (
+            time.time(),
+            path,
+            None if args.format == "eager" else args.format,
+            args.force,
+        ),
+    )
+    conn.commit()
+    swap_id = cursor.lastrowid
+    print(f"Requested swap #{swap_id} to {path} ({args.format})")
+    if args.no_wait:
+        return
+
+    last = None
+    while True:
+        row = conn.execute(
+            """SELECT status, version, messages, agreement, live_p50_ms,
+            candidate_p50_ms, note FROM model_swaps WHERE id = ?""",
+            (swap_id,),
+        ).fetchone()
+        status = row[0]
+        if status != last:
+            print(f"  {status}")
+            last = status
+        if status in FINAL_STATUSES:
+            break
+        time.sleep(2)
+
+    _, version, messages, agreement, live_ms, candidate_ms, note = row
+    print(f"Version:   {version}")
+    if messages:
+        print(f"Compared:  {messages} messages, {agreement:.1%} label agreement")
+        print(f"Batch p50: live {live_ms:.1f} ms, candidate {candidate_ms:.1f} ms")
+    print(f"Result:    {status} ({note})")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# Per-channel backend stores and the registry of who is watching them.
+# Each monitored channel gets its own directory under sessions/ holding its own
+# SQLite database and ingest log, written by its own run.py process, so viewers
+# of different channels never share a writer or wipe each other's data. Viewers
+# of the same channel share one backend. registry.db tracks backends and viewer
+# heartbeats; backends nobody is watching are stopped. A stopped channel's store
+# (database and ingest log) is kept, so reconnecting resumes it, until it is
+# deleted from the dashboard or has not been written for SESSION_RETENTION_SECONDS.
+import os
+import re
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SESSIONS_DIR = os.path.join(ROOT, "sessions")
+REGISTRY_PATH = os.path.join(SESSIONS_DIR, "registry.db")
+MAX_BACKENDS = int(os.getenv("MAX_BACKENDS", "4"))  # concurrent run.py processes
+IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", "300"))  # viewer heartbeat timeout
+RETENTION_SECONDS = int(os.getenv("SESSION_RETENTION_SECONDS", str(7 * 24 * 3600)))
+CHANNEL_RE = re.compile(r"^[a-z0-9_]{1,25}$")  # Twitch login names
+
+
+class BackendLimitReached(RuntimeError):
+    pass
+
+
+def channel_key(channel):
+    """Normalized channel name, also used as the store's directory name."""
+    key = channel.strip().lower().lstrip("#")
+    if not CHANNEL_RE.match(key):
+        raise ValueError(f"Not a valid Twitch channel name: {channel!r}")
+    return key
+
+
+def store_dir(channel):
+    return os.path.join(SESSIONS_DIR, channel_key(channel))
+
+
+def db_path(channel):
+    return os.path.join(store_dir(channel), "twitch_data.db")
+
+
+def ingest_log_dir(channel):
+    return os.path.join(store_dir(channel), "ingest_log")
+
+
+@contextmanager
+def registry():
+    """Registry connection in autocommit mode; callers open their own transactions."""
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    conn = sqlite3.connect(REGISTRY_PATH, timeout=5, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS backends (channel TEXT PRIMARY KEY, pid INTEGER, started REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS viewers (session_id TEXT PRIMARY KEY, channel TEXT, last_seen REAL)"
+        )
+        yield conn
+    finally:
+        conn.close()
+
+
+def alive(pid):
+    if os.name == "nt":
+        return True  # os.kill(pid, 0) would send CTRL_C_EVENT on Windows
+    try:
+        # Reap our own exited children, which would otherwise look alive as zombies
+        if os.waitpid(pid, os.WNOHANG)[0]:
+            return False
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def stop_backend(conn, channel, pid):
+    """Stop a channel's backend, keeping its store for the next attach."""
+    if alive(pid):
+        try:
+            # The backend flushes its ingest log on SIGTERM
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+    conn.execute("DELETE FROM backends WHERE channel = ?", (channel,))
+    print(f"Stopped backend for {channel}")
+
+
+def last_written(store):
+    """Latest modification time of anything in a store."""
+    latest = os.path.getmtime(store)
+    for parent, _, files in os.walk(store):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(parent, name)))
+    return latest
+
+
+def stored_channels(conn):
+    """Channels with a store on disk and no running backend."""
+    running = {channel for (channel,) in conn.execute("SELECT channel FROM backends")}
+    if not os.path.isdir(SESSIONS_DIR):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(SESSIONS_DIR)
+        if os.path.isdir(os.path.join(SESSIONS_DIR, name)) and name not in running
+    )
+
+
+def delete_store(channel):
+    """Delete a stopped channel's database and ingest log."""
+    key = channel_key(channel)
+    with registry() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute(
+                "SELECT 1 FROM backends WHERE channel = ?", (key,)
+            ).fetchone():
+                raise RuntimeError(f"{key} is still being monitored")
+            shutil.rmtree(store_dir(key), ignore_errors=True)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    print(f"Deleted store for {key}")
+
+
+def cleanup(conn=None):
+    """Forget viewers without a recent heartbeat, stop backends nobody watches and
+    delete stores past their retention.
+    """
+    if conn is None:
+        with registry() as conn:
+            return cleanup(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "DELETE FROM viewers WHERE last_seen < ?", (time.time() - IDLE_SECONDS,)
+        )
+        idle = conn.execute(
+            """SELECT channel, pid FROM backends
+            WHERE channel NOT IN (SELECT channel FROM viewers)"""
+        ).fetchall()
+        crashed = [
+            (channel, pid)
+            for channel, pid in conn.execute("SELECT channel, pid FROM backends")
+            if not alive(pid)
+        ]
+        for channel, pid in set(idle + crashed):
+            stop_backend(conn, channel, pid)
+        expire = time.time() - RETENTION_SECONDS
+        for channel in stored_channels(conn):
+            store = os.path.join(SESSIONS_DIR, channel)
+            if last_written(store) < expire:
+                shutil.rmtree(store, ignore_errors=True)
+                print(f"Deleted store for {channel} after {RETENTION_SECONDS}s unused")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def attach(session_id, channel):
+    """Register a viewer for a channel, starting its backend if none is running.
+    Returns the path of the channel's database.
+    """
+    key = channel_key(channel)
+    cleanup()
+    with registry() as conn:
+        # IMMEDIATE serializes concurrent connects, so a channel only gets one backend
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT pid FROM backends WHERE channel = ?", (key,)
+            ).fetchone()
+            if row is None:
+                (running,) = conn.execute("SELECT COUNT(*) FROM backends").fetchone()
+                if running >= MAX_BACKENDS:
+                    raise BackendLimitReached(
+                        f"{running} channels are already being monitored (limit {MAX_BACKENDS})"
+                    )
+                # Reuse a kept store: the backend resumes from its ingest log
+                store = store_dir(key)
+                os.makedirs(store, exist_ok=True)
+                # sys.executable guarantees we use the same Python venv
+                process = subprocess.Popen(
+                    [sys.executable, "run.py", "--channel", key, "--store", store],
+                    cwd=ROOT,
+                )
+                conn.execute(
+                    "INSERT INTO backends VALUES (?, ?, ?)",
+                    (key, process.pid, time.time()),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO viewers VALUES (?, ?, ?)",
+                (session_id, key, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return db_path(key)
+
+
+def backend_started(channel):
+    """When the channel's running backend was started, or None if none is running."""
+    with registry() as conn:
+        row = conn.execute(
+            "SELECT started FROM backends WHERE channel = ?", (channel_key(channel),)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def heartbeat(session_id):
+    with registry() as conn:
+        conn.execute(
+            "UPDATE viewers SET last_seen = ? WHERE session_id = ?",
+            (time.time(), session_id),
+        )
+
+
+def detach(session_id):
+    """Remove a viewer; its backend stops if nobody else is watching."""
+    with registry() as conn:
+        conn.execute("DELETE FROM viewers WHERE session_id = ?", (session_id,))
+        cleanup(conn)
@@ -0,0 +1,283 @@
+# Fixed-memory streaming summaries used by the backend.
+# Memory depends only on the configured capacity, never on chat volume.
+import hashlib
+import heapq
+import math
+import re
+import zlib
+
+# Words ignored when extracting trending terms
+STOPWORDS = frozenset(
+    "a an and are at be but for he i in is it its me my of on or so that the "
+    "this to u was we what you".split()
+)
+TOKEN_RE = re.compile(r"[\w']+")
+MAX_TERMS_PER_MESSAGE = 24  # bounds the per-message cost of long copypastas
+USER_SAMPLE_SIZE = 1024  # chatters per window whose sentiment is averaged per user
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch (Metwally et al.) with a side weight per term.
+
+    Tracks at most `capacity` terms. When a new term arrives and the sketch is
+    full, it replaces the term with the smallest count and inherits that count
+    as its error bound, so every true top term with frequency above N/capacity
+    is guaranteed to be present.
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counters = {}  # term -> [count, error, weight]
+        self.heap = []  # one (count, term) entry per term; counts may be stale-low
+        self.total = 0
+
+    def add(self, term, weight=0.0):
+        self.total += 1
+        counter = self.counters.get(term)
+        if counter is not None:
+            counter[0] += 1
+            counter[2] += weight
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[term] = [1, 0, weight]
+            heapq.heappush(self.heap, (1, term))
+            return
+
+        # Pop until the heap top is current; stale entries are re-pushed with their
+        # real count, so the heap always holds exactly one entry per tracked term
+        while True:
+            count, victim = self.heap[0]
+            if self.counters[victim][0] == count:
+                break
+            heapq.heapreplace(self.heap, (self.counters[victim][0], victim))
+        del self.counters[victim]
+        self.counters[term] = [count + 1, count, weight]
+        heapq.heapreplace(self.heap, (count + 1, term))
+
+    def top(self, k=10):
+        """Return up to k (term, count, error, weight) tuples.
+        Ranked by guaranteed count (count - error) so recently swapped-in terms
+        with a large inherited error don't crowd out real heavy hitters.
+        """
+        items = heapq.nlargest(
+            k, self.counters.items(), key=lambda kv: kv[1][0] - kv[1][1]
+        )
+        return [(term, c[0], c[1], c[2]) for term, c in items]
+
+
+def extract_terms(text):
+    """Unique words and two-word phrases in a message, lowercased.
+    Stopwords are dropped as single words but kept inside phrases ("clip it").
+    """
+    words = TOKEN_RE.findall(text.lower())
+    terms = dict.fromkeys(w for w in words if w not in STOPWORDS)
+    terms.update(
+        dict.fromkeys(
+            f"{a} {b}"
+            for a, b in zip(words, words[1:])
+            if a != b and not (a in STOPWORDS and b in STOPWORDS)
+        )
+    )
+    return list(terms)[:MAX_TERMS_PER_MESSAGE]
+
+
+class TrendingTerms:
+    """Per-minute top terms for one channel, weighted by message sentiment.
+
+    Each message adds +score (positive), -score (negative) or 0 (neutral) to the
+    weight of every term it contains, so a term's average weight shows which
+    way it is pulling the chat.
+    """
+
+    def __init__(self, channel, capacity=200, window=60):
+        self.channel = channel
+        self.capacity = capacity
+        self.window = window
+        self.bucket = None
+        self.sketch = SpaceSaving(capacity)
+        self.closed = []  # (bucket, sketch) for windows that have ended
+
+    def add(self, timestamp, text, label, score):
+        bucket = int(timestamp // self.window * self.window)
+        # Send times arrive slightly out of order; a straggler from the previous
+        # minute is counted in the current one rather than reopening the old one
+        if self.bucket is None or bucket > self.bucket:
+            self.roll(bucket)
+        if label == "positive":
+            weight = score
+        elif label == "negative":
+            weight = -score
+        else:
+            weight = 0.0
+        for term in extract_terms(text):
+            self.sketch.add(term, weight)
+
+    def roll(self, bucket):
+        """Start a new window, keeping the finished one until drained."""
+        if self.bucket is not None and self.sketch.total:
+            self.closed.append((self.bucket, self.sketch))
+        self.bucket = bucket
+        self.sketch = SpaceSaving(self.capacity)
+
+    def drain(self):
+        """Return and clear windows that have ended."""
+        closed, self.closed = self.closed, []
+        return closed
+
+
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+
+
+def hash64(value):
+    """Stable 64-bit hash of a string (Python's hash() is salted per process)."""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter. Sketches with the same precision can be merged,
+    so per-second sketches combine into counts for any time range.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers or self.m)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, h):
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate while most registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return estimate
+
+    def to_bytes(self):
+        """Precision byte + zlib-compressed registers (sparse sketches shrink to ~100 B)."""
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[0], zlib.decompress(data[1:]))
+
+
+def sentiment_split(label, score):
+    """(positive, negative) share of one message, matching the dashboard's bars."""
+    if label == "positive":
+        return score, 1.0 - score
+    if label == "negative":
+        return 1.0 - score, score
+    return 0.5, 0.5
+
+
+class ChatterWindow:
+    """Distinct chatters and per-user-weighted sentiment for one time bucket.
+
+    The per-user averages come from a hash sample of at most `sample_size` users:
+    only users whose hash is below `limit` are tracked, and the limit is halved
+    whenever the sample overflows. Which users are sampled doesn't depend on
+    their sentiment, so the sample's mean estimates the mean over all users.
+    """
+
+    __slots__ = (
+        "start",
+        "resolution",
+        "hll",
+        "messages",
+        "users",
+        "limit",
+        "sample_size",
+    )
+
+    def __init__(self, start, resolution, sample_size=USER_SAMPLE_SIZE):
+        self.start = start
+        self.resolution = resolution
+        self.hll = HyperLogLog()
+        self.messages = 0
+        self.users = {}  # user hash -> [pos_sum, neg_sum, messages] for sampled users
+        self.limit = 1 << 64
+        self.sample_size = sample_size
+
+    def add(self, h, pos, neg):
+        self.hll.add_hash(h)
+        self.messages += 1
+        if h >= self.limit:
+            return
+        totals = self.users.get(h)
+        if totals is None:
+            self.users[h] = [pos, neg, 1]
+            while len(self.users) > self.sample_size:
+                self.limit >>= 1
+                self.users = {k: t for k, t in self.users.items() if k < self.limit}
+        else:
+            totals[0] += pos
+            totals[1] += neg
+            totals[2] += 1
+
+    def row(self, channel):
+        """Average each user's messages first, so one spammer counts as one voice."""
+        users = max(len(self.users), 1)
+        user_pos = sum(t[0] / t[2] for t in self.users.values()) / users
+        user_neg = sum(t[1] / t[2] for t in self.users.values()) / users
+        return (
+            self.start,
+            channel,
+            self.resolution,
+            self.hll.count(),
+            self.messages,
+            user_pos,
+            user_neg,
+            self.hll.to_bytes(),
+        )
+
+
+class UniqueChatters:
+    """Per-second and per-minute HyperLogLog sketches of who is chatting in a channel."""
+
+    RESOLUTIONS = (1, 60)
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.windows = {}  # resolution -> open ChatterWindow
+        self.closed = []
+
+    def add(self, timestamp, user, label, score):
+        self.roll(timestamp)
+        h = hash64(user)
+        pos, neg = sentiment_split(label, score)
+        for resolution in self.RESOLUTIONS:
+            window = self.windows.get(resolution)
+            if window is None:
+                start = int(timestamp // resolution * resolution)
+                window = self.windows[resolution] = ChatterWindow(start, resolution)
+            window.add(h, pos, neg)
+
+    def roll(self, now):
+        """Close windows that ended before `now`."""
+        for resolution, window in list(self.windows.items()):
+            if now >= window.start + resolution:
+                self.closed.append(window.row(self.channel))
+                del self.windows[resolution]
+
+    def drain(self):
+        closed, self.closed = self.closed, []
+        return closed
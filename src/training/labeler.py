@@ -1,28 +1,141 @@
 import pandas as pd
 import os
-import random
+import heapq
+import threading
+import numpy as np
 
 # CONFIG
 INPUT_FILE = "twitch_chat_labels.csv"
 OUTPUT_FILE = "labeled_data_v2.csv"
+CHUNK_SIZE = 200_000  # rows parsed at a time while loading the pool
 
+# Set to a trained sentiment model (e.g. "./twitch-sentiment-v2") to be shown the
+# messages it is least sure about first. Scoring runs in a background thread;
+# until it has results, messages come in random order.
+UNCERTAINTY_MODEL = None
+SCORE_BATCH_SIZE = 64
+RANKED_LIMIT = 2000  # most uncertain scored messages kept; the rest are forgotten
 
-def main():
-    # 1. Load Raw Data
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error: {INPUT_FILE} not found.")
-        return
+LABELS = {"1": (0, "Negative"), "2": (1, "Neutral"), "3": (2, "Positive")}
 
-    # Engine='python' handles messy chat logs better
-    df = pd.read_csv(
+
+def load_pool():
+    """Read (channel, message) pairs in chunks with the C parser; bad lines are skipped."""
+    channels, messages = [], []
+    for chunk in pd.read_csv(
         INPUT_FILE,
         header=None,
         usecols=[0, 1],
         names=["channel", "message"],
         on_bad_lines="skip",
-        engine="python",
-    )
-    total_rows = len(df)
+        dtype=str,
+        keep_default_na=False,
+        chunksize=CHUNK_SIZE,
+    ):
+        channels.extend(chunk["channel"].tolist())
+        messages.extend(chunk["message"].tolist())
+        print(f"Loaded {len(messages)} rows...", end="\r")
+    print()
+    return channels, messages
+
+
+class UncertaintyRanker:
+    """Scores unlabeled messages in batches on a background thread and hands out
+    the one with the smallest margin between the model's top two labels. Only the
+    RANKED_LIMIT smallest margins are kept, so memory doesn't grow with the pool.
+    """
+
+    def __init__(self, messages, order, seen):
+        self.messages = messages
+        self.order = order
+        self.seen = seen
+        self.heap = []  # (-margin, index): the root is the least uncertain kept row
+        self.lock = threading.Lock()
+        self.scored = 0
+        self.stopped = False
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        # Leave a core free so the prompt stays responsive
+        torch.set_num_threads(max(1, (os.cpu_count() or 2) - 1))
+        tokenizer = AutoTokenizer.from_pretrained(UNCERTAINTY_MODEL)
+        model = AutoModelForSequenceClassification.from_pretrained(UNCERTAINTY_MODEL)
+        model.eval()
+
+        batch = []
+        for idx in self.order:
+            if self.stopped:
+                return
+            if idx in self.seen:
+                continue
+            batch.append(int(idx))
+            if len(batch) == SCORE_BATCH_SIZE:
+                self.score(tokenizer, model, batch)
+                batch = []
+        if batch:
+            self.score(tokenizer, model, batch)
+
+    def score(self, tokenizer, model, batch):
+        import torch
+
+        texts = [self.messages[i] for i in batch]
+        inputs = tokenizer(
+            texts, padding=True, truncation=True, max_length=64, return_tensors="pt"
+        )
+        with torch.inference_mode():
+            probs = model(**inputs).logits.softmax(dim=-1)
+        top2 = probs.topk(2, dim=-1).values
+        margins = (top2[:, 0] - top2[:, 1]).tolist()
+        with self.lock:
+            for margin, idx in zip(margins, batch):
+                if len(self.heap) < RANKED_LIMIT:
+                    heapq.heappush(self.heap, (-margin, idx))
+                else:
+                    heapq.heappushpop(self.heap, (-margin, idx))
+            self.scored += len(batch)
+
+    def pop(self):
+        """Most uncertain unseen message as (index, margin), or None if nothing is scored yet."""
+        with self.lock:
+            while self.heap:
+                # O(RANKED_LIMIT) per pop, which is nothing next to a human labeling
+                best = max(self.heap)
+                self.heap.remove(best)
+                heapq.heapify(self.heap)
+                if best[1] not in self.seen:
+                    return best[1], -best[0]
+        return None
+
+
+def candidates(order, seen, ranker):
+    """Yield (index, margin) for unseen rows: ranked ones first when available,
+    otherwise the next row of the shuffled order. O(1) per message.
+    """
+    position = 0
+    while True:
+        ranked = ranker.pop() if ranker else None
+        if ranked:
+            yield ranked
+            continue
+        while position < len(order) and order[position] in seen:
+            position += 1
+        if position == len(order):
+            return
+        yield int(order[position]), None
+        position += 1
+
+
+def main():
+    # 1. Load Raw Data
+    if not os.path.exists(INPUT_FILE):
+        print(f"Error: {INPUT_FILE} not found.")
+        return
+
+    channels, messages = load_pool()
+    total_rows = len(messages)
 
     # 2. Load Existing Progress
     if os.path.exists(OUTPUT_FILE):
@@ -31,6 +144,8 @@ def main():
             seen_indices = set(df_labeled["original_index"].tolist())
         else:
             seen_indices = set()
+        # Text too, in case the pool's row numbering has shifted since labeling
+        labeled_messages = set(df_labeled["message"].astype(str).tolist())
         print(f"Loaded {len(seen_indices)} labeled rows.")
     else:
         # Create new file with these columns
@@ -38,8 +153,16 @@ def main():
             columns=["channel", "message", "label", "original_index"]
         )
         seen_indices = set()
+        labeled_messages = set()
         df_labeled.to_csv(OUTPUT_FILE, index=False)
 
+    # 3. Shuffle once up front instead of drawing from the remaining rows each time
+    order = np.random.default_rng().permutation(total_rows)
+    ranker = None
+    if UNCERTAINTY_MODEL:
+        print(f"Ranking by uncertainty of {UNCERTAINTY_MODEL} (scoring in background)")
+        ranker = UncertaintyRanker(messages, order, seen_indices)
+
     print("\n--- Randomized Labeler ---")
     print("KEYS: [1] Negative  [2] Neutral  [3] Positive")
     print("      [s] Skip (Garbage)  [q] Quit")
@@ -49,31 +172,27 @@ def main():
     new_rows = []
 
     try:
-        while True:
-            # 3. Filter out rows we have already seen/skipped
-            available_indices = list(set(df.index) - seen_indices)
-
-            if not available_indices:
-                print("All messages have been processed.")
-                break
-
-            # 4. PICK A RANDOM MESSAGE
-            random_idx = random.choice(available_indices)
-            row = df.loc[random_idx]
-
-            channel_name = str(row["channel"]).strip()
-            msg_text = str(row["message"]).strip()
-
-            # Auto-skip empty stuff
-            if len(msg_text) < 1 or msg_text.lower() == "nan":
-                seen_indices.add(random_idx)
+        for idx, margin in candidates(order, seen_indices, ranker):
+            channel_name = channels[idx].strip()
+            msg_text = messages[idx].strip()
+
+            # Auto-skip empty stuff and messages labeled before
+            if (
+                len(msg_text) < 1
+                or msg_text.lower() == "nan"
+                or msg_text in labeled_messages
+            ):
+                seen_indices.add(idx)
                 continue
 
-            # 5. Display
-            print(f"\n[{channel_name}]")
+            # 4. Display
+            if margin is None:
+                print(f"\n[{channel_name}]")
+            else:
+                print(f"\n[{channel_name}] (model margin {margin:.2f})")
             print(f"{msg_text}")
 
-            # 6. Get Input
+            # 5. Get Input
             while True:
                 choice = input("Label? > ").lower()
 
@@ -83,62 +202,46 @@ def main():
 
                     case "s":
                         print("-> Skipped")
-                        seen_indices.add(random_idx)
-                        break
-
-                    case "1":
-                        new_rows.append(
-                            {
-                                "channel": channel_name,
-                                "message": msg_text,
-                                "label": 0,
-                                "original_index": random_idx,
-                            }
-                        )
-                        print("-> Negative")
-                        seen_indices.add(random_idx)
+                        seen_indices.add(idx)
                         break
 
-                    case "2":
+                    case "1" | "2" | "3":
+                        label, name = LABELS[choice]
                         new_rows.append(
                             {
                                 "channel": channel_name,
                                 "message": msg_text,
-                                "label": 1,
-                                "original_index": random_idx,
+                                "label": label,
+                                "original_index": idx,
                             }
                         )
-                        print("-> Neutral")
-                        seen_indices.add(random_idx)
-                        break
-
-                    case "3":
-                        new_rows.append(
-                            {
-                                "channel": channel_name,
-                                "message": msg_text,
-                                "label": 2,
-                                "original_index": random_idx,
-                            }
-                        )
-                        print("-> Positive")
-                        seen_indices.add(random_idx)
+                        print(f"-> {name}")
+                        seen_indices.add(idx)
+                        labeled_messages.add(msg_text)
                         break
 
                     case _:
                         print("Invalid. Use 1, 2, 3, or s (skip).")
 
-            # 7. Auto-save every 5 LABELED rows
+            # 6. Auto-save every 5 LABELED rows
             if len(new_rows) >= 5:
                 pd.DataFrame(new_rows).to_csv(
                     OUTPUT_FILE, mode="a", header=False, index=False
                 )
                 new_rows = []
-                print(f"-- Saved (Progress: {len(seen_indices)} processed) --")
+                status = f"Progress: {len(seen_indices)} processed"
+                if ranker:
+                    status += f", {ranker.scored} scored"
+                print(f"-- Saved ({status}) --")
+        else:
+            print("All messages have been processed.")
 
     except KeyboardInterrupt:
         print("\nPausing...")
 
+    if ranker:
+        ranker.stopped = True
+
     # Final Save
     if new_rows:
         pd.DataFrame(new_rows).to_csv(OUTPUT_FILE, mode="a", header=False, index=False)
@@ -1,6 +1,10 @@
 # MLM Training Script for Twitch Chat Data
 # Note: This is the script used for training on my local machine.
 # These settings may need to be adjusted based on your hardware capabilities.
+import hashlib
+import os
+import time
+
 from transformers import (
     AutoModelForMaskedLM,
     AutoTokenizer,
@@ -8,7 +12,9 @@ from transformers import (
     Trainer,
     TrainingArguments,
 )
-from datasets import load_dataset
+from datasets import load_dataset, load_from_disk
+
+from packing import pack_blocks
 
 # Section 1 - Configuration: model, data and training parameters
 model_name = "./twitch-roberta-v1"
@@ -16,60 +22,106 @@ input_file = "twitch_chat.csv"
 output_dir = "./twitch-roberta-v2"
 block_size = 128
 
+# Packed blocks are saved here, keyed by tokenizer + corpus + block size, so
+# repeated runs skip tokenization entirely
+cache_dir = "./tokenized_cache"
+cache_shards = 8
+
+# Streaming tokenizes and packs on the fly while training instead of preparing
+# the whole corpus first. Iterable datasets have no length, so set max_steps.
+streaming = False
+streaming_max_steps = 20000
+
 # Section 2 - Global initialization: load the tokenizer here so worker processes can access it
 print("Loading tokenizer globally...")
 tokenizer = AutoTokenizer.from_pretrained(model_name)
+# Goes between messages so a block never runs two messages together unmarked
+separator_id = tokenizer.sep_token_id
+# Starts every block, as in the single-message inputs the model sees at inference
+bos_id = (
+    tokenizer.bos_token_id
+    if tokenizer.bos_token_id is not None
+    else tokenizer.cls_token_id
+)
+pad_id = tokenizer.pad_token_id
 
 
 # Section 3 - Helper functions
 def tokenize_function(examples):
-    # Tokenize texts using the globally loaded tokenizer
-    return tokenizer(examples["text"])
+    # Tokenize texts using the globally loaded tokenizer; the separator is added while packing
+    return tokenizer(
+        examples["text"], add_special_tokens=False, return_attention_mask=False
+    )
 
 
 def group_texts(examples):
     # Concatenate all token lists in the batch and split into fixed-size blocks
-    concatenated_examples = {k: sum(examples[k], []) for k in examples.keys()}
-    total_length = len(concatenated_examples[list(examples.keys())[0]])
-
-    # Drop the small remainder so every chunk is exactly block_size
-    if total_length >= block_size:
-        total_length = (total_length // block_size) * block_size
-
-    # Create chunks of block_size for each feature
-    result = {
-        k: [t[i : i + block_size] for i in range(0, total_length, block_size)]
-        for k, t in concatenated_examples.items()
-    }
-    return result
-
-
-# Section 4 - Main execution: load model inside main to save VRAM and run training
-if __name__ == "__main__":
-    print(f"Loading model: {model_name}...")
-    model = AutoModelForMaskedLM.from_pretrained(model_name)
-
+    blocks, mask = pack_blocks(
+        examples["input_ids"], block_size, separator_id, bos_id, pad_id
+    )
+    return {"input_ids": blocks.tolist(), "attention_mask": mask.tolist()}
+
+
+def cache_key():
+    """Hash of everything that changes the packed blocks."""
+    digest = hashlib.sha256()
+    if tokenizer.is_fast:
+        digest.update(tokenizer.backend_tokenizer.to_str().encode())
+    else:
+        digest.update(repr(sorted(tokenizer.get_vocab().items())).encode())
+    stat = os.stat(input_file)
+    digest.update(f"{input_file}:{stat.st_size}:{stat.st_mtime}".encode())
+    digest.update(f"{block_size}:{separator_id}:{bos_id}:{pad_id}".encode())
+    return digest.hexdigest()[:16]
+
+
+def prepare_dataset():
+    """Tokenize and pack the corpus, or load the packed blocks from the cache."""
+    cache_path = os.path.join(cache_dir, cache_key())
+    if os.path.isdir(cache_path):
+        print(f"Loading packed blocks from {cache_path}...")
+        return load_from_disk(cache_path)
+
+    start = time.perf_counter()
     print("Loading CSV...")
     # If your CSV has no header, pass column_names=["text"]
-    dataset = load_dataset("csv", data_files=input_file)
+    dataset = load_dataset("csv", data_files=input_file)["train"]
 
     print("Tokenizing data...")
-    tokenized_datasets = dataset.map(
+    tokenized = dataset.map(
         tokenize_function,
         batched=True,
         num_proc=4,
-        remove_columns=["text"],  # remove raw text column after tokenization
+        remove_columns=dataset.column_names,  # remove raw text column after tokenization
     )
 
     print("Grouping texts into blocks...")
-    lm_datasets = tokenized_datasets.map(
-        group_texts,
-        batched=True,
-        num_proc=4,
+    lm_dataset = tokenized.map(group_texts, batched=True, num_proc=4)
+    print(f"Original messages: {len(dataset)}")
+    print(f"Grouped blocks: {len(lm_dataset)}")
+    print(f"Preprocessing took {time.perf_counter() - start:.1f}s")
+
+    lm_dataset.save_to_disk(cache_path, num_shards=cache_shards)
+    print(f"Cached packed blocks in {cache_path}")
+    return lm_dataset
+
+
+def stream_dataset():
+    """Iterable dataset that tokenizes and packs batches of messages as training reads them."""
+    dataset = load_dataset("csv", data_files=input_file, streaming=True)["train"]
+    return (
+        dataset.map(tokenize_function, batched=True, remove_columns=["text"])
+        .map(group_texts, batched=True)
+        .shuffle(seed=42, buffer_size=10000)
     )
 
-    print(f"Original messages: {len(dataset['train'])}")
-    print(f"Grouped blocks: {len(lm_datasets['train'])}")
+
+# Section 4 - Main execution: load model inside main to save VRAM and run training
+if __name__ == "__main__":
+    print(f"Loading model: {model_name}...")
+    model = AutoModelForMaskedLM.from_pretrained(model_name)
+
+    train_dataset = stream_dataset() if streaming else prepare_dataset()
 
     # Data collator for masked language modeling
     data_collator = DataCollatorForLanguageModeling(
@@ -82,6 +134,7 @@ if __name__ == "__main__":
         output_dir=output_dir,
         overwrite_output_dir=True,
         num_train_epochs=15,
+        max_steps=streaming_max_steps if streaming else -1,
         per_device_train_batch_size=4,
         gradient_accumulation_steps=4,
         learning_rate=5e-5,
@@ -96,7 +149,7 @@ if __name__ == "__main__":
     trainer = Trainer(
         model=model,
         args=training_args,
-        train_dataset=lm_datasets["train"],
+        train_dataset=train_dataset,
         data_collator=data_collator,
     )
 
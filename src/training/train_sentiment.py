@@ -1,6 +1,9 @@
 import pandas as pd
+import hashlib
+import multiprocessing
 import os
-import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
@@ -17,32 +20,41 @@ import shutil
 MODEL_NAME = "./final_sentiment_model"
 INPUT_FILE = "labeled_data_v2.csv"
 SAVE_DIR = "./twitch-sentiment-v2"
+MAX_LENGTH = 64
+SEED = 42  # fixes the train/val split (and folds) between runs
+CACHE_DIR = "./tokenized_cache"  # tokenized data, keyed by data + tokenizer hash
+KFOLDS = 0  # set to e.g. 5 to cross-validate instead of training the final model
+FOLD_WORKERS = 2  # folds trained in parallel processes, sharing the CPU cores
 
 
 class TwitchDataset(Dataset):
-    def __init__(self, encodings, labels):
-        self.encodings = encodings
+    """Tokenized messages stored as one flat token array plus offsets.
+    `indices` selects the rows belonging to this split.
+    """
+
+    def __init__(self, input_ids, offsets, labels, indices):
+        self.input_ids = input_ids
+        self.offsets = offsets
         self.labels = labels
+        self.indices = indices
 
     def __getitem__(self, idx):
-        item = {key: val[idx] for key, val in self.encodings.items()}
-        item["labels"] = self.labels[idx]
-        return item
+        row = self.indices[idx]
+        ids = self.input_ids[self.offsets[row] : self.offsets[row + 1]].tolist()
+        return {
+            "input_ids": ids,
+            "attention_mask": [1] * len(ids),
+            "labels": int(self.labels[row]),
+        }
 
     def __len__(self):
-        return len(self.labels)
+        return len(self.indices)
 
+    def lengths(self):
+        return (self.offsets[self.indices + 1] - self.offsets[self.indices]).tolist()
 
-def main():
-    # 0. Cleanup old results to avoid conflicts
-    if os.path.exists("./results"):
-        shutil.rmtree("./results")
 
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error: {INPUT_FILE} not found.")
-        return
-
-    # 1. Load Data
+def load_data():
     df = pd.read_csv(INPUT_FILE)
     df = df.dropna(subset=["message", "label"])
 
@@ -50,29 +62,53 @@ def main():
     original_count = len(df)
     df = df.drop_duplicates(subset=["message"])
     print(f"Removed {original_count - len(df)} duplicate messages.")
-
-    # Shuffle
-    data = list(zip(df["message"].tolist(), df["label"].astype(int).tolist()))
-    random.shuffle(data)
-    texts, labels = zip(*data)
-
-    # Split 85/15 (Since data is small, keep more for training)
-    split_idx = int(0.85 * len(texts))
-    train_texts, val_texts = texts[:split_idx], texts[split_idx:]
-    train_labels, val_labels = labels[:split_idx], labels[split_idx:]
-
-    print(f"Samples: {len(train_texts)} Train | {len(val_texts)} Test")
-
-    # 2. Tokenizer (AutoTokenizer handles the Twitter specifics)
-    print(f"Loading Tokenizer ({MODEL_NAME})...")
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-
-    # Tokenize
-    train_encodings = tokenizer(train_texts, truncation=True, max_length=64)
-    val_encodings = tokenizer(val_texts, truncation=True, max_length=64)
-
-    train_dataset = TwitchDataset(train_encodings, train_labels)
-    val_dataset = TwitchDataset(val_encodings, val_labels)
+    return df["message"].astype(str).tolist(), df["label"].astype(int).tolist()
+
+
+def cache_path(texts, labels, tokenizer):
+    """File name derived from the messages, labels, tokenizer and max length."""
+    digest = hashlib.sha256()
+    for text, label in zip(texts, labels):
+        digest.update(f"{label}\t{text}\n".encode())
+    if tokenizer.is_fast:
+        digest.update(tokenizer.backend_tokenizer.to_str().encode())
+    else:
+        digest.update(repr(sorted(tokenizer.get_vocab().items())).encode())
+    digest.update(str(MAX_LENGTH).encode())
+    return os.path.join(CACHE_DIR, f"sentiment-{digest.hexdigest()[:16]}.npz")
+
+
+def tokenize_cached(texts, labels, tokenizer):
+    """Return (flat input_ids, offsets, labels), tokenizing only on a cache miss."""
+    path = cache_path(texts, labels, tokenizer)
+    if os.path.exists(path):
+        print(f"Loading tokenized data from {path}")
+    else:
+        print("Tokenizing...")
+        encoded = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)["input_ids"]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        input_ids = np.fromiter(
+            (t for ids in encoded for t in ids), dtype=np.int32, count=offsets[-1]
+        )
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(
+            path,
+            input_ids=input_ids,
+            offsets=offsets,
+            labels=np.asarray(labels, dtype=np.int8),
+        )
+    data = np.load(path)
+    return data["input_ids"], data["offsets"], data["labels"]
+
+
+def compute_metrics(eval_pred):
+    logits, labels = eval_pred
+    return {"accuracy": float((np.argmax(logits, axis=-1) == labels).mean())}
+
+
+def train(tokenizer, train_dataset, val_dataset, output_dir):
+    """Fine-tune the base model on one split and return the trainer."""
     data_collator = DataCollatorWithPadding(tokenizer=tokenizer)
 
     # 3. Model
@@ -81,7 +117,7 @@ def main():
 
     # 4. Training Arguments
     training_args = TrainingArguments(
-        output_dir="./results",
+        output_dir=output_dir,
         num_train_epochs=10,  # Try 10 epochs
         per_device_train_batch_size=8,
         per_device_eval_batch_size=16,
@@ -92,6 +128,8 @@ def main():
         save_strategy="epoch",  # Save every epoch
         load_best_model_at_end=True,  # Revert to the best epoch at the end
         metric_for_best_model="eval_loss",
+        group_by_length=True,  # batch similar lengths together so little is padding
+        seed=SEED,
         no_cuda=False,
     )
 
@@ -103,12 +141,100 @@ def main():
         eval_dataset=val_dataset,
         tokenizer=tokenizer,
         data_collator=data_collator,
+        compute_metrics=compute_metrics,
         callbacks=[
             EarlyStoppingCallback(early_stopping_patience=3)
         ],  # Stop if score gets worse 3 times in a row
     )
-
     trainer.train()
+    return trainer
+
+
+def by_length(dataset):
+    """Order a dataset's rows by length; evaluation order doesn't matter, padding does."""
+    order = np.argsort(dataset.lengths(), kind="stable")
+    dataset.indices = dataset.indices[order]
+    return dataset
+
+
+def run_fold(fold, folds, path, threads):
+    """Train and evaluate one cross-validation fold (runs in a worker process)."""
+    import torch
+
+    torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    data = np.load(path)
+    input_ids, offsets, labels = data["input_ids"], data["offsets"], data["labels"]
+    val_idx = folds[fold]
+    train_idx = np.concatenate([f for i, f in enumerate(folds) if i != fold])
+    train_dataset = TwitchDataset(input_ids, offsets, labels, train_idx)
+    val_dataset = by_length(TwitchDataset(input_ids, offsets, labels, val_idx))
+    trainer = train(tokenizer, train_dataset, val_dataset, f"./results/fold_{fold}")
+    metrics = trainer.evaluate()
+    return fold, metrics["eval_loss"], metrics["eval_accuracy"]
+
+
+def cross_validate(texts, labels, tokenizer):
+    tokenize_cached(texts, labels, tokenizer)  # workers read the cache file
+    path = cache_path(texts, labels, tokenizer)
+    order = np.random.default_rng(SEED).permutation(len(labels))
+    folds = np.array_split(order, KFOLDS)
+    threads = max(1, (os.cpu_count() or 1) // FOLD_WORKERS)
+    print(f"Running {KFOLDS} folds, {FOLD_WORKERS} at a time ({threads} threads each)")
+
+    results = []
+    # Spawn, not fork: the parent has already imported torch and its thread pools,
+    # which a forked child can deadlock on
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=FOLD_WORKERS, mp_context=context) as pool:
+        futures = [
+            pool.submit(run_fold, fold, folds, path, threads) for fold in range(KFOLDS)
+        ]
+        for future in futures:
+            fold, loss, accuracy = future.result()
+            print(f"Fold {fold}: loss {loss:.4f} | accuracy {accuracy:.3f}")
+            results.append((loss, accuracy))
+
+    losses, accuracies = np.array(results).T
+    print(
+        f"\nCross-validation: loss {losses.mean():.4f} ± {losses.std():.4f} | "
+        f"accuracy {accuracies.mean():.3f} ± {accuracies.std():.3f}"
+    )
+
+
+def main():
+    # 0. Cleanup old results to avoid conflicts
+    if os.path.exists("./results"):
+        shutil.rmtree("./results")
+
+    if not os.path.exists(INPUT_FILE):
+        print(f"Error: {INPUT_FILE} not found.")
+        return
+
+    # 1. Load Data
+    texts, labels = load_data()
+
+    # 2. Tokenizer (AutoTokenizer handles the Twitter specifics)
+    print(f"Loading Tokenizer ({MODEL_NAME})...")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+
+    if KFOLDS > 1:
+        cross_validate(texts, labels, tokenizer)
+        return
+
+    input_ids, offsets, label_array = tokenize_cached(texts, labels, tokenizer)
+
+    # Seeded shuffle, then split 85/15 (Since data is small, keep more for training)
+    order = np.random.default_rng(SEED).permutation(len(label_array))
+    split_idx = int(0.85 * len(order))
+    train_dataset = TwitchDataset(input_ids, offsets, label_array, order[:split_idx])
+    val_dataset = by_length(
+        TwitchDataset(input_ids, offsets, label_array, order[split_idx:])
+    )
+    print(f"Samples: {len(train_dataset)} Train | {len(val_dataset)} Test")
+
+    trainer = train(tokenizer, train_dataset, val_dataset, "./results")
+    model = trainer.model
 
     print(f"\n Saving to {SAVE_DIR}...")
     model.save_pretrained(SAVE_DIR)
@@ -0,0 +1,64 @@
+# Tests for watched-phrase matching and rate alerts.
+# Run with: python -m pytest tests
+import json
+
+from alerts import AhoCorasick, AlertMonitor, ChannelWatch, RateWindow, parse_rules
+
+
+def test_overlapping_patterns_all_match():
+    matcher = AhoCorasick(["clip it", "it now", "clip", "he"])
+    assert matcher.matches("CLIP IT NOW") == {0, 1, 2}
+    # "he" only appears inside other words
+    assert matcher.matches("the chat") == set()
+
+
+def test_whole_words_unless_wildcard():
+    matcher = AhoCorasick(["scuff", "scuff*", "gg"])
+    assert matcher.matches("so scuffed") == {1}
+    assert matcher.matches("scuff") == {0, 1}
+    assert matcher.matches("ggs") == set()
+    assert matcher.matches("gg, wp") == {2}
+    assert matcher.matches("eggs") == set()
+
+
+def test_rate_window_expires_old_seconds():
+    window = RateWindow(3)
+    for second in (10, 10, 11, 12):
+        window.add(second)
+    assert window.total == 4
+    window.advance(13)  # second 10 falls out of the window
+    assert window.total == 2
+    window.advance(100)
+    assert window.total == 0
+
+
+def test_alert_fires_once_then_rearms():
+    watch = ChannelWatch("xqc", [("clip it", 3, 10)])
+    fired = []
+    for second in range(5):
+        watch.check(100 + second, "CLIP IT", fired)
+    assert len(fired) == 1
+    assert fired[0]["phrase"] == "clip it"
+    assert fired[0]["count"] == 3
+
+    watch.advance(200)  # the window empties, so the phrase re-arms
+    for second in range(3):
+        watch.check(200 + second, "clip it", fired)
+    assert len(fired) == 2
+
+
+def test_parse_rules_defaults():
+    rules = parse_rules(["pog", {"phrase": " rip ", "count": 5, "seconds": 0}, ""])
+    assert rules == [("pog", 10, 60), ("rip", 5, 1)]
+
+
+def test_monitor_reads_channel_and_global_lists(tmp_path):
+    path = tmp_path / "watchlists.json"
+    path.write_text(json.dumps({"*": ["gg"], "xqc": [{"phrase": "w", "count": 1}]}))
+    monitor = AlertMonitor(str(path))
+    monitor.reload_if_changed()
+    monitor.check("xqc", 1.0, "W")
+    monitor.check("other", 1.0, "w")
+    fired = monitor.drain()
+    assert [(a["channel"], a["phrase"]) for a in fired] == [("xqc", "w")]
+    assert monitor.watches["other"].rules == [("gg", 10, 60)]
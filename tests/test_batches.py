@@ -0,0 +1,55 @@
+# Tests for the column-oriented message batches and the natural-batching queue.
+# Run with: python -m pytest tests
+import asyncio
+
+from batches import BatchQueue, MessageBatch
+
+
+def fill(queue, count, start=0):
+    for i in range(start, start + count):
+        queue.put("xqc", f"message {i}", "viewer", i, float(i), float(i))
+
+
+def test_batch_is_sealed_at_batch_size():
+    queue = BatchQueue(batch_size=4)
+    fill(queue, 9)
+    assert len(queue) == 9
+    assert [len(queue.get_nowait()) for _ in range(3)] == [4, 4, 1]
+    assert queue.get_nowait() is None
+    assert len(queue) == 0
+
+
+def test_batches_keep_message_order():
+    queue = BatchQueue(batch_size=3)
+    fill(queue, 5)
+    first, second = queue.get_nowait(), queue.get_nowait()
+    assert list(first.offsets) == [0, 1, 2]
+    assert second.texts == ["message 3", "message 4"]
+    assert first.channels() == ["xqc"] * 3
+
+
+def test_get_returns_open_batch_without_waiting_for_it_to_fill():
+    async def run():
+        queue = BatchQueue(batch_size=16)
+        waiter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        fill(queue, 2)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_results_and_extend():
+    batch = MessageBatch()
+    batch.append("xqc", "pog", "a", 0, 1.0, 1.5)
+    batch.set_results([[{"label": "positive", "score": 0.9}]], 12.0, 2.0, "v1")
+    other = MessageBatch()
+    other.append("xqc", "rip", "b", 1, 2.0, 2.5)
+    other.set_results([[{"label": "negative", "score": 0.8}]], 10.0, 3.0, "v1")
+
+    batch.extend(other)
+    assert len(batch) == 2
+    assert batch.label_names() == ["positive", "negative"]
+    assert list(batch.offsets) == [0, 1]
+    assert batch.versions == ["v1", "v1"]
+    assert batch.embeddings == [None, None]
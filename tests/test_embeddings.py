@@ -0,0 +1,89 @@
+# Tests for stored message embeddings and the IVF index.
+# Run with: python -m pytest tests
+import sqlite3
+
+import numpy as np
+
+from embeddings import (
+    EMBEDDINGS_TABLE_SQL,
+    IvfIndex,
+    decode,
+    encode,
+    load_embeddings,
+)
+
+
+def unit_vectors(count, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float16)
+
+
+def test_encode_decode_round_trip():
+    vectors = unit_vectors(10)
+    for fmt, tolerance in (("float16", 0), ("int8", 0.01)):
+        stored = encode(vectors, fmt)
+        restored = decode([s for s, _ in stored], [b for _, b in stored])
+        assert restored.dtype == np.float16
+        assert np.abs(restored.astype(np.float32) - vectors).max() <= tolerance
+    assert decode([], []).shape == (0, 0)
+
+
+def test_load_embeddings_by_version():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE chat_log (message TEXT, model_version TEXT)")
+    conn.execute(EMBEDDINGS_TABLE_SQL)
+    vectors = unit_vectors(4)
+    for i, (scale, blob) in enumerate(encode(vectors, "int8"), start=1):
+        conn.execute(
+            "INSERT INTO chat_log VALUES (?, ?)", (f"m{i}", "v1" if i < 4 else "v2")
+        )
+        conn.execute("INSERT INTO chat_embeddings VALUES (?, ?, ?)", (i, scale, blob))
+
+    ids, loaded = load_embeddings(conn, "v1", after_rowid=1)
+    assert ids.tolist() == [2, 3]
+    assert loaded.shape == (2, 32)
+
+
+def test_search_finds_exact_matches():
+    vectors = unit_vectors(2000)
+    ids = np.arange(100, 2100)
+    index = IvfIndex.build(ids, vectors, nlist=16)
+    assert len(index) == 2000
+
+    found, sims = index.search(vectors[[5, 700]], k=3, nprobe=4)
+    assert found[:, 0].tolist() == [105, 800]
+    assert np.all(sims[:, 0] > 0.99)
+    assert np.all(np.diff(sims, axis=1) <= 0)  # best first
+
+
+def test_search_pads_when_lists_are_small():
+    vectors = unit_vectors(5)
+    index = IvfIndex.build(np.arange(5), vectors, nlist=5)
+    found, sims = index.search(vectors[0], k=3, nprobe=1)
+    assert found[0, 0] == 0
+    assert -1 in found[0] and np.isneginf(sims[0]).any()
+
+
+def test_add_and_save_load(tmp_path):
+    vectors = unit_vectors(300)
+    index = IvfIndex.build(np.arange(200), vectors[:200], nlist=8, version="v1")
+    index.add(np.arange(200, 300), vectors[200:])
+    found, _ = index.search(vectors[250], k=1, nprobe=8)
+    assert found[0, 0] == 250
+
+    path = tmp_path / "index.npz"
+    index.save(path, last_rowid=299)
+    loaded, last_rowid = IvfIndex.load(path)
+    assert (loaded.version, last_rowid, len(loaded)) == ("v1", 299, 300)
+    assert np.array_equal(loaded.ids, index.ids)
+
+
+def test_duplicate_groups_join_near_identical_vectors():
+    vectors = unit_vectors(50)
+    copies = vectors[:3] + np.float16(0.001)
+    index = IvfIndex.build(
+        np.arange(53), np.concatenate([vectors, copies]), nlist=4, seed=1
+    )
+    groups = dict(zip(index.ids.tolist(), index.duplicate_groups(0.99).tolist()))
+    assert [groups[i] for i in (50, 51, 52)] == [0, 1, 2]
+    assert groups[10] == 10
@@ -0,0 +1,71 @@
+# Tests for the append-only ingest log: offsets, segment rotation and torn tails.
+# Run with: python -m pytest tests
+import os
+
+from ingest_log import IngestLog, read_log
+
+
+def append_all(log, count, start=0):
+    for i in range(start, start + count):
+        log.append("xqc", "viewer", f"message {i}", float(i))
+    log.flush()
+
+
+def test_offsets_survive_reopen(tmp_path):
+    log = IngestLog(tmp_path)
+    append_all(log, 3)
+    log.close()
+
+    log = IngestLog(tmp_path)
+    assert log.append("xqc", "viewer", "message 3", 3.0) == 3
+    log.close()
+    records = list(read_log(tmp_path))
+    assert [offset for offset, _ in records] == [0, 1, 2, 3]
+    assert records[3][1] == (3.0, "xqc", "viewer", "message 3")
+
+
+def test_offsets_across_segment_rotation(tmp_path):
+    # Each record is ~40 bytes, so a 100 byte segment rotates every few writes
+    log = IngestLog(tmp_path, segment_bytes=100)
+    for i in range(10):
+        append_all(log, 1, start=i)
+    log.close()
+
+    assert len(os.listdir(tmp_path)) > 1
+    assert [offset for offset, _ in read_log(tmp_path)] == list(range(10))
+    # Reading from the middle skips whole segments before the start offset
+    assert [offset for offset, _ in read_log(tmp_path, 7)] == [7, 8, 9]
+    assert [r[2] for _, r in read_log(tmp_path, 7)] == ["viewer"] * 3
+
+    log = IngestLog(tmp_path, segment_bytes=100)
+    assert log.append("xqc", "viewer", "after", 10.0) == 10
+    log.close()
+
+
+def test_torn_tail_is_truncated_on_reopen(tmp_path):
+    log = IngestLog(tmp_path)
+    append_all(log, 2)
+    log.close()
+    (segment,) = os.listdir(tmp_path)
+    path = os.path.join(tmp_path, segment)
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x20\x00\x00\x00garbage")  # header of a record cut off mid-write
+
+    assert [offset for offset, _ in read_log(tmp_path)] == [0, 1]
+    log = IngestLog(tmp_path)
+    assert os.path.getsize(path) == intact
+    assert log.append("xqc", "viewer", "next", 2.0) == 2
+    log.close()
+    assert [offset for offset, _ in read_log(tmp_path)] == [0, 1, 2]
+
+
+def test_pending_records_are_not_on_disk_until_written(tmp_path):
+    log = IngestLog(tmp_path)
+    log.append("xqc", "viewer", "buffered", 0.0)
+    assert list(read_log(tmp_path)) == []
+    data, count = log.take_pending()
+    log.write(data, count)
+    assert log.written == 1
+    assert len(list(read_log(tmp_path))) == 1
+    log.close()
@@ -0,0 +1,106 @@
+# Tests for the fixed-memory streaming sketches.
+# Run with: python -m pytest tests
+import random
+from collections import Counter
+
+from sketches import (
+    ChatterWindow,
+    HyperLogLog,
+    SpaceSaving,
+    TrendingTerms,
+    UniqueChatters,
+    extract_terms,
+    hash64,
+)
+
+
+def test_space_saving_error_bounds():
+    rng = random.Random(0)
+    # Zipf-like stream: a few heavy terms and a long tail
+    stream = [f"t{int(rng.paretovariate(1.1))}" for _ in range(20000)]
+    exact = Counter(stream)
+    sketch = SpaceSaving(capacity=50)
+    for term in stream:
+        sketch.add(term)
+
+    assert len(sketch.counters) == 50
+    bound = len(stream) / sketch.capacity
+    for term, count, error, _ in sketch.top(50):
+        # Counts never undercount, and overcount by at most the recorded error
+        assert count - error <= exact[term] <= count
+        assert error <= bound
+    # Every term more frequent than N / capacity is tracked
+    for term, count in exact.items():
+        if count > bound:
+            assert term in sketch.counters
+
+
+def test_space_saving_keeps_weights():
+    sketch = SpaceSaving(capacity=5)
+    for _ in range(3):
+        sketch.add("pog", 1.0)
+    sketch.add("pog", -0.5)
+    assert sketch.top(1) == [("pog", 4, 0, 2.5)]
+
+
+def test_extract_terms():
+    assert extract_terms("Clip it clip it") == ["clip", "clip it", "it clip"]
+    assert extract_terms("the the") == []
+
+
+def test_trending_terms_roll_per_minute():
+    trending = TrendingTerms("xqc", window=60)
+    trending.add(0, "pog", "positive", 0.9)
+    trending.add(30, "pog", "negative", 0.5)
+    trending.add(61, "rip", "neutral", 0.7)
+    ((bucket, sketch),) = trending.drain()
+    assert bucket == 0
+    ((term, count, _, weight),) = sketch.top()
+    assert (term, count) == ("pog", 2)
+    assert round(weight, 6) == 0.4
+    assert trending.bucket == 60
+
+
+def test_hyperloglog_merge_matches_union():
+    first, second, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(30000):
+        first.add(f"user{i}")
+        union.add(f"user{i}")
+    for i in range(20000, 50000):
+        second.add(f"user{i}")
+        union.add(f"user{i}")
+
+    merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+    assert merged.registers == union.registers
+    assert abs(merged.count() - 50000) / 50000 < 0.05
+    # Small counts use linear counting
+    small = HyperLogLog()
+    for i in range(1000):
+        small.add(f"user{i}")
+    assert abs(small.count() - 1000) < 30
+
+
+def test_chatter_window_sample_is_bounded():
+    window = ChatterWindow(0, 60, sample_size=64)
+    for i in range(5000):
+        h = hash64(f"user{i}")
+        window.add(h, 1.0 if i % 4 == 0 else 0.0, 0.0)
+        window.add(h, 1.0 if i % 4 == 0 else 0.0, 0.0)
+    assert len(window.users) <= 64
+    _, _, _, distinct, messages, user_pos, _, _ = window.row("xqc")
+    assert messages == 10000
+    assert abs(distinct - 5000) / 5000 < 0.05
+    assert abs(user_pos - 0.25) < 0.15
+
+
+def test_unique_chatters_weight_users_equally():
+    chatters = UniqueChatters("xqc")
+    for _ in range(9):
+        chatters.add(0.5, "spammer", "positive", 1.0)
+    chatters.add(0.5, "viewer", "negative", 1.0)
+    chatters.add(60.0, "viewer", "neutral", 1.0)  # closes both windows
+    rows = {row[2]: row for row in chatters.drain()}
+    assert set(rows) == {1, 60}
+    _, channel, _, distinct, messages, user_pos, user_neg, _ = rows[60]
+    assert (channel, round(distinct), messages) == ("xqc", 2, 10)
+    assert (user_pos, user_neg) == (0.5, 0.5)
@@ -0,0 +1,27 @@
+# Smoke test for the backend's startup report against the batched raw queue.
+# Run with: python -m pytest tests
+import time
+
+import pytest
+
+pytest.importorskip("twitchAPI")
+pytest.importorskip("aiosqlite")
+
+import primary  # noqa: E402
+from batches import BatchQueue  # noqa: E402
+
+
+def test_report_startup_counts_buffered_messages(capsys, monkeypatch):
+    queue = BatchQueue(batch_size=4)
+    for i in range(6):
+        queue.put("xqc", f"message {i}", "viewer", i, 1.0, 1.0)
+    monkeypatch.setattr(primary, "raw_queue", queue)
+    monkeypatch.setattr(primary, "startup_times", {})
+
+    launch_start = time.perf_counter()
+    primary.record_startup("join_chat", launch_start)
+    primary.report_startup(launch_start)
+
+    output = capsys.readouterr().out
+    assert "join_chat" in output
+    assert "6 messages buffered while the model was loading" in output
@@ -0,0 +1,88 @@
+# Tests for online topic clustering on message embeddings.
+# Run with: python -m pytest tests
+import numpy as np
+
+from topics import TopicClusters, TopicMinute, label_topics
+
+
+def topic_batch(rng, centers, topic, count, noise=0.05):
+    vectors = centers[topic] + rng.normal(scale=noise, size=(count, centers.shape[1]))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_separate_topics_get_separate_ids():
+    rng = np.random.default_rng(0)
+    centers = np.eye(16)[:3]
+    texts = ["clip it now", "gg go next", "chat is this real"]
+    clusters = TopicClusters("xqc", k=3)
+    for second in range(10):
+        # Every batch mixes the topics, as live chat does
+        clusters.add(
+            [second] * 15,
+            np.concatenate([topic_batch(rng, centers, t, 5) for t in range(3)]),
+            [text for text in texts for _ in range(5)],
+            ["positive"] * 5 + ["negative"] * 10,
+            [0.8] * 15,
+        )
+
+    rows = {row[8]: row for row in clusters.rows()}  # keyed by example message
+    assert set(rows) == set(texts)
+    assert len({row[2] for row in rows.values()}) == 3  # distinct topic ids
+    clip = rows["clip it now"]
+    assert (clip[4], clip[6], clip[7]) == (50, 50, 0)
+    assert abs(clip[5] - 0.8) < 1e-6
+    assert set(clip[3].split(", ")) <= {"clip", "clip it", "it now", "now"}
+
+
+def test_minutes_are_drained_when_they_end():
+    rng = np.random.default_rng(1)
+    centers = np.eye(8)[:1]
+    clusters = TopicClusters("xqc", k=2)
+    clusters.add([10], topic_batch(rng, centers, 0, 1), ["pog"], ["neutral"], [0.9])
+    assert clusters.drain() == []
+    clusters.add([70], topic_batch(rng, centers, 0, 1), ["pog"], ["neutral"], [0.9])
+    ((bucket, channel, _, label, messages, sentiment, *_),) = clusters.drain()
+    assert (bucket, channel, label, messages, sentiment) == (0, "xqc", "pog", 1, 0.0)
+    assert clusters.bucket == 60
+
+
+def test_model_version_change_resets_centroids():
+    rng = np.random.default_rng(2)
+    centers = np.eye(8)[:1]
+    clusters = TopicClusters("xqc", k=2)
+    clusters.add(
+        [0], topic_batch(rng, centers, 0, 2), ["a", "a"], ["neutral"] * 2, [1, 1], "v1"
+    )
+    first = set(clusters.topics[clusters.topics >= 0].tolist())
+    clusters.add(
+        [1], topic_batch(rng, centers, 0, 2), ["a", "a"], ["neutral"] * 2, [1, 1], "v2"
+    )
+    second = set(clusters.topics[clusters.topics >= 0].tolist())
+    assert first.isdisjoint(second)
+
+
+def test_idle_cluster_is_reseeded_with_a_new_topic():
+    rng = np.random.default_rng(3)
+    centers = np.eye(8)[:2]
+    clusters = TopicClusters("xqc", k=1, idle_seconds=60)
+    clusters.add(
+        [0], topic_batch(rng, centers, 0, 3), ["a"] * 3, ["neutral"] * 3, [1] * 3
+    )
+    (old,) = clusters.topics.tolist()
+    clusters.add(
+        [200], topic_batch(rng, centers, 1, 3), ["b"] * 3, ["neutral"] * 3, [1] * 3
+    )
+    (new,) = clusters.topics.tolist()
+    assert new != old
+    assert clusters.centroids[0] @ centers[1] > 0.9
+
+
+def test_labels_prefer_terms_distinctive_to_a_topic():
+    window = {0: TopicMinute(), 1: TopicMinute()}
+    for term in ["chat", "chat", "clip", "clip", "clip"]:
+        window[0].terms.add(term)
+    for term in ["chat", "chat", "chat", "gg"]:
+        window[1].terms.add(term)
+    labels = label_topics(window)
+    assert labels[0].startswith("clip")
+    assert labels[1].startswith("chat")
@@ -0,0 +1,195 @@
+# Online topic clustering of chat on the classifier's message embeddings.
+# Mini-batch k-means (Sculley, "Web-scale k-means clustering") over the unit
+# vectors the classifier already produces (see embeddings.py), with each
+# centroid's count capped so it keeps following chat as the conversation moves
+# on. A batch costs O(batch x k x dim); memory is k centroids plus small
+# per-minute term sketches, whatever the chat volume. A cluster that gets no
+# messages for a while is reseeded from the message that fits the others worst
+# and gets a new topic id, so an id always refers to one topic.
+import math
+
+import numpy as np
+
+from sketches import SpaceSaving, extract_terms
+
+LABEL_TERMS = 3  # terms in a topic's label
+TERM_CAPACITY = 50  # terms tracked per topic per minute
+
+
+class TopicMinute:
+    """One topic's messages, sentiment and terms within one window."""
+
+    __slots__ = ("messages", "weight", "pos", "neg", "terms", "example", "fit")
+
+    def __init__(self):
+        self.messages = 0
+        self.weight = 0.0  # summed signed sentiment, as in TrendingTerms
+        self.pos = 0
+        self.neg = 0
+        self.terms = SpaceSaving(TERM_CAPACITY)
+        self.example = ""  # the message closest to the centroid
+        self.fit = -1.0
+
+
+def label_topics(window):
+    """topic -> label from each topic's most frequent terms, discounting terms that
+    are frequent in the window's other topics too (like idf over topics).
+    """
+    tops = {topic: stats.terms.top(20) for topic, stats in window.items()}
+    spread = {}
+    for top in tops.values():
+        for term, *_ in top:
+            spread[term] = spread.get(term, 0) + 1
+    labels = {}
+    for topic, top in tops.items():
+        ranked = sorted(
+            top,
+            key=lambda t: (t[1] - t[2]) * math.log(1 + len(tops) / spread[t[0]]),
+            reverse=True,
+        )
+        labels[topic] = ", ".join(term for term, *_ in ranked[:LABEL_TERMS])
+    return labels
+
+
+class TopicClusters:
+    """Streaming k-means topics for one channel, summarized per minute.
+
+    add() takes a batch of messages with their embeddings; drain() returns rows
+    (bucket, channel, topic, label, messages, sentiment, positive, negative,
+    example) for minutes that have ended, and rows() those of the open minute.
+    """
+
+    def __init__(self, channel, k=12, window=60, memory=2000, idle_seconds=300):
+        self.channel = channel
+        self.k = k
+        self.window = window
+        # Count cap: a centroid always moves at least 1/memory toward a new message
+        self.memory = memory
+        self.idle_seconds = idle_seconds
+        self.version = None  # model whose embedding space the centroids are in
+        self.centroids = None  # (k, dim) unit vectors, allocated on the first batch
+        self.counts = np.zeros(k)
+        self.topics = np.full(k, -1)  # topic id per slot, -1 while empty
+        self.last_seen = np.zeros(k)
+        self.next_topic = 0
+        self.bucket = None
+        self.current = {}  # topic -> TopicMinute for the open window
+        self.closed = []
+
+    def reset(self):
+        """Forget the centroids, e.g. after a model swap changed the embedding space."""
+        self.centroids = None
+        self.counts[:] = 0
+        self.topics[:] = -1
+
+    def add(self, sent, vectors, texts, labels, scores, version=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = max(sent)
+        bucket = int(now // self.window * self.window)
+        # Stragglers from the previous minute count in the current one
+        if self.bucket is None or bucket > self.bucket:
+            self.roll(bucket)
+        if version != self.version:
+            self.reset()
+            self.version = version
+        if self.centroids is None:
+            self.centroids = np.zeros((self.k, vectors.shape[1]), dtype=np.float32)
+        self.reseed(vectors, now)
+
+        # 1. Assign every message to its most similar live centroid
+        sims = vectors @ self.centroids.T
+        sims[:, self.topics < 0] = -np.inf
+        assign = sims.argmax(axis=1)
+        fit = sims[np.arange(len(vectors)), assign]
+
+        # 2. Move each centroid toward the mean of its new messages, by
+        # n / (count + n): the per-message 1 / count rate applied once per batch
+        counts = np.bincount(assign, minlength=self.k)
+        for slot in np.flatnonzero(counts):
+            n = counts[slot]
+            rate = n / (self.counts[slot] + n)
+            mean = vectors[assign == slot].mean(axis=0)
+            centroid = (1 - rate) * self.centroids[slot] + rate * mean
+            self.centroids[slot] = centroid / max(np.linalg.norm(centroid), 1e-8)
+            self.counts[slot] = min(self.counts[slot] + n, self.memory)
+            self.last_seen[slot] = now
+
+        # 3. Per-minute stats of each topic
+        for slot, similarity, text, label, score in zip(
+            assign, fit, texts, labels, scores
+        ):
+            topic = int(self.topics[slot])
+            stats = self.current.get(topic)
+            if stats is None:
+                stats = self.current[topic] = TopicMinute()
+            stats.messages += 1
+            if label == "positive":
+                stats.pos += 1
+                weight = score
+            elif label == "negative":
+                stats.neg += 1
+                weight = -score
+            else:
+                weight = 0.0
+            stats.weight += weight
+            for term in extract_terms(text):
+                stats.terms.add(term)
+            if similarity > stats.fit:
+                stats.example, stats.fit = text, float(similarity)
+
+    def reseed(self, vectors, now):
+        """Seed empty slots (or, when none are empty, the longest idle one) with
+        the messages that fit the live clusters worst, farthest-first.
+        """
+        live = self.topics >= 0
+        slots = list(np.flatnonzero(~live))
+        idle = np.flatnonzero(live & (now - self.last_seen > self.idle_seconds))
+        if not slots and len(idle):
+            slots = [idle[self.last_seen[idle].argmin()]]
+            live[slots[0]] = False
+        if not slots:
+            return
+        best = np.full(len(vectors), -np.inf, dtype=np.float32)
+        if live.any():
+            best = (vectors @ self.centroids[live].T).max(axis=1)
+        for slot in slots:
+            i = best.argmin()
+            if best[i] > 0.999:
+                break  # every message in the batch is already covered
+            self.centroids[slot] = vectors[i]
+            self.counts[slot] = 1
+            self.last_seen[slot] = now
+            self.topics[slot] = self.next_topic
+            self.next_topic += 1
+            best = np.maximum(best, vectors @ vectors[i])
+
+    def rows(self, bucket=None, window=None):
+        """Rows for one window's topics (the open one by default)."""
+        bucket = self.bucket if window is None else bucket
+        window = self.current if window is None else window
+        labels = label_topics(window)
+        return [
+            (
+                bucket,
+                self.channel,
+                topic,
+                labels[topic],
+                stats.messages,
+                stats.weight / stats.messages,
+                stats.pos,
+                stats.neg,
+                stats.example,
+            )
+            for topic, stats in window.items()
+        ]
+
+    def roll(self, bucket):
+        """Start a new window, keeping the finished one's rows until drained."""
+        if self.current:
+            self.closed.extend(self.rows(self.bucket, self.current))
+        self.bucket = bucket
+        self.current = {}
+
+    def drain(self):
+        closed, self.closed = self.closed, []
+        return closed